@@ -0,0 +1,732 @@
+import argparse
+import datetime
+import importlib.util
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+
+RESOLUTIONS = {"720p": (1280, 720), "1080p": (1920, 1080), "4k": (3840, 2160)}
+SOURCE = "Source1-benchmark"
+
+
+def load_camera_module():
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "get-data-to-camera.py")
+    spec = importlib.util.spec_from_file_location("get_data_to_camera", path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+camera = load_camera_module()
+
+
+def percentiles(samples):
+    if not samples:
+        return {}
+    values = np.array(samples) * 1000
+    return {
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p90_ms": round(float(np.percentile(values, 90)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+        "max_ms": round(float(values.max()), 3),
+    }
+
+
+def peak_rss_kb():
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak // 1024 if sys.platform == "darwin" else peak
+    except ImportError:
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().peak_wset // 1024
+    except (ImportError, AttributeError):
+        return None
+
+
+class CountingCursor:
+    def __init__(self, connection, cursor):
+        self.connection = connection
+        self.cursor = cursor
+
+    def execute(self, *args):
+        self.connection.queries += 1
+        return self.cursor.execute(*args)
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+
+class CountingConnection:
+    # DB-API connection wrapper that counts executed statements
+    def __init__(self, connection):
+        self.connection = connection
+        self.queries = 0
+
+    def cursor(self):
+        return CountingCursor(self, self.connection.cursor())
+
+    def close(self):
+        self.connection.close()
+
+
+def benchmark_tag_names(tag_count):
+    return [f"BENCH_TAG_{index:04d}" for index in range(tag_count)]
+
+
+def benchmark_tag_configs(tag_count, priority=None, limits=False):
+    # priority adds the Deadband;LogDeadband;EventLoggingPriority fields written by generate-tag-list.py,
+    # limits the MinEU;MaxEU;LoLo;Lo;Hi;HiHi fields after them (the synthetic values swing 10..90)
+    polling = f";0;0;{priority}" if priority is not None or limits else ""
+    polling += ";0;100;12;25;75;88" if limits else ""
+    return {SOURCE: {name.lower(): f"{name};%;Benchmark tag {index}{polling}" for index, name in enumerate(benchmark_tag_names(tag_count))}}
+
+
+# SQLite stand-in for the WWALMDB Events table
+def create_events_db(path, tag_count, event_rows, seed=1):
+    rng = random.Random(seed)
+    names = benchmark_tag_names(tag_count)
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE Events (EventID INTEGER PRIMARY KEY, TagName TEXT NOT NULL, ValueString TEXT)")
+    batch = 100000
+    for start in range(0, event_rows, batch):
+        conn.executemany(
+            "INSERT INTO Events (TagName, ValueString) VALUES (?, ?)",
+            ((rng.choice(names), f"{rng.uniform(0, 100):.2f}") for _ in range(min(batch, event_rows - start))),
+        )
+    conn.execute("CREATE INDEX IX_Events_TagName ON Events (TagName, EventID)")
+    conn.commit()
+    conn.close()
+
+
+def insert_events(path, tag_count, count, rng):
+    names = benchmark_tag_names(tag_count)
+    conn = sqlite3.connect(path)
+    conn.executemany("INSERT INTO Events (TagName, ValueString) VALUES (?, ?)",
+                     ((rng.choice(names), f"{rng.uniform(0, 100):.2f}") for _ in range(count)))
+    conn.commit()
+    conn.close()
+
+
+def bench_overlay(resolution, tag_count, frames):
+    width, height = RESOLUTIONS[resolution]
+    _, base_frame = camera.SyntheticCapture(width, height, fps=0).read()
+    tag_configs = benchmark_tag_configs(tag_count)
+    overlay = camera.OverlayRenderer(tag_configs, camera.DEFAULT_AESTHETICS)
+    versioned_overlay = camera.OverlayRenderer(tag_configs, camera.DEFAULT_AESTHETICS)
+    history = camera.TagHistory(tag_configs)
+    sparkline_aesthetics = camera.stream_aesthetics({"sparkline_width": 90})
+    sparkline_overlay = camera.OverlayRenderer(tag_configs, sparkline_aesthetics, history)
+    alarm_overlay = camera.OverlayRenderer(benchmark_tag_configs(tag_count, limits=True), camera.DEFAULT_AESTHETICS)
+    renderers = {
+        "draw_visualizations": lambda frame, values, version: camera.draw_visualizations(frame, values, camera.DEFAULT_AESTHETICS, tag_configs),
+        "draw_visualizations_sparklines": lambda frame, values, version: camera.draw_visualizations(
+            frame, values, sparkline_aesthetics, tag_configs, history),
+        "overlay_renderer": lambda frame, values, version: overlay.render(frame, values),
+        # With the snapshot version, as the stream loop passes it
+        "overlay_renderer_versioned": versioned_overlay.render,
+        "overlay_renderer_sparklines": sparkline_overlay.render,
+        # Every tag has limits, so each value change re-evaluates all severities
+        "overlay_renderer_alarms": alarm_overlay.render,
+    }
+    results = []
+    for name, render in renderers.items():
+        values = camera.initialize_latest_values(tag_configs)
+        samples = []
+        for index in range(frames):
+            if index % 25 == 0:
+                # Values change about once a second at 25 fps; the history keeps a full window
+                for slot, tag_name in enumerate(values[SOURCE]):
+                    value = 50 + 40 * np.sin(index / 25 + slot)
+                    values[SOURCE][tag_name] = f"{value:.2f}"
+                    history.append(slot, value, time.time())
+            frame = base_frame.copy()
+            start = time.perf_counter()
+            render(frame, values, index // 25)
+            samples.append(time.perf_counter() - start)
+        results.append({"stage": "overlay", "renderer": name, "resolution": resolution, "tags": tag_count,
+                        "fps": round(len(samples) / sum(samples), 1), **percentiles(samples)})
+    return results
+
+
+# Severity of every tag per value update: one vectorized pass against a per-tag Python loop
+def bench_alarms(tag_count, updates, seed=6):
+    rng = np.random.default_rng(seed)
+    tag_configs = benchmark_tag_configs(tag_count, limits=True)
+    alarms = camera.AlarmLimits(tag_configs)
+    limits = [camera.parse_tag_limits(tag_info) for tag_info in tag_configs[SOURCE].values()]
+
+    def per_tag(values):
+        severities = []
+        for value, (min_eu, max_eu, lolo, lo, hi, hihi) in zip(values, limits):
+            if value < min_eu or value > max_eu:
+                severities.append(camera.ALARM_OUT_OF_RANGE)
+            elif value <= lolo or value >= hihi:
+                severities.append(camera.ALARM_CRITICAL)
+            elif value <= lo or value >= hi:
+                severities.append(camera.ALARM_WARNING)
+            else:
+                severities.append(camera.ALARM_NORMAL)
+        return severities
+
+    results = []
+    for name, evaluate in (("vectorized", alarms.evaluate), ("per_tag", lambda values: per_tag(values.tolist()))):
+        samples = []
+        for _ in range(updates):
+            values = rng.uniform(-5, 105, tag_count)
+            start = time.perf_counter()
+            severities = evaluate(values)
+            samples.append(time.perf_counter() - start)
+        results.append({"stage": "alarm_evaluation", "method": name, "tags": tag_count, "updates": updates,
+                        "in_alarm": int(np.count_nonzero(severities)), **percentiles(samples)})
+    return results
+
+
+def bench_db(db_path, tag_count, cycles, new_events_per_cycle, seed=2):
+    rng = random.Random(seed)
+    tags = benchmark_tag_configs(tag_count)[SOURCE]
+    results = []
+    for mode in ("per_tag", "batch", "incremental"):
+        counting = CountingConnection(sqlite3.connect(db_path))
+        conn = camera.PooledConnection(counting)
+        latest_values = {SOURCE: {}}
+        fetch_options = camera.get_fetch_options({"fetch_mode": mode, "events_table": "Events"})
+        poller = camera.EventWatermarkPoller(SOURCE, tags, latest_values, fetch_options) if mode == "incremental" else None
+        samples = []
+        for _ in range(cycles):
+            insert_events(db_path, tag_count, new_events_per_cycle, rng)
+            start = time.perf_counter()
+            if poller:
+                poller.poll(conn)
+            else:
+                camera.get_latest_values(conn, tags, SOURCE, latest_values, fetch_options)
+            samples.append(time.perf_counter() - start)
+        conn.close()
+        results.append({"stage": "db_cycle", "fetch_mode": mode, "tags": tag_count, "cycles": cycles,
+                        "queries_per_cycle": round(counting.queries / cycles, 2),
+                        "queries_per_second": round(counting.queries / sum(samples), 1), **percentiles(samples)})
+    return results
+
+
+# Poller thread against a FlakyDriver: random statement failures, then a full outage
+def bench_resilience(db_path, tag_count, failure_rate, outage_seconds):
+    tags = benchmark_tag_configs(tag_count)[SOURCE]
+    latest_values = camera.initialize_latest_values({SOURCE: tags})
+    db_config = {"driver": "sqlite", "server": "local", "database": db_path, "uid": "bench", "pwd": "bench",
+                 "fetch_mode": "incremental", "events_table": "Events",
+                 "reconnect_min_delay": "0.2", "reconnect_max_delay": "2", "bad_after": str(outage_seconds / 2)}
+    driver = camera.FlakyDriver(lambda connection_string: sqlite3.connect(db_path, check_same_thread=False),
+                                failure_rate=failure_rate, seed=3)
+    stop_event = threading.Event()
+    thread = threading.Thread(target=camera.query_database_periodically,
+                              args=(SOURCE, db_config, tags, latest_values, stop_event, driver.connect))
+    thread.start()
+
+    def quality_counts():
+        qualities = list(latest_values[SOURCE].quality.values())
+        return {name: qualities.count(quality) for name, quality in
+                (("good", camera.QUALITY_GOOD), ("stale", camera.QUALITY_STALE), ("bad", camera.QUALITY_BAD))}
+
+    def wait_until_good(timeout):
+        start = time.perf_counter()
+        while time.perf_counter() - start < timeout:
+            if quality_counts()["good"] == len(tags):
+                return time.perf_counter() - start
+            time.sleep(0.01)
+        return None
+
+    startup_seconds = wait_until_good(30)
+    driver.failure_rate = 0
+    driver.outage(outage_seconds)
+    time.sleep(outage_seconds)
+    during_outage = quality_counts()
+    recovery_seconds = wait_until_good(30)
+    stop_event.set()
+    thread.join()
+    return [{"stage": "db_resilience", "tags": tag_count, "failure_rate": failure_rate, "outage_seconds": outage_seconds,
+             "startup_seconds": startup_seconds and round(startup_seconds, 3),
+             "recovery_seconds": recovery_seconds and round(recovery_seconds, 3),
+             "quality_at_end_of_outage": during_outage, "thread_alive_after_outage": recovery_seconds is not None,
+             "connects": driver.connects, "injected_failures": driver.injected_failures}]
+
+
+# Camera outage (stalled stream) and hard failure (stream ends) with and without a standby source.
+# Recovery = time from the last frame of the failed source to the first new camera frame.
+def bench_failover(resolution, frame_timeout, capture_fps=25, seconds=4):
+    width, height = RESOLUTIONS[resolution]
+    results = []
+    for standby in (False, True):
+        for mode in ("outage", "failure"):
+            cameras = {url: camera.FlakyCamera(lambda url: camera.SyntheticCapture(width, height, fps=capture_fps), seed=index)
+                       for index, url in enumerate(("synthetic://primary", "synthetic://standby"))}
+            options = {"frame_timeout": str(frame_timeout), "reconnect_min_delay": "0.2", "reconnect_max_delay": "1"}
+            if standby:
+                options["standby_source"] = "synthetic://standby"
+            name = f"failover-{resolution}-{mode}-{'standby' if standby else 'single'}"
+            supervisor = camera.open_supervised_stream(
+                "synthetic://primary", options, name=name,
+                opener=lambda url, cap=None: camera.open_capture(url, cameras[url].open(url)))
+            time.sleep(1)
+            primary = cameras["synthetic://primary"]
+            if mode == "outage":
+                primary.outage(seconds / 2)
+            else:
+                primary.failure_rate = 1.0
+            start = time.perf_counter()
+            frames = 0
+            while time.perf_counter() - start < seconds:
+                ok, frame, capture_time = supervisor.read()
+                frames += ok
+                if mode == "failure" and time.perf_counter() - start > seconds / 4:
+                    primary.failure_rate = 0.0
+            results.append({
+                "stage": "capture_failover", "resolution": resolution, "mode": mode, "standby": standby,
+                "frame_timeout": frame_timeout,
+                "recovery_seconds": supervisor.last_recovery and round(supervisor.last_recovery, 3),
+                "recovery_frames": supervisor.recovery_frames, "frames": frames,
+                "active_source": supervisor.active["role"], "primary_opens": primary.opens,
+            })
+            supervisor.stop()
+    return results
+
+
+# Batch vs scheduled polling with a few fast tags (new value every fast_period) among quiet ones.
+# Values are wall-clock timestamps, so display lag = now - value.
+def bench_scheduling(db_path, tag_count, seconds, fast_share=0.1, fast_period=0.1):
+    names = benchmark_tag_names(tag_count)
+    fast_names = names[:max(1, int(tag_count * fast_share))]
+    fast_tags = [name.lower() for name in fast_names]
+    results = []
+    for mode in ("batch", "scheduled"):
+        tags = benchmark_tag_configs(tag_count, priority=999)[SOURCE]
+        latest_values = camera.initialize_latest_values({SOURCE: tags})
+        db_config = {"driver": "sqlite", "server": "local", "database": db_path, "uid": "bench", "pwd": "bench",
+                     "fetch_mode": mode, "events_table": "Events"}
+        connections = []
+
+        def connect(connection_string):
+            conn = CountingConnection(sqlite3.connect(db_path, check_same_thread=False))
+            connections.append(conn)
+            return conn
+
+        stop_event = threading.Event()
+
+        def write_fast_tags():
+            conn = sqlite3.connect(db_path)
+            while not stop_event.wait(fast_period):
+                now = time.time()
+                conn.executemany("INSERT INTO Events (TagName, ValueString) VALUES (?, ?)", ((name, repr(now)) for name in fast_names))
+                conn.commit()
+            conn.close()
+
+        rows_key = ("arcam_db_rows_total", (("source", SOURCE),))
+        threads = [threading.Thread(target=write_fast_tags),
+                   threading.Thread(target=camera.query_database_periodically, args=(SOURCE, db_config, tags, latest_values, stop_event, connect))]
+        for thread in threads:
+            thread.start()
+        time.sleep(2)  # startup and first fetches
+        queries_before = sum(conn.queries for conn in connections)
+        rows_before = camera.METRICS.counters.get(rows_key, 0)
+        lags = []
+        start = time.perf_counter()
+        while time.perf_counter() - start < seconds:
+            now = time.time()
+            lags.extend(now - value for value in (camera.parse_float(latest_values[SOURCE][tag], None) for tag in fast_tags) if value)
+            time.sleep(0.05)
+        elapsed = time.perf_counter() - start
+        queries = sum(conn.queries for conn in connections) - queries_before
+        rows = camera.METRICS.counters.get(rows_key, 0) - rows_before
+        stop_event.set()
+        for thread in threads:
+            thread.join()
+        results.append({"stage": "db_scheduling", "fetch_mode": mode, "tags": tag_count, "fast_tags": len(fast_names),
+                        "queries_per_second": round(queries / elapsed, 2),
+                        "tag_rows_per_second": round(rows / elapsed, 1),
+                        **{key.replace("_ms", "_fast_tag_lag_ms"): value for key, value in percentiles(lags).items()}})
+    return results
+
+
+class TimestampingCapture:
+    # Remembers when each frame left the capture so the sink can measure end-to-end latency
+    def __init__(self, capture):
+        self.capture = capture
+        self.captured_at = {}
+
+    def grab(self):
+        return self.capture.grab()
+
+    def retrieve(self):
+        ret, frame = self.capture.retrieve()
+        if ret:
+            self.captured_at[id(frame)] = time.perf_counter()
+        return ret, frame
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def __getattr__(self, name):
+        return getattr(self.capture, name)
+
+
+class LatencySink:
+    def __init__(self, capture):
+        self.capture = capture
+        self.latencies = []
+        self.frames = 0
+
+    def write(self, frame):
+        self.frames += 1
+        captured_at = self.capture.captured_at.pop(id(frame), None)
+        if captured_at is not None:
+            self.latencies.append(time.perf_counter() - captured_at)
+
+    def close(self):
+        pass
+
+
+# Full video_stream_process loop: synthetic camera, SQLite Events table, in-process pollers
+def bench_pipeline(db_path, resolution, tag_count, frames, capture_fps, work_dir):
+    width, height = RESOLUTIONS[resolution]
+    names = benchmark_tag_names(tag_count)
+    with open(os.path.join(work_dir, "config.ini"), "w") as file:
+        file.write(f"[{SOURCE}]\ndriver = sqlite\nserver = local\ndatabase = {db_path}\nuid = bench\npwd = bench\n"
+                   "fetch_mode = incremental\nevents_table = Events\n")
+    tag_file = os.path.join(work_dir, "tags.ini")
+    with open(tag_file, "w") as file:
+        file.write(f"[{SOURCE}]\n" + "".join(f"{name} = {name};%;Benchmark tag {index}\n" for index, name in enumerate(names)))
+
+    connections = []
+
+    def connect(connection_string):
+        conn = CountingConnection(sqlite3.connect(db_path))
+        connections.append(conn)
+        return conn
+
+    capture = TimestampingCapture(camera.SyntheticCapture(width, height, fps=capture_fps))
+    sink = LatencySink(capture)
+    cwd = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        start = time.perf_counter()
+        camera.video_stream_process("synthetic://benchmark", tag_file, {}, capture=capture, connect=connect,
+                                    sinks=[sink], max_frames=frames)
+        elapsed = time.perf_counter() - start
+    finally:
+        os.chdir(cwd)
+    queries = sum(conn.queries for conn in connections)
+    return [{"stage": "pipeline", "resolution": resolution, "tags": tag_count, "capture_fps": capture_fps,
+             "frames": sink.frames, "fps": round(sink.frames / elapsed, 1),
+             "db_queries_per_second": round(queries / elapsed, 2), **percentiles(sink.latencies)}]
+
+
+class SequenceStampingCapture:
+    # Writes a running frame number into the bottom-right pixels (outside the overlay), so a sink
+    # can check the order and latency of frames that went through the shared-memory pipeline
+    def __init__(self, capture):
+        self.capture = capture
+        self.seq = 0
+        self.captured_at = {}
+
+    def grab(self):
+        return self.capture.grab()
+
+    def retrieve(self, image=None):
+        ret, frame = self.capture.retrieve(image)
+        if ret:
+            frame[-1, -4:, 0] = np.frombuffer(self.seq.to_bytes(4, "little"), np.uint8)
+            self.captured_at[self.seq] = time.perf_counter()
+            self.seq += 1
+        return ret, frame
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def __getattr__(self, name):
+        return getattr(self.capture, name)
+
+
+class SequenceSink:
+    def __init__(self, capture):
+        self.capture = capture
+        self.sequence = []
+        self.latencies = []
+
+    def write(self, frame):
+        seq = int.from_bytes(frame[-1, -4:, 0].tobytes(), "little")
+        self.sequence.append(seq)
+        captured_at = self.capture.captured_at.pop(seq, None)
+        if captured_at is not None:
+            self.latencies.append(time.perf_counter() - captured_at)
+
+    def close(self):
+        pass
+
+
+# Serial stream loop (0 workers) against the pipelined one with 1..N overlay workers
+def bench_frame_pipeline(db_path, resolution, tag_count, frames, worker_counts, work_dir):
+    width, height = RESOLUTIONS[resolution]
+    with open(os.path.join(work_dir, "config.ini"), "w") as file:
+        file.write(f"[{SOURCE}]\ndriver = sqlite\nserver = local\ndatabase = {db_path}\nuid = bench\npwd = bench\n"
+                   "fetch_mode = incremental\nevents_table = Events\n")
+    tag_file = os.path.join(work_dir, "tags.ini")
+    with open(tag_file, "w") as file:
+        file.write(f"[{SOURCE}]\n" + "".join(f"{name} = {name};%;Benchmark tag {index}\n" for index, name in enumerate(benchmark_tag_names(tag_count))))
+
+    results = []
+    serial_fps = None
+    cwd = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        for workers in [0] + [count for count in worker_counts if count > 0]:
+            capture = SequenceStampingCapture(camera.SyntheticCapture(width, height, fps=0))
+            sink = SequenceSink(capture)
+            start = time.perf_counter()
+            camera.video_stream_process("synthetic://benchmark", tag_file, {}, capture=capture,
+                                        connect=lambda connection_string: sqlite3.connect(db_path, check_same_thread=False),
+                                        sinks=[sink], max_frames=frames, pipeline_workers=workers)
+            elapsed = time.perf_counter() - start
+            fps = len(sink.sequence) / elapsed
+            serial_fps = serial_fps or fps
+            results.append({"stage": "frame_pipeline", "resolution": resolution, "tags": tag_count, "workers": workers,
+                            "frames": len(sink.sequence), "fps": round(fps, 1),
+                            "speedup_vs_serial": round(fps / serial_fps, 2),
+                            "frames_in_order": all(a <= b for a, b in zip(sink.sequence, sink.sequence[1:])),
+                            "frames_dropped": capture.seq - len(sink.sequence),
+                            **percentiles(sink.latencies)})
+    finally:
+        os.chdir(cwd)
+    return results
+
+
+def cold_stream_process(conn, stream_url, tag_file, requested_at):
+    # What the GUI did before the worker pool: a fresh spawned process per stream
+    stop_event = threading.Event()
+
+    def started():
+        conn.send(time.time() - requested_at)
+        stop_event.set()
+
+    camera.video_stream_process(stream_url, tag_file, {}, stop_event=stop_event, on_started=started)
+
+
+# Command-to-first-frame time: fresh spawned process vs pre-warmed pool worker (start and switch)
+def bench_startup(resolution, tag_count, runs, work_dir):
+    width, height = RESOLUTIONS[resolution]
+    video_file = os.path.join(work_dir, f"startup-{resolution}.avi")
+    writer = camera.cv2.VideoWriter(video_file, camera.cv2.VideoWriter_fourcc(*"MJPG"), 25, (width, height))
+    capture = camera.SyntheticCapture(width, height, fps=0, frame_count=50)
+    for _ in range(50):
+        writer.write(capture.read()[1])
+    writer.release()
+    with open(os.path.join(work_dir, "config.ini"), "w") as file:
+        file.write(f"[stream1]\nname = startup\nsource = {video_file}\nsinks =\n")
+    tag_file = os.path.join(work_dir, "tags.ini")
+    with open(tag_file, "w") as file:
+        file.write(f"[{SOURCE}]\n" + "".join(f"{name} = {name};%;Benchmark tag {index}\n" for index, name in enumerate(benchmark_tag_names(tag_count))))
+
+    context = multiprocessing.get_context("spawn")
+    cwd = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        cold = []
+        for _ in range(runs):
+            conn, child_conn = context.Pipe()
+            process = context.Process(target=cold_stream_process, args=(child_conn, video_file, tag_file, time.time()))
+            process.start()
+            cold.append(conn.recv())
+            process.join()
+
+        conn, child_conn = context.Pipe()
+        worker = context.Process(target=camera.stream_worker_process, args=(child_conn,))
+        worker.start()
+        conn.recv()  # ready
+        warm_start, warm_switch = [], []
+        for run in range(runs):
+            conn.send(("start" if run == 0 else "switch", video_file, tag_file, None, time.time()))
+            while True:
+                message = conn.recv()
+                if message[0] == "started":
+                    (warm_start if run == 0 else warm_switch).append(message[2])
+                    break
+        conn.send(("exit",))
+        worker.join()
+    finally:
+        os.chdir(cwd)
+    return [{"stage": "startup", "mode": mode, "resolution": resolution, "tags": tag_count, "runs": len(samples), **percentiles(samples)}
+            for mode, samples in (("spawn_per_stream", cold), ("pooled_first_start", warm_start), ("pooled_switch", warm_switch))]
+
+
+# Replay recorder cost per frame (JPEG + index, off the render thread in the stream) and seek latency
+def bench_replay(resolution, tag_count, frames, seeks, work_dir, seed=4):
+    width, height = RESOLUTIONS[resolution]
+    capture = camera.SyntheticCapture(width, height, fps=0)
+    tag_configs = benchmark_tag_configs(tag_count)
+    values = camera.initialize_latest_values(tag_configs)
+    directory = os.path.join(work_dir, f"replay-{resolution}-{tag_count}")
+    recorder = camera.ReplayRecorder("bench", directory, fps=0, segment_seconds=5, keyframe_seconds=1)
+    record_samples = []
+    now = time.time()
+    for index in range(frames):
+        if index % 10 == 0:
+            for tag_name in values[SOURCE]:
+                values[SOURCE][tag_name] = f"{index / 10:.2f}"
+        _, frame = capture.read()
+        start = time.perf_counter()
+        # Called directly with synthetic times (40 ms apart) instead of through the sink thread
+        recorder.process((frame, now + index * 0.04, index // 10, values))
+        record_samples.append(time.perf_counter() - start)
+    recorder.close()
+    disk_bytes = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+    reader = camera.ReplayReader(directory, "bench")
+    first, last = reader.time_range()
+    rng = random.Random(seed)
+    seek_samples = []
+    for _ in range(seeks):
+        start = time.perf_counter()
+        reader.seek(rng.uniform(first, last))
+        reader.read()
+        seek_samples.append(time.perf_counter() - start)
+    segment_count = len(reader.segments)
+    reader.close()
+    return [
+        {"stage": "replay_record", "resolution": resolution, "tags": tag_count, "frames": frames,
+         "kb_per_frame": round(disk_bytes / frames / 1024, 1), **percentiles(record_samples)},
+        {"stage": "replay_seek", "resolution": resolution, "tags": tag_count, "segments": segment_count,
+         "seeks": seeks, **percentiles(seek_samples)},
+    ]
+
+
+# Events with EventStamp over [start - 1 h, start + seconds], for historical lookups
+def create_history_db(path, tag_count, start, seconds, events_per_second, seed=5):
+    rng = random.Random(seed)
+    names = benchmark_tag_names(tag_count)
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE Events (EventID INTEGER PRIMARY KEY, EventStamp TEXT NOT NULL, TagName TEXT NOT NULL, ValueString TEXT)")
+    count = int((3600 + seconds) * events_per_second)
+    stamps = sorted(rng.uniform(start - 3600, start + seconds) for _ in range(count))
+    conn.executemany("INSERT INTO Events (EventStamp, TagName, ValueString) VALUES (?, ?, ?)",
+                     ((datetime.datetime.fromtimestamp(stamp).isoformat(" "), rng.choice(names), f"{rng.uniform(0, 100):.2f}") for stamp in stamps))
+    conn.execute("CREATE INDEX IX_Events_TagName ON Events (TagName, EventID)")
+    conn.execute("CREATE INDEX IX_Events_EventStamp ON Events (EventStamp)")
+    conn.commit()
+    conn.close()
+
+
+# Offline annotation of a recorded file with historical values, 1 .. N worker processes
+def bench_annotate(resolution, tag_count, frames, worker_counts, work_dir, events_per_second=50):
+    width, height = RESOLUTIONS[resolution]
+    video_file = os.path.join(work_dir, f"annotate-{resolution}.mp4")
+    writer = camera.cv2.VideoWriter(video_file, camera.cv2.VideoWriter_fourcc(*"mp4v"), 25, (width, height))
+    capture = camera.SyntheticCapture(width, height, fps=0)
+    for _ in range(frames):
+        writer.write(capture.read()[1])
+    writer.release()
+    start = time.time() - 86400
+    db_path = os.path.join(work_dir, f"history-{resolution}-{tag_count}.db")
+    create_history_db(db_path, tag_count, start, frames / 25, events_per_second)
+    tag_file = os.path.join(work_dir, "tags.ini")
+    with open(tag_file, "w") as file:
+        file.write(f"[{SOURCE}]\n" + "".join(f"{name} = {name};%;Benchmark tag {index}\n" for index, name in enumerate(benchmark_tag_names(tag_count))))
+    db_configs = {SOURCE: {"driver": "sqlite", "server": "local", "database": db_path, "uid": "bench", "pwd": "bench",
+                           "events_table": "Events", "event_time_column": "EventStamp"}}
+
+    results = []
+    for workers in worker_counts:
+        output_file = os.path.join(work_dir, f"annotated-{resolution}-{workers}.avi")
+        report = camera.annotate_video(video_file, output_file, tag_file, db_configs, start, workers,
+                                       connect=lambda connection_string: sqlite3.connect(db_path))
+        os.remove(output_file)
+        results.append({"stage": "annotate", "resolution": resolution, "tags": tag_count,
+                        **{key: value for key, value in report.items() if key not in ("video", "output")}})
+    return results
+
+
+def run_benchmarks(args):
+    resolutions = [resolution.strip().lower() for resolution in args.resolutions.split(",")]
+    tag_counts = [int(count) for count in args.tags.split(",")]
+    annotate_workers = sorted({int(count) for count in args.annotate_workers.split(",")})
+    pipeline_workers = sorted({int(count) for count in args.pipeline_workers.split(",")})
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "numpy": np.__version__,
+            "opencv": camera.cv2.__version__,
+        },
+        "parameters": vars(args),
+        "results": [],
+    }
+    with tempfile.TemporaryDirectory() as work_dir:
+        db_path = os.path.join(work_dir, "events.db")
+        start = time.perf_counter()
+        create_events_db(db_path, max(tag_counts), args.event_rows)
+        report["environment"]["events_seed_seconds"] = round(time.perf_counter() - start, 2)
+
+        for tag_count in tag_counts:
+            for resolution in resolutions:
+                report["results"].extend(bench_overlay(resolution, tag_count, args.frames))
+            report["results"].extend(bench_alarms(tag_count, args.db_cycles))
+            report["results"].extend(bench_db(db_path, tag_count, args.db_cycles, args.new_events))
+            report["results"].extend(bench_resilience(db_path, tag_count, args.failure_rate, args.outage))
+            report["results"].extend(bench_scheduling(db_path, tag_count, args.schedule_seconds))
+            for resolution in resolutions:
+                report["results"].extend(bench_pipeline(db_path, resolution, tag_count, args.frames, args.capture_fps, work_dir))
+                report["results"].extend(bench_frame_pipeline(db_path, resolution, tag_count, args.frames, pipeline_workers, work_dir))
+                report["results"].extend(bench_startup(resolution, tag_count, args.startup_runs, work_dir))
+                report["results"].extend(bench_replay(resolution, tag_count, args.frames, args.replay_seeks, work_dir))
+                report["results"].extend(bench_annotate(resolution, tag_count, args.frames, annotate_workers, work_dir))
+        for resolution in resolutions:
+            report["results"].extend(bench_failover(resolution, args.frame_timeout))
+    report["peak_rss_kb"] = peak_rss_kb()
+    return report
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Benchmark overlay, DB polling and the full stream loop with synthetic stand-ins")
+    arg_parser.add_argument("--resolutions", default="720p,1080p,4k")
+    arg_parser.add_argument("--tags", default="10,100,1000", help="comma separated tag counts")
+    arg_parser.add_argument("--event-rows", type=int, default=2000000, help="rows seeded into the SQLite Events table")
+    arg_parser.add_argument("--frames", type=int, default=200, help="frames per overlay / pipeline run")
+    arg_parser.add_argument("--capture-fps", type=float, default=0, help="synthetic camera rate for the pipeline (0 = as fast as possible)")
+    arg_parser.add_argument("--db-cycles", type=int, default=20)
+    arg_parser.add_argument("--new-events", type=int, default=50, help="events inserted before each DB cycle")
+    arg_parser.add_argument("--failure-rate", type=float, default=0.1, help="injected DB statement failure rate for the resilience run")
+    arg_parser.add_argument("--outage", type=float, default=3, help="seconds of injected DB outage for the resilience run")
+    arg_parser.add_argument("--schedule-seconds", type=float, default=10, help="measurement time per fetch mode for the scheduling run")
+    arg_parser.add_argument("--frame-timeout", type=float, default=0.5, help="seconds without frames before a camera counts as failed in the failover run")
+    arg_parser.add_argument("--startup-runs", type=int, default=5, help="stream starts per mode for the startup run")
+    arg_parser.add_argument("--annotate-workers", default=f"1,{os.cpu_count() or 1}", help="comma separated worker counts for the annotation run")
+    arg_parser.add_argument("--pipeline-workers", default=",".join(str(count) for count in sorted(
+                                {1, os.cpu_count() or 1} | {2 ** power for power in range(1, 8) if 2 ** power < (os.cpu_count() or 1)})),
+                            help="comma separated overlay worker counts for the pipelined stream run (the serial loop is always measured)")
+    arg_parser.add_argument("--replay-seeks", type=int, default=50, help="random seeks for the replay run")
+    arg_parser.add_argument("--output", help="write the JSON report to this file")
+    args = arg_parser.parse_args()
+
+    camera.logging.getLogger().setLevel(camera.logging.WARNING)
+    report = run_benchmarks(args)
+    report_json = json.dumps(report, indent=2)
+    print(report_json)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(report_json)
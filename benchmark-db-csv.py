@@ -0,0 +1,81 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+
+SECTIONS = [':IOReal', ':IOInt', ':MemoryDisc', ':MemoryReal', ':IODisc', ':MemoryInt', ':IOMsg']
+HEADER = "Group;Comment;Logged;EventLogged;EventLoggingPriority;RetentiveValue;InitialValue;MinEU;MaxEU;Deadband;LogDeadband;EngUnits;AccessName;ItemName"
+
+
+# Write a synthetic Wonderware export with tag_count tags spread over the sections
+def generate_export(path, tag_count, seed=1):
+    rng = random.Random(seed)
+    per_section = tag_count // len(SECTIONS)
+    with open(path, mode='w', newline='') as outfile:
+        outfile.write(":mode=ask;;;;\n:IOAccess;Application;Topic;AdviseActive\nOPC;\\\\localhost\\Gateway;OPC_DeviceGroup;Yes\n")
+        for section in SECTIONS:
+            outfile.write(f"{section};{HEADER}\n")
+            for index in range(per_section):
+                outfile.write(
+                    f"{section[1:].upper()}_TAG_{index};$System;Generated tag {index} in {section[1:]};Yes;"
+                    f"{rng.choice(['Yes', 'No'])};{rng.randint(0, 999)};No;0;0;100;0.5;0;"
+                    f"{rng.choice(['%', 'deg.', 'bar', 'm/s', ''])};OPC;ns=2;s=Device.{section[1:]}.{index}\n"
+                )
+
+
+def peak_child_rss_kb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+
+
+# Run generate-tag-list.py headless with each worker count and compare outputs
+def run_benchmark(tag_count, worker_counts, work_dir):
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "generate-tag-list.py")
+    export_file = os.path.join(work_dir, "DB-benchmark.CSV")
+    generate_export(export_file, tag_count)
+    results = {"tags": tag_count, "export_bytes": os.path.getsize(export_file), "runs": []}
+
+    reference = None
+    for workers in worker_counts:
+        output_file = os.path.join(work_dir, f"Output-{workers}.csv")
+        start = time.perf_counter()
+        subprocess.run([sys.executable, script, "--input", export_file, "--output", output_file, "--workers", str(workers)],
+                       check=True, stdout=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - start
+        with open(output_file, mode='rb') as infile:
+            output = infile.read()
+        if reference is None:
+            reference = output
+        results["runs"].append({
+            "workers": workers,
+            "seconds": round(elapsed, 3),
+            "mb_per_second": round(results["export_bytes"] / elapsed / 1e6, 2),
+            "output_matches_single_worker": output == reference,
+            "peak_child_rss_kb": peak_child_rss_kb(),
+        })
+    return results
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Benchmark DB.CSV tag extraction on a generated export")
+    arg_parser.add_argument("--tags", type=int, default=500000)
+    arg_parser.add_argument("--workers", default=f"1,{os.cpu_count() or 1}", help="comma separated worker counts")
+    arg_parser.add_argument("--output", help="write the JSON report to this file")
+    args = arg_parser.parse_args()
+
+    worker_counts = sorted({int(count) for count in args.workers.split(",")})
+    with tempfile.TemporaryDirectory() as work_dir:
+        report = run_benchmark(args.tags, worker_counts, work_dir)
+    report_json = json.dumps(report, indent=2)
+    print(report_json)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(report_json)
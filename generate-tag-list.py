@@ -2,55 +2,354 @@ import tkinter as tk
 from tkinter import filedialog, messagebox
 from tkinter import ttk
 import csv
+import io
 import os
+import locale
+import argparse
+import threading
+import queue
 import configparser
+import re
+import bisect
+import json
+import hashlib
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+
+WONDERWARE_SECTIONS = [
+    ':MemoryDisc', ':IODisc', ':MemoryInt', ':IOInt', ':MemoryReal', ':IOReal',
+    ':MemoryMsg', ':IOMsg', ':GroupVar', ':HistoryTrend', ':TagID',
+    ':IndirectDisc', ':IndirectAnalog', ':IndirectMsg'
+]
+CHUNK_BYTES = 4 * 1024 * 1024  # large sections are split into line-aligned chunks of about this size
+# Chunks end on lines whose CRC has these bits clear (once past half of CHUNK_BYTES), so an edit
+# in one place does not shift the boundaries, and fingerprints, of the chunks after it
+CHUNK_BOUNDARY_MASK = 0x1FFF
+FINGERPRINT_SUFFIX = ".fingerprints.json"
+# Polling metadata carried into the tag list (empty where a section has no such column)
+POLLING_COLUMNS = ['Deadband', 'LogDeadband', 'EventLoggingPriority']
+# EU range and alarm limits carried into the tag list for the overlay's alarm colouring. Memory tags
+# name their range MinValue/MaxValue; an alarm limit is left empty while its <Limit>State is Off.
+LIMIT_COLUMNS = ['MinEU', 'MaxEU', 'LoLoAlarmValue', 'LoAlarmValue', 'HiAlarmValue', 'HiHiAlarmValue']
+LIMIT_ALIASES = {'MinEU': 'MinValue', 'MaxEU': 'MaxValue'}
+# Header of the generated tag list file
+OUTPUT_COLUMNS = ['Source', 'TagName', 'EngUnits', 'Comment'] + POLLING_COLUMNS + LIMIT_COLUMNS
+
+
+# Split the export into (header line, start, end) byte ranges, one or more per section.
+# Ranges only start or end outside quoted fields (even number of quotes so far), so a field with
+# line breaks, e.g. a multi-line Comment, stays in one chunk.
+def find_section_chunks(input_file, sections, input_separator, encoding, chunk_bytes=CHUNK_BYTES):
+    section_names = {section.encode(encoding) for section in sections}
+    separator = input_separator.encode(encoding)
+    quote = '"'.encode(encoding)
+    chunks = []
+    header, start, offset = None, 0, 0
+    in_quotes = False
+    with open(input_file, mode='rb') as infile:
+        for line in infile:
+            line_start, offset = offset, offset + len(line)
+            quoted_line, in_quotes = in_quotes, in_quotes ^ bool(line.count(quote) & 1)
+            if quoted_line or in_quotes:
+                # Starts or ends inside a quoted field: no section header and no cut here
+                continue
+            if line.startswith(b':') and line.split(separator, 1)[0].rstrip(b'\r\n') in section_names:
+                if header is not None and line_start > start:
+                    chunks.append((header, start, line_start))
+                header, start = line.decode(encoding), offset
+                continue
+            size = offset - start
+            if header is not None and size >= chunk_bytes // 2 and (size >= 2 * chunk_bytes or not zlib.crc32(line) & CHUNK_BOUNDARY_MASK):
+                chunks.append((header, start, offset))
+                start = offset
+    if header is not None and offset > start:
+        chunks.append((header, start, offset))
+    return chunks, offset
+
+
+def column_index(header, column, alias=None):
+    for name in (column, alias):
+        if name and name in header:
+            return header.index(name)
+    return None
+
+
+# Parse one byte range of a section (runs in a worker process)
+def parse_section_chunk(input_file, encoding, input_separator, header_line, start, end, selected_source):
+    data = read_chunk(input_file, start, end)
+    header = next(csv.reader([header_line.rstrip('\r\n')], delimiter=input_separator))
+    event_logged_index = header.index('EventLogged') if 'EventLogged' in header else None
+    eng_units_index = header.index('EngUnits') if 'EngUnits' in header else None
+    comment_index = header.index('Comment') if 'Comment' in header else None
+    polling_indexes = [header.index(column) if column in header else None for column in POLLING_COLUMNS]
+    limit_indexes = [column_index(header, column, LIMIT_ALIASES.get(column)) for column in LIMIT_COLUMNS]
+    state_indexes = [column_index(header, column.replace('Value', 'State')) if column.endswith('AlarmValue') else None
+                     for column in LIMIT_COLUMNS]
+
+    rows = []
+    if event_logged_index is None:
+        return rows, end - start, chunk_fingerprint(header_line, data)
+    for row in csv.reader(io.StringIO(data.decode(encoding)), delimiter=input_separator):
+        if not row or row[0] == '' or len(row) <= event_logged_index:
+            continue
+        if row[event_logged_index].strip().lower() == 'yes':
+            tag = row[0]
+            eng_units = row[eng_units_index] if eng_units_index and len(row) > eng_units_index else ''
+            comment = row[comment_index] if comment_index and len(row) > comment_index else ''
+            polling = [row[index].strip() if index and len(row) > index else '' for index in polling_indexes]
+            limits = [row[index].strip() if index and len(row) > index
+                      and not (state_index and len(row) > state_index and row[state_index].strip().lower() == 'off') else ''
+                      for index, state_index in zip(limit_indexes, state_indexes)]
+            rows.append([selected_source, tag, eng_units, comment] + polling + limits)
+    return rows, end - start, chunk_fingerprint(header_line, data)
+
+
+def read_chunk(input_file, start, end):
+    with open(input_file, mode='rb') as infile:
+        infile.seek(start)
+        return infile.read(end - start)
+
+
+def chunk_fingerprint(header_line, data):
+    return hashlib.blake2b(header_line.encode('utf-8') + b'\0' + data, digest_size=16).hexdigest()
+
+
+# Parse chunks in worker processes and yield results in file order, with a bounded number in flight
+def iterate_parsed_chunks(input_file, encoding, input_separator, chunks, selected_source, workers):
+    if workers <= 1 or len(chunks) <= 1:
+        for header_line, start, end in chunks:
+            yield parse_section_chunk(input_file, encoding, input_separator, header_line, start, end, selected_source)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for header_line, start, end in chunks:
+            pending.append(pool.submit(parse_section_chunk, input_file, encoding, input_separator, header_line, start, end, selected_source))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
 
 
 # Base Class for SCADA Processors
 class ScadaProcessor:
-    def process_db_file(self, input_file, output_file, input_separator, output_separator, selected_source):
+    def extract_tags(self, input_file, output_file, input_separator, output_separator, selected_source, progress=None, workers=None):
         raise NotImplementedError("This method should be implemented by subclasses")
 
+    def update_tags(self, input_file, output_file, input_separator, output_separator, selected_source, progress=None, workers=None, tag_lists=()):
+        raise NotImplementedError("This method should be implemented by subclasses")
 
-# Wonderware SCADA Processor
-class WonderwareProcessor(ScadaProcessor):
     def process_db_file(self, input_file, output_file, input_separator, output_separator, selected_source):
-        sections = [
-            ':MemoryDisc', ':IODisc', ':MemoryInt', ':IOInt', ':MemoryReal', ':IOReal',
-            ':MemoryMsg', ':IOMsg', ':GroupVar', ':HistoryTrend', ':TagID',
-            ':IndirectDisc', ':IndirectAnalog', ':IndirectMsg'
-        ]
         try:
-            with open(input_file, mode='r') as infile:
-                reader = csv.reader(infile, delimiter=input_separator)
-                with open(output_file, mode='w', newline='') as outfile:
-                    writer = csv.writer(outfile, delimiter=output_separator)
-                    writer.writerow(['Source', 'TagName', 'EngUnits', 'Comment'])
-                    current_section, header = None, None
-
-                    for row in reader:
-                        if not row:
-                            continue
-
-                        if row[0] in sections:
-                            current_section, header = row[0], row
-                            event_logged_index = header.index('EventLogged') if 'EventLogged' in header else None
-                            eng_units_index = header.index('EngUnits') if 'EngUnits' in header else None
-                            comment_index = header.index('Comment') if 'Comment' in header else None
-                            continue
-
-                        if current_section and row[0] != '':
-                            if event_logged_index is not None and row[event_logged_index].strip().lower() == 'yes':
-                                tag = row[0]
-                                eng_units = row[eng_units_index] if eng_units_index and len(row) > eng_units_index else ''
-                                comment = row[comment_index] if comment_index and len(row) > comment_index else ''
-                                writer.writerow([selected_source, tag, eng_units, comment])
-
+            self.extract_tags(input_file, output_file, input_separator, output_separator, selected_source)
             messagebox.showinfo("Success", f"Tag list has been created: {output_file}")
         except Exception as e:
             messagebox.showerror("Error", str(e))
 
 
+# Wonderware SCADA Processor
+class WonderwareProcessor(ScadaProcessor):
+    def extract_tags(self, input_file, output_file, input_separator, output_separator, selected_source, progress=None, workers=None):
+        # Same default encoding as open() in text mode
+        encoding = locale.getpreferredencoding(False)
+        chunks, total_bytes = find_section_chunks(input_file, WONDERWARE_SECTIONS, input_separator, encoding)
+        workers = workers or os.cpu_count() or 1
+
+        tag_count, done_bytes = 0, 0
+        fingerprints = []
+        with open(output_file, mode='wb') as outfile:
+            outfile.write(format_rows([OUTPUT_COLUMNS], output_separator, encoding))
+            for rows, chunk_bytes, fingerprint in iterate_parsed_chunks(input_file, encoding, input_separator, chunks, selected_source, workers):
+                output_start = outfile.tell()
+                outfile.write(format_rows(rows, output_separator, encoding))
+                fingerprints.append({"fingerprint": fingerprint, "output_start": output_start, "output_end": outfile.tell(), "tags": len(rows)})
+                tag_count += len(rows)
+                done_bytes += chunk_bytes
+                if progress:
+                    progress(done_bytes, total_bytes)
+        write_fingerprints(output_file, fingerprint_settings(input_separator, output_separator, selected_source), fingerprints)
+        return tag_count
+
+    def update_tags(self, input_file, output_file, input_separator, output_separator, selected_source, progress=None, workers=None, tag_lists=()):
+        # Incremental run against the previous export: only chunks whose fingerprint is new are
+        # parsed, the others are copied byte for byte from the existing output. Returns a change report.
+        encoding = locale.getpreferredencoding(False)
+        settings = fingerprint_settings(input_separator, output_separator, selected_source)
+        previous = read_fingerprints(output_file, settings)
+        old_output = read_previous_output(output_file, previous, format_rows([OUTPUT_COLUMNS], output_separator, encoding))
+        if old_output is None:
+            tag_count = self.extract_tags(input_file, output_file, input_separator, output_separator, selected_source, progress, workers)
+            return {"full_run": True, "tags": tag_count, "chunks": None, "reparsed_chunks": None, "reparsed_bytes": None,
+                    "added": [], "removed": [], "modified": [], "renamed": {}, "tag_list_flags": []}
+
+        chunks, total_bytes = find_section_chunks(input_file, WONDERWARE_SECTIONS, input_separator, encoding)
+        workers = workers or os.cpu_count() or 1
+        known = {chunk["fingerprint"]: chunk for chunk in previous["chunks"]}
+        fingerprints = [chunk_fingerprint(header_line, read_chunk(input_file, start, end)) for header_line, start, end in chunks]
+        changed_chunks = [chunk for chunk, fingerprint in zip(chunks, fingerprints) if fingerprint not in known]
+
+        # Rows of the old chunks that are gone are the only old rows the diff needs
+        current = set(fingerprints)
+        old_rows = {}
+        for chunk in previous["chunks"]:
+            if chunk["fingerprint"] not in current:
+                data = old_output[chunk["output_start"]:chunk["output_end"]].decode(encoding)
+                old_rows.update((row[1], row) for row in csv.reader(io.StringIO(data), delimiter=output_separator) if len(row) > 1)
+
+        parsed = iterate_parsed_chunks(input_file, encoding, input_separator, changed_chunks, selected_source, workers)
+        new_fingerprints, parsed_tags, modified, done_bytes, reparsed_bytes = [], {}, [], 0, 0
+        with open(output_file, mode='wb') as outfile:
+            outfile.write(old_output[:previous["header_bytes"]])
+            for (header_line, start, end), fingerprint in zip(chunks, fingerprints):
+                output_start = outfile.tell()
+                if fingerprint in known:
+                    outfile.write(old_output[known[fingerprint]["output_start"]:known[fingerprint]["output_end"]])
+                    tag_count = known[fingerprint]["tags"]
+                else:
+                    rows, _, _ = next(parsed)
+                    reparsed_bytes += end - start
+                    outfile.write(format_rows(rows, output_separator, encoding))
+                    tag_count = len(rows)
+                    for row in rows:
+                        parsed_tags[row[1]] = row
+                        if row[1] in old_rows and old_rows[row[1]] != row:
+                            modified.append(row[1])
+                new_fingerprints.append({"fingerprint": fingerprint, "output_start": output_start, "output_end": outfile.tell(), "tags": tag_count})
+                done_bytes += end - start
+                if progress:
+                    progress(done_bytes, total_bytes)
+        write_fingerprints(output_file, settings, new_fingerprints)
+
+        added = [tag for tag in parsed_tags if tag not in old_rows]
+        removed = [tag for tag in old_rows if tag not in parsed_tags]
+        renamed = find_renamed_tags([old_rows[tag] for tag in removed], [parsed_tags[tag] for tag in added])
+        # Checking tag lists needs every tag of the new export, so only then is the whole output read
+        new_rows = read_output_rows(output_file, output_separator) if tag_lists else {}
+        return {
+            "full_run": False,
+            "tags": sum(chunk["tags"] for chunk in new_fingerprints),
+            "chunks": len(chunks),
+            "reparsed_chunks": len(changed_chunks),
+            "reparsed_bytes": reparsed_bytes,
+            "added": [tag for tag in added if tag not in renamed.values()],
+            "removed": [tag for tag in removed if tag not in renamed],
+            "modified": modified,
+            "renamed": renamed,
+            "tag_list_flags": check_tag_lists(tag_lists, selected_source, new_rows, removed, renamed),
+        }
+
+
+def format_rows(rows, output_separator, encoding):
+    text = io.StringIO()
+    csv.writer(text, delimiter=output_separator).writerows(rows)
+    return text.getvalue().encode(encoding)
+
+
+def fingerprint_settings(input_separator, output_separator, selected_source):
+    # A previous run only counts for incremental updates if it was made with the same settings
+    return {"input_separator": input_separator, "output_separator": output_separator, "source": selected_source,
+            "columns": OUTPUT_COLUMNS, "chunk_bytes": CHUNK_BYTES, "boundary_mask": CHUNK_BOUNDARY_MASK}
+
+
+# Sidecar next to the output file: fingerprint, output byte range and tag count of every chunk of the last export
+def write_fingerprints(output_file, settings, chunks):
+    header_bytes = chunks[0]["output_start"] if chunks else os.path.getsize(output_file)
+    output_bytes = chunks[-1]["output_end"] if chunks else header_bytes
+    with open(output_file + FINGERPRINT_SUFFIX, mode='w') as outfile:
+        json.dump({"settings": settings, "header_bytes": header_bytes, "output_bytes": output_bytes, "chunks": chunks}, outfile)
+
+
+def read_fingerprints(output_file, settings):
+    try:
+        with open(output_file + FINGERPRINT_SUFFIX, mode='r') as infile:
+            previous = json.load(infile)
+    except (OSError, ValueError):
+        return None
+    return previous if previous.get("settings") == settings else None
+
+
+# The previous output as bytes, or None if it was changed since the sidecar was written
+def read_previous_output(output_file, previous, header):
+    if previous is None:
+        return None
+    try:
+        with open(output_file, mode='rb') as infile:
+            data = infile.read()
+    except OSError:
+        return None
+    if len(data) != previous["output_bytes"] or data[:previous["header_bytes"]] != header:
+        return None
+    return data
+
+
+def read_output_rows(output_file, output_separator):
+    with open(output_file, mode='r', newline='') as infile:
+        reader = csv.reader(infile, delimiter=output_separator)
+        next(reader, None)
+        return {row[1]: row for row in reader if len(row) > 1}
+
+
+# Removed and added tags with the same EngUnits and Comment (matching one to one) count as renamed
+def find_renamed_tags(removed_rows, added_rows):
+    def describe(row):
+        return tuple(row[2:]) if row[3] else None
+
+    added_by_key = {}
+    for row in added_rows:
+        added_by_key.setdefault(describe(row), []).append(row[1])
+    removed_by_key = {}
+    for row in removed_rows:
+        removed_by_key.setdefault(describe(row), []).append(row[1])
+    return {old_tags[0]: added_by_key[key][0] for key, old_tags in removed_by_key.items()
+            if key is not None and len(old_tags) == 1 and len(added_by_key.get(key, ())) == 1}
+
+
+# Entries of existing tag lists (TagList.ini, Final-tag-list.ini ...) that no longer match the export
+def check_tag_lists(tag_lists, selected_source, new_rows, removed, renamed):
+    removed = set(removed)
+    limits_field = 3 + len(POLLING_COLUMNS)  # entries omit the Source column of the output rows
+    flags = []
+    for ini_file in tag_lists:
+        config = configparser.ConfigParser(interpolation=None)
+        config.optionxform = str
+        try:
+            config.read(ini_file)
+        except configparser.Error as e:
+            flags.append((ini_file, "", "", f"unreadable: {e}"))
+            continue
+        if not config.has_section(selected_source):
+            continue
+        for key, entry in config.items(selected_source):
+            fields = entry.split(';')
+            tag_name = fields[0]
+            if tag_name in renamed:
+                flags.append((ini_file, selected_source, key, f"{tag_name} was renamed to {renamed[tag_name]}"))
+            elif tag_name in removed or tag_name not in new_rows:
+                flags.append((ini_file, selected_source, key, f"{tag_name} is not in the export"))
+            elif fields[1:3] != new_rows[tag_name][2:4]:
+                flags.append((ini_file, selected_source, key, f"{tag_name} EngUnits/Comment changed in the export"))
+            elif len(fields) > limits_field and fields[limits_field:] != new_rows[tag_name][limits_field + 1:]:
+                flags.append((ini_file, selected_source, key, f"{tag_name} EU range/alarm limits changed in the export"))
+    return flags
+
+
+def format_change_report(report):
+    if report["full_run"]:
+        return [f"Full run (no usable previous fingerprints): {report['tags']} tags"]
+    lines = [f"{report['tags']} tags, re-parsed {report['reparsed_chunks']} of {report['chunks']} chunks "
+             f"({report['reparsed_bytes'] // 1024} KB)"]
+    for title, tags in (("Added", report["added"]), ("Removed", report["removed"]), ("Modified", report["modified"])):
+        lines.append(f"{title}: {len(tags)}")
+        lines += [f"  {tag}" for tag in tags]
+    lines.append(f"Renamed: {len(report['renamed'])}")
+    lines += [f"  {old} -> {new}" for old, new in report["renamed"].items()]
+    lines.append(f"Tag list entries to check: {len(report['tag_list_flags'])}")
+    lines += [f"  {ini_file} [{section}] {key}: {message}" for ini_file, section, key, message in report["tag_list_flags"]]
+    return lines
+
+
 # Get the appropriate SCADA Processor
 def get_scada_processor(scada_type):
     processors = {
@@ -62,8 +361,162 @@ def get_scada_processor(scada_type):
     return processor_class()
 
 
+# In-memory index over TagName, Comment and EngUnits
+class TagCatalog:
+    token_pattern = re.compile(r"[^\W_]+")
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.all_ids = list(range(len(rows)))
+        name_order = sorted(self.all_ids, key=lambda row_id: rows[row_id][1].lower())
+        self.name_keys = [rows[row_id][1].lower() for row_id in name_order]
+        self.name_ids = name_order
+        self.haystacks = [f"{row[1]}\t{row[2]}\t{row[3]}".lower() for row in rows]
+        token_ids = {}
+        for row_id, haystack in enumerate(self.haystacks):
+            for token in set(self.token_pattern.findall(haystack)):
+                token_ids.setdefault(token, []).append(row_id)
+        self.token_ids = token_ids
+        self.tokens = sorted(token_ids)
+
+    def prefix_search(self, query):
+        # TagName starts with query
+        first = bisect.bisect_left(self.name_keys, query)
+        last = bisect.bisect_left(self.name_keys, query + "\uffff")
+        return sorted(self.name_ids[first:last])
+
+    def substring_search(self, query):
+        return [row_id for row_id, haystack in enumerate(self.haystacks) if query in haystack]
+
+    def token_search(self, query):
+        # Every query word must start a word in TagName, EngUnits or Comment
+        matches = None
+        for query_token in self.token_pattern.findall(query):
+            first = bisect.bisect_left(self.tokens, query_token)
+            last = bisect.bisect_left(self.tokens, query_token + "\uffff")
+            ids = set()
+            for token in self.tokens[first:last]:
+                ids.update(self.token_ids[token])
+            matches = ids if matches is None else matches & ids
+        return self.all_ids if matches is None else sorted(matches)
+
+    def search(self, query, mode="substring"):
+        query = query.strip().lower()
+        if not query:
+            return self.all_ids
+        if mode == "prefix":
+            return self.prefix_search(query)
+        if mode == "token":
+            return self.token_search(query)
+        return self.substring_search(query)
+
+
+# Treeview that only holds the rows on screen; scrolling re-fills the same items from the results
+class VirtualTagGrid:
+    def __init__(self, parent, columns, row_height=20):
+        self.row_height = row_height
+        self.treeview = ttk.Treeview(parent, columns=columns, show="headings", height=15, selectmode="extended")
+        for col in columns:
+            self.treeview.heading(col, text=col)
+            self.treeview.column(col, width=150, anchor="center")
+        self.scrollbar = ttk.Scrollbar(parent, orient=tk.VERTICAL, command=self.on_scrollbar)
+        self.catalog = None
+        self.results = []
+        self.visible_ids = []
+        self.selected_ids = set()
+        self.offset = 0
+        self.page_size = 15
+        self.on_change = None
+
+        self.treeview.bind("<Configure>", self.on_resize)
+        self.treeview.bind("<<TreeviewSelect>>", self.on_select)
+        self.treeview.bind("<MouseWheel>", lambda event: self.scroll(-1 if event.delta > 0 else 1, "units"))
+        self.treeview.bind("<Button-4>", lambda event: self.scroll(-1, "units"))
+        self.treeview.bind("<Button-5>", lambda event: self.scroll(1, "units"))
+        self.treeview.bind("<Prior>", lambda event: self.scroll(-1, "pages"))
+        self.treeview.bind("<Next>", lambda event: self.scroll(1, "pages"))
+
+    def grid(self, row, column):
+        self.treeview.grid(row=row, column=column, sticky="nsew")
+        self.scrollbar.grid(row=row, column=column + 1, sticky="ns")
+
+    def set_catalog(self, catalog):
+        self.catalog = catalog
+        self.selected_ids = set()
+        self.show(catalog.all_ids)
+
+    def show(self, results):
+        self.results = results
+        self.offset = 0
+        self.refresh()
+
+    def selected_rows(self):
+        return [self.catalog.rows[row_id] for row_id in sorted(self.selected_ids)]
+
+    def select_all_results(self):
+        self.selected_ids.update(self.results)
+        self.refresh()
+
+    def clear_selection(self):
+        self.selected_ids.clear()
+        self.refresh()
+
+    def refresh(self):
+        self.offset = max(0, min(self.offset, len(self.results) - self.page_size))
+        visible_ids = self.results[self.offset:self.offset + self.page_size]
+        items = list(self.treeview.get_children())
+        while len(items) < len(visible_ids):
+            items.append(self.treeview.insert("", "end"))
+        if len(items) > len(visible_ids):
+            self.treeview.delete(*items[len(visible_ids):])
+            items = items[:len(visible_ids)]
+        for item, row_id in zip(items, visible_ids):
+            self.treeview.item(item, values=self.catalog.rows[row_id])
+        self.visible_ids = visible_ids
+        self.treeview.selection_set([item for item, row_id in zip(items, visible_ids) if row_id in self.selected_ids])
+
+        total = len(self.results)
+        if total:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.page_size) / total))
+        else:
+            self.scrollbar.set(0, 1)
+        if self.on_change:
+            self.on_change()
+
+    def on_select(self, event=None):
+        # Selection of the visible page replaces what was selected on it; other pages are kept
+        items = self.treeview.get_children()
+        selected_items = set(self.treeview.selection())
+        for item, row_id in zip(items, self.visible_ids):
+            if item in selected_items:
+                self.selected_ids.add(row_id)
+            else:
+                self.selected_ids.discard(row_id)
+        if self.on_change:
+            self.on_change()
+
+    def on_resize(self, event):
+        page_size = max(1, (event.height - self.row_height) // self.row_height)
+        if page_size != self.page_size:
+            self.page_size = page_size
+            self.refresh()
+
+    def scroll(self, amount, what):
+        step = self.page_size if what == "pages" else 3
+        self.offset += int(amount) * step
+        self.refresh()
+        return "break"
+
+    def on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            self.offset = int(float(args[1]) * len(self.results))
+            self.refresh()
+        elif args[0] == "scroll":
+            self.scroll(args[1], args[2])
+
+
 # Append selected rows to INI file
-def append_to_ini_file(selected_items, treeview, ini_file, output_separator=';'):
+def append_to_ini_file(selected_rows, ini_file, output_separator=';'):
     try:
         if not ini_file.endswith(".ini"):
             ini_file += ".ini"
@@ -73,8 +526,7 @@ def append_to_ini_file(selected_items, treeview, ini_file, output_separator=';')
         if os.path.exists(ini_file):
             config.read(ini_file)
 
-        for item in selected_items:
-            values = treeview.item(item, "values")
+        for values in selected_rows:
             if not values:
                 continue
 
@@ -82,10 +534,15 @@ def append_to_ini_file(selected_items, treeview, ini_file, output_separator=';')
             tag_name = values[1]
             eng_units = values[2] if len(values) > 2 else ''
             comment = values[3] if len(values) > 3 else ''
+            # Deadband;LogDeadband;EventLoggingPriority follow the comment when the export had them,
+            # then MinEU;MaxEU;LoLo;Lo;Hi;HiHi when the tag has an EU range or alarm limits
+            polling = list(values[4:4 + len(POLLING_COLUMNS)])
+            limits = list(values[4 + len(POLLING_COLUMNS):4 + len(POLLING_COLUMNS) + len(LIMIT_COLUMNS)])
             if source not in config.sections():
                 config.add_section(source)
 
-            entry = f"{tag_name}{output_separator}{eng_units}{output_separator}{comment}"
+            extra = polling + limits if any(limits) else (polling if any(polling) else [])
+            entry = output_separator.join([tag_name, eng_units, comment] + extra)
             config.set(source, tag_name, entry)
 
         with open(ini_file, "w") as file:
@@ -96,19 +553,22 @@ def append_to_ini_file(selected_items, treeview, ini_file, output_separator=';')
         messagebox.showerror("Error", str(e))
 
 
-# Load output file into Treeview
-def load_output_file(output_file, treeview, output_separator=';'):
+# Load output file into a tag catalog
+def load_output_file(output_file, output_separator=';'):
     try:
         with open(output_file, mode='r') as infile:
             reader = csv.DictReader(infile, delimiter=output_separator)
-            treeview.delete(*treeview.get_children())
-            for row in reader:
-                treeview.insert("", "end", values=(row['Source'], row['TagName'], row['EngUnits'], row['Comment']))
+            # Tag lists written before the polling and limit columns existed load with them empty
+            rows = [(row['Source'], row['TagName'], row['EngUnits'], row['Comment'])
+                    + tuple(row.get(column) or '' for column in POLLING_COLUMNS + LIMIT_COLUMNS) for row in reader]
+        catalog = TagCatalog(rows)
         messagebox.showinfo("Success", f"Loaded tags from {output_file}")
+        return catalog
     except KeyError as e:
         messagebox.showerror("Error", f"Missing column: {e}")
     except Exception as e:
         messagebox.showerror("Error", str(e))
+    return None
 
 
 # Populate SCADA Types
@@ -180,25 +640,103 @@ def create_gui():
 
         try:
             processor = get_scada_processor(scada_type)
-            processor.process_db_file(input_file, output_file, input_separator, output_separator, selected_source)
         except ValueError as e:
             messagebox.showerror("Error", str(e))
+            return
+
+        # Parse in the background; the worker thread only talks to Tk through the queue
+        events = queue.Queue()
+
+        incremental = incremental_var.get()
+        # Incremental runs check the tag list named below (if it exists) against the new export
+        ini_file = ini_file_var.get().strip()
+        if ini_file and not ini_file.endswith(".ini"):
+            ini_file += ".ini"
+        tag_lists = [ini_file] if ini_file and os.path.exists(ini_file) else []
+
+        def run():
+            try:
+                progress = lambda done, total: events.put(("progress", done, total))
+                if incremental:
+                    report = processor.update_tags(input_file, output_file, input_separator, output_separator, selected_source,
+                                                   progress=progress, tag_lists=tag_lists)
+                    events.put(("done", report["tags"], report))
+                else:
+                    tag_count = processor.extract_tags(input_file, output_file, input_separator, output_separator, selected_source,
+                                                       progress=progress)
+                    events.put(("done", tag_count, None))
+            except Exception as e:
+                events.put(("error", e, None))
+
+        def poll_events():
+            while True:
+                try:
+                    kind, first, second = events.get_nowait()
+                except queue.Empty:
+                    root.after(100, poll_events)
+                    return
+                if kind == "progress":
+                    progress_var.set(100 * first / second if second else 100)
+                    status_var.set(f"Processing... {first // 1024} / {second // 1024} KB")
+                else:
+                    process_button.state(["!disabled"])
+                    if kind == "done" and second is not None:
+                        progress_var.set(100)
+                        report_lines = format_change_report(second)
+                        status_var.set(report_lines[0])
+                        with open(output_file + ".changes.txt", mode='w') as outfile:
+                            outfile.write("\n".join(report_lines) + "\n")
+                        shown = report_lines if len(report_lines) <= 30 else report_lines[:30] + ["..."]
+                        messagebox.showinfo("Success", "\n".join(shown + [f"Full report: {output_file}.changes.txt"]))
+                    elif kind == "done":
+                        progress_var.set(100)
+                        status_var.set(f"{first} tags extracted")
+                        messagebox.showinfo("Success", f"Tag list has been created: {output_file}")
+                    else:
+                        status_var.set("Error")
+                        messagebox.showerror("Error", str(first))
+                    return
+
+        process_button.state(["disabled"])
+        progress_var.set(0)
+        status_var.set("Processing...")
+        threading.Thread(target=run, daemon=True).start()
+        poll_events()
 
     def load_tags():
         output_file = output_file_var.get()
         output_separator = output_sep_var.get()
-        load_output_file(output_file, treeview, output_separator)
+        catalog = load_output_file(output_file, output_separator)
+        if catalog is not None:
+            tag_grid.set_catalog(catalog)
+            run_search()
+
+    def run_search():
+        if tag_grid.catalog is not None:
+            tag_grid.show(tag_grid.catalog.search(search_var.get(), search_mode_var.get().lower()))
+
+    def schedule_search(event=None):
+        # Search once typing pauses
+        if search_job[0] is not None:
+            root.after_cancel(search_job[0])
+        search_job[0] = root.after(150, run_search)
+
+    def update_grid_status():
+        if tag_grid.catalog is None:
+            grid_status_var.set("")
+            return
+        grid_status_var.set(f"{len(tag_grid.results)} of {len(tag_grid.catalog.rows)} tags, {len(tag_grid.selected_ids)} selected")
 
     def generate_ini():
-        selected_items = treeview.selection()
+        selected_rows = tag_grid.selected_rows() if tag_grid.catalog is not None else []
         ini_file = ini_file_var.get().strip()
         if not ini_file:
             messagebox.showerror("Error", "Please specify a tag list file Name.")
             return
-        if not selected_items:
+        if not selected_rows:
             messagebox.showerror("Error", "No tags selected.")
             return
-        append_to_ini_file(selected_items, treeview, ini_file)
+        append_to_ini_file(selected_rows, ini_file)
 
     root = tk.Tk()
     root.title("Tag processor")
@@ -213,6 +751,10 @@ def create_gui():
     ini_file_var = tk.StringVar(value="tags")  # Default INI file name without extension
     input_sep_var, output_sep_var = tk.StringVar(value=';'), tk.StringVar(value=';')
     data_source_var, scada_type_var = tk.StringVar(), tk.StringVar()
+    progress_var, status_var = tk.DoubleVar(value=0), tk.StringVar()
+    incremental_var = tk.BooleanVar(value=False)
+    search_var, search_mode_var, grid_status_var = tk.StringVar(), tk.StringVar(value="Substring"), tk.StringVar()
+    search_job = [None]
 
     # Main Frame
     main_frame = ttk.Frame(root, padding=10)
@@ -261,28 +803,39 @@ def create_gui():
     output_frame = ttk.Frame(main_frame, padding=10)
     output_frame.grid(row=2, column=0, columnspan=2, sticky="nsew", pady=5)
 
-    columns = ("Source", "TagName", "EngUnits", "Comment")
-    treeview = ttk.Treeview(output_frame, columns=columns, show="headings", height=15)
-    for col in columns:
-        treeview.heading(col, text=col)
-        treeview.column(col, width=150, anchor="center")
-
-    treeview.grid(row=0, column=0, sticky="nsew")
+    search_frame = ttk.Frame(output_frame)
+    search_frame.grid(row=0, column=0, columnspan=2, sticky="ew", pady=(0, 5))
+    ttk.Label(search_frame, text="Search:").pack(side=tk.LEFT, padx=5)
+    search_entry = ttk.Entry(search_frame, textvariable=search_var, width=40)
+    search_entry.pack(side=tk.LEFT, padx=5)
+    search_entry.bind("<KeyRelease>", schedule_search)
+    search_mode = ttk.Combobox(search_frame, textvariable=search_mode_var, values=("Prefix", "Substring", "Token"), state="readonly", width=10)
+    search_mode.pack(side=tk.LEFT, padx=5)
+    search_mode.bind("<<ComboboxSelected>>", schedule_search)
+    ttk.Button(search_frame, text="Select all results", command=lambda: tag_grid.select_all_results()).pack(side=tk.LEFT, padx=5)
+    ttk.Button(search_frame, text="Clear selection", command=lambda: tag_grid.clear_selection()).pack(side=tk.LEFT, padx=5)
+    ttk.Label(search_frame, textvariable=grid_status_var).pack(side=tk.LEFT, padx=5)
 
-    scrollbar = ttk.Scrollbar(output_frame, orient=tk.VERTICAL, command=treeview.yview)
-    treeview.configure(yscroll=scrollbar.set)
-    scrollbar.grid(row=0, column=1, sticky="ns")
+    columns = ("Source", "TagName", "EngUnits", "Comment")
+    tag_grid = VirtualTagGrid(output_frame, columns)
+    tag_grid.on_change = update_grid_status
+    tag_grid.grid(row=1, column=0)
 
-    output_frame.grid_rowconfigure(0, weight=1)
+    output_frame.grid_rowconfigure(1, weight=1)
     output_frame.grid_columnconfigure(0, weight=1)
 
     # Buttons
     button_frame = ttk.Frame(main_frame, padding=10)
     button_frame.grid(row=3, column=0, columnspan=2, sticky="ew", pady=5)
 
-    ttk.Button(button_frame, text="Process Input File", command=execute_processing).grid(row=0, column=0, padx=5, pady=5)
+    process_button = ttk.Button(button_frame, text="Process Input File", command=execute_processing)
+    process_button.grid(row=0, column=0, padx=5, pady=5)
     ttk.Button(button_frame, text="Load Output File to grid", command=load_tags).grid(row=0, column=1, padx=5, pady=5)
     ttk.Button(button_frame, text="Appent to final tag list", command=generate_ini).grid(row=0, column=2, padx=5, pady=5)
+    ttk.Checkbutton(button_frame, text="Incremental (changes only)", variable=incremental_var).grid(row=0, column=3, padx=5, pady=5)
+
+    ttk.Progressbar(button_frame, variable=progress_var, maximum=100, length=200).grid(row=1, column=0, columnspan=2, sticky="ew", padx=5)
+    ttk.Label(button_frame, textvariable=status_var).grid(row=1, column=2, sticky="w", padx=5)
 
     # Populate SCADA Types and Data Sources from Config File
     config_file = "config.ini"
@@ -295,4 +848,33 @@ def create_gui():
     root.mainloop()
 
 
-create_gui()
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Extract the logged tag list from an HMI database export")
+    arg_parser.add_argument("--input", help="process this export without the GUI")
+    arg_parser.add_argument("--output", default="Output1.csv")
+    arg_parser.add_argument("--source", default="Source1-wonderware", help="data source section from config.ini")
+    arg_parser.add_argument("--scada-type", default="wonderware")
+    arg_parser.add_argument("--input-separator", default=';')
+    arg_parser.add_argument("--output-separator", default=';')
+    arg_parser.add_argument("--workers", type=int, default=None, help="parser processes (default: CPU count)")
+    arg_parser.add_argument("--incremental", action="store_true", help="only re-parse what changed since the previous run and report the changes")
+    arg_parser.add_argument("--check-tag-lists", nargs="*", default=[], metavar="INI", help="tag lists to check against the export (with --incremental)")
+    arg_parser.add_argument("--report", help="also write the change report to this file (with --incremental)")
+    args = arg_parser.parse_args()
+
+    if args.input:
+        processor = get_scada_processor(args.scada_type)
+        if args.incremental:
+            report = processor.update_tags(args.input, args.output, args.input_separator, args.output_separator, args.source,
+                                           workers=args.workers, tag_lists=args.check_tag_lists)
+            report_text = "\n".join(format_change_report(report))
+            print(report_text)
+            if args.report:
+                with open(args.report, mode='w') as outfile:
+                    outfile.write(report_text + "\n")
+        else:
+            tag_count = processor.extract_tags(args.input, args.output, args.input_separator, args.output_separator, args.source,
+                                               workers=args.workers)
+            print(f"{tag_count} tags written to {args.output}")
+    else:
+        create_gui()
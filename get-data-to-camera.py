@@ -1,204 +1,3711 @@
 import numpy as np
 import cv2
 import pyodbc
+import sqlite3
 import threading
 import multiprocessing
+from multiprocessing import shared_memory
 import time
 import configparser
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 import logging
+import os
+import queue
+import random
+import argparse
+import bisect
+import json
+import hashlib
+import struct
+import datetime
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(message)s')
 
+DEFAULT_EVENTS_TABLE = "[WWALMDB].[dbo].[Events]"
+DEFAULT_EVENT_TIME_COLUMN = "[EventStamp]"
+DEFAULT_BATCH_SIZE = 500  # SQL Server accepts at most 2100 parameters per statement
+# sqlite3 is accepted as a local stand-in for the Events table
+DB_ERRORS = (pyodbc.Error, sqlite3.Error)
+
+DEFAULT_AESTHETICS = {
+    "start_y": 20,
+    "padding": 10,
+    "text_scale": 1,
+    "text_color": (255, 255, 255),
+    "rect_color": (128, 128, 128),
+    "rect_thickness": 2,
+    "line_spacing": 5,
+    # Value box colours for tags whose value is not current
+    "stale_rect_color": (0, 200, 255),
+    "bad_rect_color": (0, 0, 255),
+    # Trend of the recent numeric values right of each value box (0 = off, see stream_aesthetics)
+    "sparkline_width": 0,
+    "sparkline_color": (255, 200, 0),
+    # Value box colours by alarm severity (Lo/Hi, LoLo/HiHi, outside MinEU..MaxEU); LoLo/HiHi boxes
+    # are also filled with their colour at this opacity (0 = outline only)
+    "warning_rect_color": (0, 255, 255),
+    "critical_rect_color": (0, 0, 255),
+    "range_rect_color": (255, 0, 255),
+    "critical_fill_alpha": 80,
+}
+WALL_TILE_SIZE = (640, 360)
+# Smaller text and boxes for the governor's reduced overlay detail
+COMPACT_AESTHETICS = {**DEFAULT_AESTHETICS, "start_y": 10, "padding": 4, "text_scale": 0.5, "rect_thickness": 1, "line_spacing": 2,
+                      "sparkline_width": 0}
+# Frame governor steps, cheapest last: frame scale before overlay, overlay detail, decode every Nth frame
+GOVERNOR_LEVELS = [
+    {"scale": 1.0, "detail": "full", "decode_every": 1},
+    {"scale": 0.75, "detail": "full", "decode_every": 1},
+    {"scale": 0.5, "detail": "full", "decode_every": 1},
+    {"scale": 0.5, "detail": "compact", "decode_every": 1},
+    {"scale": 0.5, "detail": "compact", "decode_every": 2},
+    {"scale": 0.35, "detail": "compact", "decode_every": 2},
+    {"scale": 0.35, "detail": "compact", "decode_every": 3},
+]
+
+# Shared tag value store layout: a header followed by one fixed-size slot per tag
+QUALITY_BAD, QUALITY_GOOD, QUALITY_STALE = 0, 1, 2
+STORE_HEADER_DTYPE = np.dtype([("generation", "<u8"), ("slot_count", "<u8"), ("history_capacity", "<u8"), ("layout_hash", "<u8")])
+TAG_SLOT_DTYPE = np.dtype([
+    ("seq", "<u8"),
+    ("value", "<f8"),
+    ("timestamp", "<f8"),
+    ("quality", "i1"),
+    ("text", "S47"),
+], align=True)
+HISTORY_CAPACITY = 120  # numeric samples kept per tag for the overlay sparklines
+# Alarm severity of a value against its tag's limits, ordered by how loud the box gets
+ALARM_NORMAL, ALARM_WARNING, ALARM_CRITICAL, ALARM_OUT_OF_RANGE = 0, 1, 2, 3
+LIMIT_FIELDS = ("min_eu", "max_eu", "lolo", "lo", "hi", "hihi")
+
+# Replay recordings: <name>_<start>.replay holds JPEG frames and JSON tag-value records back to back,
+# <name>_<start>.index one entry per record (memory-mapped by the replay viewer)
+REPLAY_INDEX_DTYPE = np.dtype([("time", "<f8"), ("kind", "u1"), ("offset", "<u8"), ("length", "<u4")])
+REPLAY_FRAME, REPLAY_VALUES, REPLAY_KEYFRAME = 0, 1, 2
+REPLAY_DATA_EXTENSION, REPLAY_INDEX_EXTENSION = ".replay", ".index"
+
+
+METRIC_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class RollingHistogram:
+    # Cumulative buckets for the Prometheus endpoint plus the most recent samples for quantiles.
+    # observe() is lock-free: each histogram is written by a single thread.
+    def __init__(self, buckets=METRIC_BUCKETS, window=1024):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.recent = np.zeros(window)
+        self.recent_count = 0
+
+    def observe(self, value):
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.recent[self.recent_count % len(self.recent)] = value
+        self.recent_count += 1
+
+    def quantiles(self, quantiles=(0.5, 0.95, 0.99)):
+        samples = self.recent[:min(self.recent_count, len(self.recent))]
+        if not len(samples):
+            return {}
+        return {f"p{int(q * 100)}": float(value) for q, value in zip(quantiles, np.quantile(samples, quantiles))}
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in labels.values())
+    return "{" + ",".join(f'{key}="{value}"' for key, value in zip(labels, escaped)) + "}"
+
+
+class PipelineMetrics:
+    # Per-process registry of stage timings, counters and gauges
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+        self.collectors = []
+        self.tag_refreshed_at = {}
+        self.process_label = None
+
+    def histogram(self, name, **labels):
+        key = (name, tuple(labels.items()))
+        with self.lock:
+            if key not in self.histograms:
+                self.histograms[key] = RollingHistogram()
+            return self.histograms[key]
+
+    def add(self, name, amount=1, **labels):
+        key = (name, tuple(labels.items()))
+        self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set(self, name, value, **labels):
+        self.gauges[(name, tuple(labels.items()))] = value
+
+    def add_collector(self, collector):
+        # collector() returns [(name, labels, value)] gauges evaluated at scrape/log time
+        with self.lock:
+            self.collectors.append(collector)
+
+    def remove_collector(self, collector):
+        with self.lock:
+            if collector in self.collectors:
+                self.collectors.remove(collector)
+
+    def mark_tags_refreshed(self, source, tag_names, now=None):
+        now = time.time() if now is None else now
+        for tag_name in tag_names:
+            self.tag_refreshed_at[(source, tag_name)] = now
+
+    def collect_gauges(self):
+        now = time.time()
+        gauges = [(name, dict(labels), value) for (name, labels), value in list(self.gauges.items())]
+        gauges += [("arcam_tag_value_age_seconds", {"source": source, "tag": tag_name}, now - refreshed_at)
+                   for (source, tag_name), refreshed_at in list(self.tag_refreshed_at.items())]
+        with self.lock:
+            collectors = list(self.collectors)
+        for collector in collectors:
+            gauges += collector()
+        return gauges
+
+    def render_prometheus(self):
+        lines = []
+        with self.lock:
+            histograms = list(self.histograms.items())
+        for (name, labels), histogram in sorted(histograms, key=lambda item: item[0]):
+            labels = dict(labels)
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + (float("inf"),), histogram.bucket_counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{format_labels({**labels, 'le': le})} {cumulative}")
+            lines.append(f"{name}_sum{format_labels(labels)} {histogram.sum}")
+            lines.append(f"{name}_count{format_labels(labels)} {histogram.count}")
+        for (name, labels), value in sorted(list(self.counters.items())):
+            lines.append(f"{name}{format_labels(dict(labels))} {value}")
+        for name, labels, value in self.collect_gauges():
+            lines.append(f"{name}{format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        # Compact form for the periodic structured log line
+        with self.lock:
+            histograms = list(self.histograms.items())
+        stages = {}
+        for (name, labels), histogram in histograms:
+            key = name + format_labels(dict(labels))
+            stages[key] = {"count": histogram.count, **{q: round(v * 1000, 3) for q, v in histogram.quantiles().items()}}
+        counters = {name + format_labels(dict(labels)): value for (name, labels), value in list(self.counters.items())}
+        gauges = {}
+        oldest_tag = {}
+        for name, labels, value in self.collect_gauges():
+            if name == "arcam_tag_value_age_seconds":
+                oldest_tag[labels["source"]] = max(oldest_tag.get(labels["source"], 0), round(value, 1))
+            else:
+                gauges[name + format_labels(labels)] = round(value, 3) if isinstance(value, float) else value
+        return {"stages_ms": stages, "counters": counters, "gauges": gauges, "max_tag_age_seconds": oldest_tag}
+
+
+METRICS = PipelineMetrics()
+
+
+def start_metrics_reporting(process_label, db_file='config.ini'):
+    # [metrics] http_port > 0 serves /metrics (tries the next ports if taken, one per process);
+    # log_interval > 0 writes a JSON summary line every log_interval seconds.
+    # Once per process: later calls (a pooled worker starting its next stream) only relabel it.
+    started = METRICS.process_label is not None
+    METRICS.process_label = process_label
+    if started:
+        return
+    parser = configparser.ConfigParser(interpolation=None)
+    parser.read(db_file)
+    options = dict(parser.items("metrics")) if parser.has_section("metrics") else {}
+    http_port = int(options.get("http_port", 0))
+    log_interval = float(options.get("log_interval", 0))
+
+    if http_port:
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = METRICS.render_prometheus().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        host = options.get("http_host", "127.0.0.1")
+        for port in range(http_port, http_port + 16):
+            try:
+                server = ThreadingHTTPServer((host, port), Handler)
+            except OSError:
+                continue
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+            logging.info(f"Metrics for {process_label} on http://{host}:{port}/metrics")
+            break
+        else:
+            logging.warning(f"No free metrics port in {http_port}-{http_port + 15} for {process_label}")
+
+    if log_interval:
+        def log_summary():
+            while True:
+                time.sleep(log_interval)
+                logging.info("metrics " + json.dumps({"process": METRICS.process_label, **METRICS.summary()}))
+
+        threading.Thread(target=log_summary, name="metrics-log", daemon=True).start()
+
 
 def read_config(db_file='config.ini', tag_file=None):
     parser = configparser.ConfigParser(interpolation=None)
 
-    # Read database configurations
-    parser.read(db_file)
-    db_configs = {section: dict(parser.items(section)) for section in parser.sections() if section.startswith('Source')}
+    # Read database configurations
+    parser.read(db_file)
+    db_configs = {section: dict(parser.items(section)) for section in parser.sections() if section.startswith('Source')}
+
+    # Read stream configurations
+    streams = {}
+    for section in parser.sections():
+        if section.startswith("stream"):
+            streams[parser.get(section, "name")] = parser.get(section, "source")
+
+    # Read tags configuration only if tag_file is provided
+    tag_configs = {}
+    if tag_file:
+        try:
+            # Separate parser so the DB settings of a Source section do not show up as tags
+            tag_parser = configparser.ConfigParser(interpolation=None)
+            tag_parser.read(tag_file)
+            tag_configs = {section: dict(tag_parser.items(section)) for section in tag_parser.sections() if section.startswith('Source')}
+        except Exception as e:
+            print(f"Error reading tags file: {e}")
+
+    return db_configs, tag_configs, streams
+
+
+def read_stream_options(db_file='config.ini'):
+    # Per-stream options (output sinks etc.), keyed by stream source
+    parser = configparser.ConfigParser(interpolation=None)
+    parser.read(db_file)
+    return {parser.get(section, "source"): dict(parser.items(section)) for section in parser.sections() if section.startswith("stream")}
+
+
+def build_connection_string(db_config):
+    return (
+        f"Driver={db_config['driver']};"
+        f"SERVER={db_config['server']};"
+        f"DATABASE={db_config['database']};"
+        f"UID={db_config['uid']};"
+        f"PWD={db_config['pwd']};"
+    )
+
+
+def quality_for_value(text):
+    return QUALITY_BAD if text == "No data" else QUALITY_GOOD
+
+
+class TagValues(dict):
+    # {tag: text} for one source plus a quality flag per tag; writing a value makes it current
+    def __init__(self, values=(), quality=None):
+        super().__init__(values)
+        self.quality = dict(quality) if quality is not None else {tag_name: QUALITY_STALE for tag_name in self}
+
+    def __setitem__(self, tag_name, value):
+        super().__setitem__(tag_name, value)
+        self.quality[tag_name] = quality_for_value(value)
+
+    def set_quality(self, tag_names, quality):
+        # Keeps the last known values, only flags them (DB unreachable etc.)
+        for tag_name in tag_names:
+            if tag_name in self.quality:
+                self.quality[tag_name] = quality
+
+    def publish(self):
+        # Values are read in place; nothing to hand over at the end of a poll cycle
+        pass
+
+
+class ValueSnapshots:
+    # In-process tag values shared by poller threads and renderers. Each source's poller fills a
+    # private working copy and publishes it at the end of a cycle as a new immutable TagValues;
+    # readers take (version, {source: TagValues}) without locking and never see a half-done cycle.
+    def __init__(self, tag_configs):
+        initial = initialize_latest_values(tag_configs)
+        self.lock = threading.Lock()  # serializes publishers only
+        self.current = (0, initial)
+        self.history = TagHistory(tag_configs)
+        self.writers = {source: SnapshotSourceValues(self, source, values) for source, values in initial.items()}
+
+    def publish(self, source, values):
+        with self.lock:
+            version, sources = self.current
+            sources = dict(sources)
+            sources[source] = values
+            # A single reference assignment, so readers get either the old or the new tuple
+            self.current = (version + 1, sources)
+
+    def read_snapshot(self):
+        return self.current
+
+
+class SnapshotSourceValues:
+    # Poller side of ValueSnapshots for one source
+    def __init__(self, snapshots, source, values):
+        self.snapshots = snapshots
+        self.source = source
+        self.values = TagValues(values, values.quality)
+        self.changed = False
+
+    def __setitem__(self, tag_name, value):
+        if self.values.get(tag_name) != value or self.values.quality.get(tag_name) != quality_for_value(value):
+            self.values[tag_name] = value
+            self.changed = True
+            # A sample per change, as SharedTagStore.write records them, whatever the fetch mode
+            slot = self.snapshots.history.slots.get((self.source, tag_name))
+            if slot is not None:
+                self.snapshots.history.append(slot, parse_numeric(value), time.time())
+
+    def set_quality(self, tag_names, quality):
+        if any(self.values.quality.get(tag_name, quality) != quality for tag_name in tag_names):
+            self.values.set_quality(tag_names, quality)
+            self.changed = True
+
+    def publish(self):
+        # Cycles that changed nothing keep the version, so renderers skip their value pass
+        if self.changed:
+            self.snapshots.publish(self.source, TagValues(self.values, self.values.quality))
+            self.changed = False
+
+
+def initialize_latest_values(tag_configs):
+    valid_values = {source: TagValues({tag: "Fetching..." for tag, value in tags.items() if ";" in value}) for source, tags in tag_configs.items()}
+    return valid_values
+
+
+def get_fetch_options(db_config):
+    mode = db_config.get("fetch_mode", "incremental").strip().lower()
+    return {
+        "mode": mode,
+        "batched": mode != "per_tag",
+        "batched_ok": False,  # set once the batched statement has run on this source
+        "batch_size": max(1, int(db_config.get("batch_size", DEFAULT_BATCH_SIZE))),
+        "events_table": db_config.get("events_table", DEFAULT_EVENTS_TABLE),
+        "time_column": db_config.get("event_time_column", DEFAULT_EVENT_TIME_COLUMN),
+        "poll_interval": float(db_config.get("poll_interval", 1)),
+        "min_interval": float(db_config.get("min_interval", 0.25)),
+        "max_interval": float(db_config.get("max_interval", 10)),
+        "event_id_overlap": max(0, int(db_config.get("event_id_overlap", 100))),
+    }
+
+
+def get_tag_db_names(tags):
+    return {tag_name: tag_info.split(';')[0] for tag_name, tag_info in tags.items()}
+
+
+def parse_float(text, default):
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        return default
+
+
+def parse_tag_polling(tag_info):
+    # Optional fields after the comment (written by generate-tag-list.py from DB.CSV):
+    # TagName;EngUnits;Comment;Deadband;LogDeadband;EventLoggingPriority
+    tag_parts = tag_info.split(';')
+    return {
+        "deadband": max(parse_float(tag_parts[3] if len(tag_parts) > 3 else None, 0.0),
+                        parse_float(tag_parts[4] if len(tag_parts) > 4 else None, 0.0)),
+        "priority": parse_float(tag_parts[5] if len(tag_parts) > 5 else None, None),
+    }
+
+
+def parse_tag_limits(tag_info):
+    # Fields after the polling ones: MinEU;MaxEU;LoLoAlarmValue;LoAlarmValue;HiAlarmValue;HiHiAlarmValue
+    # (NaN where a tag has no such limit)
+    tag_parts = tag_info.split(';')[6:6 + len(LIMIT_FIELDS)]
+    return [parse_float(part, np.nan) for part in tag_parts] + [np.nan] * (len(LIMIT_FIELDS) - len(tag_parts))
+
+
+def chunk_list(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def build_latest_values_query(events_table, tag_count):
+    # Latest row per TagName in one statement: each MAX(EventID) is a single index seek (or a
+    # backward scan stopping at the first match), unlike a window over every event of the tag
+    latest_ids = " UNION ALL ".join([f"SELECT MAX(EventID) FROM {events_table} WHERE [TagName] = ?"] * tag_count)
+    return f"SELECT TagName, ValueString FROM {events_table} WHERE EventID IN ({latest_ids})"
+
+
+def build_single_value_query(events_table):
+    return (
+        f"SELECT ValueString FROM {events_table} "
+        f"WHERE EventID = (SELECT MAX(EventID) FROM {events_table} WHERE [TagName] = ?)"
+    )
+
+
+def fetch_latest_values_batched(conn, db_names, events_table, batch_size):
+    results = {}
+    unique_names = list(dict.fromkeys(db_names))
+    for chunk in chunk_list(unique_names, batch_size):
+        cursor = conn.execute(build_latest_values_query(events_table, len(chunk)), chunk)
+        for tag_db_name, value in cursor.fetchall():
+            results[tag_db_name] = value
+    return results
+
+
+def fetch_latest_values_per_tag(conn, db_names, events_table):
+    results = {}
+    query = build_single_value_query(events_table)
+    for tag_db_name in dict.fromkeys(db_names):
+        row = conn.execute(query, (tag_db_name,)).fetchone()
+        if row:
+            results[tag_db_name] = row[0]
+    return results
+
+
+def build_max_event_id_query(events_table):
+    return f"SELECT MAX(EventID) FROM {events_table}"
+
+
+def build_new_events_query(events_table, tag_count):
+    # Events of the given tags in an EventID range, oldest first so the newest value of a tag wins
+    tag_params = ", ".join(["?"] * tag_count)
+    return (
+        f"SELECT EventID, TagName, ValueString FROM {events_table} "
+        f"WHERE EventID > ? AND EventID <= ? AND [TagName] IN ({tag_params}) ORDER BY EventID"
+    )
+
+
+def is_statement_rejected(error):
+    # Syntax / unsupported statement errors, as opposed to timeouts, deadlocks and dropped connections:
+    # SQLSTATE 42000 from ODBC, SQLITE_ERROR from the sqlite3 stand-in. HY000 is the general
+    # driver error that link failures also come as, so it is not taken for a rejection.
+    if isinstance(error, sqlite3.Error):
+        return getattr(error, "sqlite_errorname", None) == "SQLITE_ERROR"
+    return bool(error.args) and error.args[0] == "42000"
+
+
+def fetch_latest_values(conn, db_names, source, fetch_options):
+    events_table = fetch_options["events_table"]
+    if not fetch_options["batched"]:
+        return fetch_latest_values_per_tag(conn, db_names, events_table)
+    try:
+        results = fetch_latest_values_batched(conn, list(db_names), events_table, fetch_options["batch_size"])
+    except DB_ERRORS as e:
+        # Once the batched statement has run it is supported; other errors go to the reconnect path
+        if fetch_options["batched_ok"] or not is_statement_rejected(e):
+            raise
+        # Server rejected the batched statement: switch to per-tag queries if those work
+        results = fetch_latest_values_per_tag(conn, db_names, events_table)
+        logging.warning(f"Batched query not supported for {source}, using per-tag queries: {e}")
+        fetch_options["batched"] = False
+        return results
+    fetch_options["batched_ok"] = True
+    return results
+
+
+def get_latest_values(conn, tags, source, latest_values, fetch_options=None):
+    # DB errors propagate to query_database_periodically, which flags the values and reconnects
+    if fetch_options is None:
+        fetch_options = get_fetch_options({})
+    tag_db_names = get_tag_db_names(tags)
+    results = fetch_latest_values(conn, tag_db_names.values(), source, fetch_options)
+    for tag_name, tag_db_name in tag_db_names.items():
+        latest_values[source][tag_name] = results.get(tag_db_name, "No data")
+    METRICS.mark_tags_refreshed(source, tag_db_names)
+    return len(results)
+
+
+class EventWatermarkPoller:
+    # Remembers the highest EventID seen and only reads newer events of its tags on each cycle
+    def __init__(self, source, tags, latest_values, fetch_options, fetch_rows=1000):
+        self.source = source
+        self.tags = tags
+        self.latest_values = latest_values
+        self.fetch_options = fetch_options
+        self.fetch_rows = fetch_rows
+        self.tags_by_db_name = {}
+        for tag_name, tag_db_name in get_tag_db_names(tags).items():
+            self.tags_by_db_name.setdefault(tag_db_name, []).append(tag_name)
+        self.last_event_id = None
+        self.rows_last_cycle = 0
+        self.total_rows = 0
+        self.cycles = 0
+
+    def reset(self):
+        # Forces a full resync on the next cycle (startup, reconnect, DB error)
+        self.last_event_id = None
+
+    def resync(self, conn):
+        events_table = self.fetch_options["events_table"]
+        # Read the watermark first so events written during the resync are picked up next cycle
+        row = conn.execute(build_max_event_id_query(events_table)).fetchone()
+        watermark = row[0] if row and row[0] is not None else 0
+        results = fetch_latest_values(conn, self.tags_by_db_name.keys(), self.source, self.fetch_options)
+        values = self.latest_values[self.source]
+        for tag_db_name, tag_names in self.tags_by_db_name.items():
+            value = results.get(tag_db_name, "No data")
+            for tag_name in tag_names:
+                values[tag_name] = value
+        self.last_event_id = watermark
+        logging.info(f"Full resync for {self.source}: {len(results)} tags with data, EventID watermark {watermark}")
+        return len(results)
+
+    def poll_new_events(self, conn):
+        # Every chunk of tags reads the same EventID range, capped at the MAX(EventID) read first, so
+        # events written while the chunks run are left for the next cycle rather than half-read.
+        # The range starts event_id_overlap below the watermark: an identity value taken by a
+        # transaction that commits after a higher one would otherwise be skipped for good.
+        events_table = self.fetch_options["events_table"]
+        row = conn.execute(build_max_event_id_query(events_table)).fetchone()
+        upper = row[0] if row and row[0] is not None else self.last_event_id
+        lower = max(0, self.last_event_id - self.fetch_options["event_id_overlap"])
+        if upper <= lower:
+            return 0
+        # Only the newest value of each tag in the range is written: the overlap re-reads events
+        # that were applied before, and replaying them one by one would flip values back and forth
+        newest = {}
+        rows = 0
+        for chunk in chunk_list(list(self.tags_by_db_name), self.fetch_options["batch_size"]):
+            cursor = conn.execute(build_new_events_query(events_table, len(chunk)), [lower, upper] + chunk)
+            while True:
+                batch = cursor.fetchmany(self.fetch_rows)
+                if not batch:
+                    break
+                rows += len(batch)
+                for event_id, tag_db_name, value in batch:
+                    newest[tag_db_name] = value
+        values = self.latest_values[self.source]
+        for tag_db_name, value in newest.items():
+            for tag_name in self.tags_by_db_name[tag_db_name]:
+                values[tag_name] = value
+        self.last_event_id = max(self.last_event_id, upper)
+        return rows
+
+    def next_delay(self):
+        return self.fetch_options["poll_interval"]
+
+    def poll(self, conn):
+        # DB errors propagate; the caller resets the watermark once it has a new connection
+        if self.last_event_id is None:
+            rows = self.resync(conn)
+        else:
+            rows = self.poll_new_events(conn)
+        # No newer events means every value is still current
+        METRICS.mark_tags_refreshed(self.source, self.tags)
+        self.cycles += 1
+        self.rows_last_cycle = rows
+        self.total_rows += rows
+        logging.debug(f"{self.source}: {rows} rows pulled (EventID > {self.last_event_id}, total {self.total_rows} in {self.cycles} cycles)")
+        return rows
+
+
+class TagPollScheduler:
+    # Gives every tag its own poll interval between min_interval and max_interval: halved when the
+    # value moved by more than the tag's deadband, stretched by half when it did not. Due times sit
+    # on a min_interval grid, so tags falling due together are fetched by one batched query.
+    # EventLoggingPriority (1 = most important ... 999) caps how far a quiet tag's interval can grow.
+    def __init__(self, source, tags, latest_values, fetch_options):
+        self.source = source
+        self.latest_values = latest_values
+        self.fetch_options = fetch_options
+        self.min_interval = max(0.01, fetch_options["min_interval"])
+        self.max_interval = max(self.min_interval, fetch_options["max_interval"])
+        start_interval = min(max(fetch_options["poll_interval"], self.min_interval), self.max_interval)
+        self.tags_by_db_name = {}
+        for tag_name, tag_db_name in get_tag_db_names(tags).items():
+            self.tags_by_db_name.setdefault(tag_db_name, []).append(tag_name)
+        self.state = {}
+        for tag_name, tag_info in tags.items():
+            tag_db_name = tag_info.split(';')[0]
+            if tag_db_name in self.state:
+                continue
+            polling = parse_tag_polling(tag_info)
+            limit = self.max_interval
+            if polling["priority"] is not None:
+                share = min(max(polling["priority"], 1), 999) / 999
+                limit = self.min_interval + (self.max_interval - self.min_interval) * share
+            self.state[tag_db_name] = {
+                "deadband": polling["deadband"],
+                "limit": limit,
+                "interval": min(start_interval, limit),
+                "next_due": 0.0,
+                "value": None,
+            }
+        self.rows_last_cycle = 0
+
+    def reset(self):
+        # Everything is due on the next cycle (startup, reconnect)
+        for state in self.state.values():
+            state["next_due"] = 0.0
+
+    def align(self, due):
+        # Nearest grid point: a poll that runs a little late does not push the next one a whole step
+        return round(due / self.min_interval) * self.min_interval
+
+    def due_tags(self, now):
+        # Tags due within a tenth of a grid step are fetched together
+        now += self.min_interval / 10
+        return [tag_db_name for tag_db_name, state in self.state.items() if state["next_due"] <= now]
+
+    def next_delay(self):
+        if not self.state:
+            return self.max_interval
+        return max(0.0, min(state["next_due"] for state in self.state.values()) - time.monotonic())
+
+    def changed(self, state, value):
+        if state["value"] is None:
+            return True
+        old, new = parse_float(state["value"], None), parse_float(value, None)
+        if old is None or new is None:
+            return value != state["value"]
+        return abs(new - old) > state["deadband"]
+
+    def poll(self, conn):
+        now = time.monotonic()
+        due = self.due_tags(now)
+        if not due:
+            return 0
+        results = fetch_latest_values(conn, due, self.source, self.fetch_options)
+        values = self.latest_values[self.source]
+        refreshed = []
+        for tag_db_name in due:
+            state = self.state[tag_db_name]
+            value = results.get(tag_db_name, "No data")
+            if self.changed(state, value):
+                state["interval"] = max(self.min_interval, state["interval"] / 2)
+                state["value"] = value
+            else:
+                state["interval"] = min(state["limit"], state["interval"] * 1.5)
+            state["next_due"] = self.align(now + state["interval"])
+            for tag_name in self.tags_by_db_name[tag_db_name]:
+                values[tag_name] = value
+                refreshed.append(tag_name)
+        METRICS.mark_tags_refreshed(self.source, refreshed)
+        METRICS.set("arcam_db_tags_polled_last_cycle", len(due), source=self.source)
+        self.rows_last_cycle = len(results)
+        return len(results)
+
+
+class PooledConnection:
+    # DB-API connection that keeps one cursor per SQL text, so the driver prepares each statement
+    # once per connection and only re-binds the parameters on later cycles
+    def __init__(self, conn):
+        self.conn = conn
+        self.cursors = {}
+        self.last_used = time.monotonic()
+
+    def execute(self, sql, params=()):
+        cursor = self.cursors.get(sql)
+        if cursor is None:
+            cursor = self.cursors[sql] = self.conn.cursor()
+        if params:
+            cursor.execute(sql, params)
+        else:
+            cursor.execute(sql)
+        return cursor
+
+    def close(self):
+        self.cursors.clear()
+        try:
+            self.conn.close()
+        except DB_ERRORS:
+            pass
+
+
+class ConnectionPool:
+    # Connections for one Source section, shared by every poller thread of the process.
+    # Idle connections are health-checked before reuse; failed ones are dropped and reopened.
+    def __init__(self, source, db_config, connect=None):
+        self.source = source
+        self.connection_string = build_connection_string(db_config)
+        self.connect = connect or pyodbc.connect
+        self.size = max(1, int(db_config.get("pool_size", 2)))
+        self.health_check_interval = float(db_config.get("health_check_interval", 30))
+        self.min_delay = float(db_config.get("reconnect_min_delay", 1))
+        self.max_delay = float(db_config.get("reconnect_max_delay", 60))
+        self.idle = []
+        self.lock = threading.Lock()
+        self.users = 0
+        self.opened = 0
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                conn = self.idle.pop() if self.idle else None
+            if conn is None:
+                conn = PooledConnection(self.connect(self.connection_string))
+                self.opened += 1
+                METRICS.add("arcam_db_connects_total", source=self.source)
+                return conn
+            if time.monotonic() - conn.last_used < self.health_check_interval or self.is_healthy(conn):
+                return conn
+            logging.warning(f"Dropping unhealthy pooled connection for {self.source}")
+            conn.close()
+
+    def is_healthy(self, conn):
+        try:
+            conn.execute("SELECT 1").fetchall()
+            return True
+        except DB_ERRORS:
+            return False
+
+    def release(self, conn):
+        conn.last_used = time.monotonic()
+        with self.lock:
+            if len(self.idle) < self.size:
+                self.idle.append(conn)
+                return
+        conn.close()
+
+    def discard(self, conn):
+        conn.close()
+
+    def reconnect_delay(self, attempt):
+        # Exponential backoff with jitter so pollers of one server do not reconnect in lockstep
+        delay = min(self.max_delay, self.min_delay * 2 ** min(attempt, 30))
+        return random.uniform(delay / 2, delay)
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for conn in idle:
+            conn.close()
+
+
+CONNECTION_POOLS = {}
+CONNECTION_POOLS_LOCK = threading.Lock()
+
+
+def get_connection_pool(source, db_config, connect=None):
+    key = (source, build_connection_string(db_config), connect)
+    with CONNECTION_POOLS_LOCK:
+        pool = CONNECTION_POOLS.get(key)
+        if pool is None:
+            pool = CONNECTION_POOLS[key] = ConnectionPool(source, db_config, connect)
+            pool.key = key
+        pool.users += 1
+    return pool
+
+
+def release_connection_pool(pool):
+    with CONNECTION_POOLS_LOCK:
+        pool.users -= 1
+        if pool.users > 0:
+            return
+        CONNECTION_POOLS.pop(pool.key, None)
+    pool.close()
+
+
+class FlakyDriver:
+    # Wraps a DB-API connect() and injects latency, random failures and outages into connects
+    # and statements (testing and benchmarks, e.g. FlakyDriver(sqlite3.connect).connect)
+    def __init__(self, connect, failure_rate=0.0, latency=0.0, seed=None):
+        self.real_connect = connect
+        self.failure_rate = failure_rate
+        self.latency = latency
+        self.rng = random.Random(seed)
+        self.down_until = 0.0
+        self.connects = 0
+        self.injected_failures = 0
+
+    def outage(self, seconds):
+        # Every connect and statement fails until the outage is over, like a dropped server
+        self.down_until = time.monotonic() + seconds
+
+    def check(self):
+        if self.latency:
+            time.sleep(self.latency)
+        if time.monotonic() < self.down_until or self.rng.random() < self.failure_rate:
+            self.injected_failures += 1
+            raise sqlite3.OperationalError("injected failure")
+
+    def connect(self, connection_string):
+        self.check()
+        self.connects += 1
+        return FlakyConnection(self, self.real_connect(connection_string))
+
+
+class FlakyConnection:
+    def __init__(self, driver, conn):
+        self.driver = driver
+        self.conn = conn
+
+    def cursor(self):
+        return FlakyCursor(self.driver, self.conn.cursor())
+
+    def close(self):
+        self.conn.close()
+
+
+class FlakyCursor:
+    def __init__(self, driver, cursor):
+        self.driver = driver
+        self.cursor = cursor
+
+    def execute(self, *args):
+        self.driver.check()
+        return self.cursor.execute(*args)
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+
+def query_database_periodically(source, db_config, tags, latest_values, stop_event=None, connect=None):
+    # connect defaults to pyodbc.connect; any DB-API connect(connection_string) works (e.g. a SQLite stand-in).
+    # DB errors never end the thread: values keep their last text flagged stale (bad after bad_after
+    # seconds) while the pool reconnects with backoff.
+    stop_event = stop_event or threading.Event()
+    try:
+        pool = get_connection_pool(source, db_config, connect)
+    except Exception as e:
+        logging.error(f"Invalid database configuration for source {source}: {e}")
+        return
+    try:
+        fetch_options = get_fetch_options(db_config)
+        poller = None
+        if fetch_options["mode"] == "incremental":
+            poller = EventWatermarkPoller(source, tags, latest_values, fetch_options)
+        elif fetch_options["mode"] == "scheduled":
+            poller = TagPollScheduler(source, tags, latest_values, fetch_options)
+        tag_names = list(get_tag_db_names(tags))
+        bad_after = float(db_config.get("bad_after", 30))
+        cycle_time = METRICS.histogram("arcam_db_cycle_seconds", source=source)
+        failures = 0
+        outage_start = None
+        while not stop_event.is_set():
+            start = time.perf_counter()
+            conn = None
+            try:
+                conn = pool.acquire()
+                if poller:
+                    rows = poller.poll(conn)
+                else:
+                    rows = get_latest_values(conn, tags, source, latest_values, fetch_options)
+            except DB_ERRORS as e:
+                if conn is not None:
+                    pool.discard(conn)
+                if poller:
+                    poller.reset()
+                outage_start = outage_start or time.monotonic()
+                quality = QUALITY_BAD if time.monotonic() - outage_start >= bad_after else QUALITY_STALE
+                latest_values[source].set_quality(tag_names, quality)
+                latest_values[source].publish()
+                delay = pool.reconnect_delay(failures)
+                failures += 1
+                logging.error(f"Database error for {source} (attempt {failures}, retrying in {delay:.1f} s): {e}")
+                METRICS.add("arcam_db_errors_total", source=source)
+                METRICS.set("arcam_db_up", 0, source=source)
+                wake = time.monotonic() + delay
+                if quality == QUALITY_STALE and outage_start + bad_after < wake:
+                    # Do not wait for the next attempt to flag values bad
+                    stop_event.wait(max(0.0, outage_start + bad_after - time.monotonic()))
+                    latest_values[source].set_quality(tag_names, QUALITY_BAD)
+                    latest_values[source].publish()
+                stop_event.wait(max(0.0, wake - time.monotonic()))
+                continue
+            pool.release(conn)
+            latest_values[source].publish()
+            if failures:
+                logging.info(f"Database for {source} back after {time.monotonic() - outage_start:.1f} s ({failures} failed attempts)")
+                failures = 0
+                outage_start = None
+            METRICS.set("arcam_db_up", 1, source=source)
+            cycle_time.observe(time.perf_counter() - start)
+            METRICS.add("arcam_db_rows_total", rows, source=source)
+            METRICS.set("arcam_db_rows_last_cycle", rows, source=source)
+            stop_event.wait(poller.next_delay() if poller else fetch_options["poll_interval"])
+    except Exception as e:
+        logging.error(f"Unexpected error in process for {source}: {e}")
+    finally:
+        release_connection_pool(pool)
+
+
+def build_tag_slots(tag_configs):
+    # Same order and filtering as initialize_latest_values, so every process derives the same slots
+    slots = {}
+    for source, tags in tag_configs.items():
+        for tag_name, tag_info in tags.items():
+            if ";" in tag_info:
+                slots[(source, tag_name)] = len(slots)
+    return slots
+
+
+def tag_layout_hash(tag_configs):
+    # Fingerprint of the ordered slot layout and tag definitions: processes attaching to a shared
+    # store with a different version of the tags file must not show values under the wrong labels
+    digest = hashlib.blake2b(digest_size=8)
+    for source, tags in tag_configs.items():
+        for tag_name, tag_info in tags.items():
+            if ";" in tag_info:
+                digest.update(f"{source}\x00{tag_name}\x00{tag_info}\x01".encode("utf-8"))
+    return int.from_bytes(digest.digest(), "little")
+
+
+def parse_numeric(text):
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class TagHistory:
+    # Ring buffer of the last capacity numeric samples (value, time) of every tag, preallocated in
+    # one block (private memory or the shared tag store), so recording a sample creates no Python
+    # objects. Non-numeric values are not recorded. Slots are the same as build_tag_slots.
+    def __init__(self, tag_configs, capacity=HISTORY_CAPACITY, buffer=None, offset=0):
+        self.slots = build_tag_slots(tag_configs)
+        self.capacity = capacity
+        slot_count = max(1, len(self.slots))
+        if buffer is None:
+            buffer = bytearray(self.nbytes(len(self.slots), capacity))
+        self.counts = np.ndarray((slot_count,), np.int64, buffer=buffer, offset=offset)  # samples ever written
+        offset += self.counts.nbytes
+        self.values = np.ndarray((slot_count, capacity), np.float64, buffer=buffer, offset=offset)
+        offset += self.values.nbytes
+        self.times = np.ndarray((slot_count, capacity), np.float64, buffer=buffer, offset=offset)
+
+    @staticmethod
+    def nbytes(slot_count, capacity):
+        slot_count = max(1, slot_count)
+        return slot_count * 8 + 2 * slot_count * capacity * 8
+
+    def append(self, slot, value, timestamp):
+        if value != value:
+            return
+        position = self.counts[slot] % self.capacity
+        self.values[slot, position] = value
+        self.times[slot, position] = timestamp
+        # Counted last, so a reader never takes a slot that is not written yet
+        self.counts[slot] += 1
+
+    def close(self):
+        # Lets a shared memory block holding the buffers be closed
+        self.counts = self.values = self.times = None
+
+    def generation(self):
+        # Moves with every recorded sample; renderers redraw trends only when it does
+        return int(self.counts.sum())
+
+    def window(self, slots, length):
+        # Last length samples of each slot, oldest first, as a (len(slots), length) array with NaN
+        # in front where a slot has fewer; plus the number of valid samples per slot
+        counts = self.counts[slots]
+        steps = np.arange(length)
+        positions = (counts[:, None] - length + steps) % self.capacity
+        valid_counts = np.minimum(counts, length)
+        values = np.where(steps >= length - valid_counts[:, None], self.values[slots[:, None], positions], np.nan)
+        return values, valid_counts
+
+
+def sparkline_polylines(history, slots, lefts, tops, heights, width, inset=4):
+    # Points of every sparkline in one vectorized pass: each tag's window scaled to its own
+    # min..max inside its box (flat lines in the middle). Tags with fewer than 2 samples get none.
+    samples = int(min(history.capacity, max(2, width)))
+    values, valid_counts = history.window(np.asarray(slots, np.int64), samples)
+    valid = ~np.isnan(values)
+    low = np.where(valid, values, np.inf).min(axis=1)[:, None]
+    high = np.where(valid, values, -np.inf).max(axis=1)[:, None]
+    with np.errstate(invalid="ignore"):
+        scaled = np.where(high > low, (values - low) / np.where(high > low, high - low, 1), 0.5)
+    tops, heights = np.asarray(tops, np.float64)[:, None], np.asarray(heights, np.float64)[:, None]
+    y = np.where(valid, tops + inset + (1 - scaled) * (heights - 2 * inset), 0)
+    x = np.asarray(lefts, np.float64)[:, None] + np.arange(samples) * (width / (samples - 1))
+    points = np.rint(np.stack([x, y], axis=2)).astype(np.int32)
+    return [points[index, samples - count:] for index, count in enumerate(valid_counts) if count >= 2]
+
+
+class AlarmLimits:
+    # EU range and alarm limits of every tag in one (6, slots) float array, NaN where a limit is not
+    # set, with the slots of build_tag_slots. evaluate() gives the severity of all tags in one
+    # vectorized pass; NaN never compares true, so missing limits and non-numeric values stay normal.
+    def __init__(self, tag_configs):
+        self.slots = build_tag_slots(tag_configs)
+        self.table = np.full((len(LIMIT_FIELDS), len(self.slots)), np.nan)
+        for (source, tag_name), slot in self.slots.items():
+            self.table[:, slot] = parse_tag_limits(tag_configs[source][tag_name])
+        # One contiguous row per limit keeps the comparisons at memory speed
+        self.min_eu, self.max_eu, self.lolo, self.lo, self.hi, self.hihi = self.table
+        self.count = int((~np.isnan(self.table)).any(axis=0).sum())  # tags with at least one limit
+
+    def evaluate(self, values):
+        # values: float array by slot (NaN = no numeric value)
+        severity = np.zeros(len(values), np.int8)
+        with np.errstate(invalid="ignore"):
+            severity[(values <= self.lo) | (values >= self.hi)] = ALARM_WARNING
+            severity[(values <= self.lolo) | (values >= self.hihi)] = ALARM_CRITICAL
+            severity[(values < self.min_eu) | (values > self.max_eu)] = ALARM_OUT_OF_RANGE
+        return severity
+
+
+class SharedTagStore:
+    # Tag values in shared memory: one poller process writes, any number of render processes
+    # read without locks. Each slot is guarded by a seqlock (odd sequence number = write in progress).
+    def __init__(self, tag_configs, name=None, create=False):
+        self.slots = build_tag_slots(tag_configs)
+        slot_count = len(self.slots)
+        table_end = STORE_HEADER_DTYPE.itemsize + TAG_SLOT_DTYPE.itemsize * max(1, slot_count)
+        size = table_end + TagHistory.nbytes(slot_count, HISTORY_CAPACITY)
+        self.layout_hash = tag_layout_hash(tag_configs)
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size if create else 0)
+        self.name = self.shm.name
+        self.header = np.ndarray((), STORE_HEADER_DTYPE, buffer=self.shm.buf)
+        if create:
+            self.header["history_capacity"] = HISTORY_CAPACITY
+            self.header["layout_hash"] = self.layout_hash
+        elif int(self.header["slot_count"]) != slot_count or int(self.header["layout_hash"]) != self.layout_hash:
+            self.header = None
+            self.shm.close()
+            raise ValueError("Shared tag store layout does not match the tag file")
+        self.table = np.ndarray((slot_count,), TAG_SLOT_DTYPE, buffer=self.shm.buf, offset=STORE_HEADER_DTYPE.itemsize)
+        # Value history for the sparklines follows the table, in the same block
+        self.history = TagHistory(tag_configs, int(self.header["history_capacity"]), self.shm.buf, table_end)
+        if create:
+            self.history.counts[:] = 0
+            self.table[:] = 0
+            self.table["value"] = np.nan
+            self.table["text"] = b"Fetching..."
+            self.table["quality"] = QUALITY_STALE
+            self.header["slot_count"] = slot_count
+            self.header["generation"] = 0
+        self.seq = self.table["seq"]
+        self.cached_generation = None
+        self.cached_values = None
+
+    def write(self, slot, text, quality=None, timestamp=None):
+        text = str(text)
+        value = parse_numeric(text)
+        timestamp = time.time() if timestamp is None else timestamp
+        previous_value = self.table["value"][slot]
+        self.seq[slot] += 1
+        self.table["value"][slot] = value
+        self.table["timestamp"][slot] = timestamp
+        self.table["quality"][slot] = quality_for_value(text) if quality is None else quality
+        self.table["text"][slot] = text.encode("utf-8")[:TAG_SLOT_DTYPE["text"].itemsize]
+        self.seq[slot] += 1
+        # History is event-based: a sample when the value changes, not on every write
+        if value != previous_value:
+            self.history.append(slot, value, timestamp)
+
+    def holds(self, slot, text):
+        # Writer side: True when a write of text would leave the slot as it is
+        text = str(text)
+        return (self.table["text"][slot] == text.encode("utf-8")[:TAG_SLOT_DTYPE["text"].itemsize]
+                and self.table["quality"][slot] == quality_for_value(text))
+
+    def set_quality(self, slot, quality):
+        self.seq[slot] += 1
+        self.table["quality"][slot] = quality
+        self.seq[slot] += 1
+
+    def publish(self):
+        # Readers rebuild their view when the generation moves, i.e. once per poll cycle
+        self.header["generation"] += 1
+
+    def snapshot(self):
+        # Consistent copy of the whole table; retried while any slot was being written
+        while True:
+            seq_before = self.seq.copy()
+            table = self.table.copy()
+            if not (seq_before & 1).any() and np.array_equal(seq_before, self.seq):
+                return table
+            time.sleep(0)
+
+    def read_snapshot(self):
+        # (generation, {source: TagValues}) view for the overlay, rebuilt only after a publish
+        generation = int(self.header["generation"])
+        if generation != self.cached_generation:
+            table = self.snapshot()
+            texts, qualities = table["text"], table["quality"]
+            values = {}
+            for (source, tag_name), slot in self.slots.items():
+                source_values = values.setdefault(source, TagValues())
+                dict.__setitem__(source_values, tag_name, texts[slot].decode("utf-8", "replace"))
+                source_values.quality[tag_name] = int(qualities[slot])
+            self.cached_values, self.cached_generation = values, generation
+        return self.cached_generation, self.cached_values
+
+    def read_values(self):
+        return self.read_snapshot()[1]
+
+    def close(self):
+        self.history.close()
+        self.header = self.table = self.seq = None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+class SharedSourceValues:
+    # Lets the existing pollers write latest_values[source][tag] straight into the shared store
+    def __init__(self, store, source):
+        self.store = store
+        self.source = source
+        self.changed = False
+
+    def __setitem__(self, tag_name, value):
+        # As in SnapshotSourceValues, unchanged values are not rewritten, so cycles that changed
+        # nothing do not move the generation
+        slot = self.store.slots.get((self.source, tag_name))
+        if slot is not None and not self.store.holds(slot, value):
+            self.store.write(slot, value)
+            self.changed = True
+
+    def set_quality(self, tag_names, quality):
+        for tag_name in tag_names:
+            slot = self.store.slots.get((self.source, tag_name))
+            if slot is not None and self.store.table["quality"][slot] != quality:
+                self.store.set_quality(slot, quality)
+                self.changed = True
+
+    def publish(self):
+        if self.changed:
+            self.store.publish()
+            self.changed = False
+
+
+def tag_poller_process(tag_file_name, store_name):
+    # Single writer for a shared tag store; render processes attach to the store by name
+    db_configs, tag_configs, _ = read_config(tag_file=tag_file_name)
+    store = SharedTagStore(tag_configs, name=store_name)
+    start_metrics_reporting("tag-poller")
+    latest_values = {source: SharedSourceValues(store, source) for source in tag_configs}
+    threads = start_tag_pollers(db_configs, tag_configs, latest_values)
+    for thread in threads:
+        thread.join()
+
+
+def draw_visualizations(frame, latest_values, aesthetics, tag_configs, history=None):
+    # history (TagHistory) adds a sparkline right of each value box, all drawn in one polylines call
+    font = cv2.FONT_HERSHEY_DUPLEX
+    y_position = aesthetics.get("start_y")
+    padding = aesthetics.get("padding")
+    text_scale = aesthetics.get("text_scale")
+    text_color = aesthetics.get("text_color")
+    rect_color = aesthetics.get("rect_color")
+    rect_thickness = aesthetics.get("rect_thickness")
+    line_spacing = aesthetics.get("line_spacing")
+    sparkline_width = aesthetics.get("sparkline_width", 0) if history is not None else 0
+    sparklines = []
+
+    for source, tags in latest_values.items():
+        for tag_name, value in tags.items():
+            if tag_name not in tag_configs[source]:
+                continue
+
+            tag_info = tag_configs[source][tag_name]
+            if ";" not in tag_info:
+                continue
+
+            tag_parts = tag_info.split(';')
+            comment = tag_parts[2] if len(tag_parts) > 2 else "No Comment"
+            unit = tag_parts[1] if len(tag_parts) > 1 else ""
+            display_text = f"{comment} [{unit}]" if unit else comment
+            value_text = f"= {value}"
+
+            # Calculate text sizes
+            (display_width, text_height), _ = cv2.getTextSize(display_text, font, text_scale, 1)
+            (value_width, _), _ = cv2.getTextSize(value_text, font, text_scale, 1)
+            total_width = display_width + value_width + 3 * padding
+            total_height = text_height + 2 * padding
+
+            # Ensure rectangle and text fit
+            top_left = (padding, y_position)
+            bottom_right = (padding + total_width, y_position + total_height)
+
+            # Draw rectangle frame (transparent background)
+            frame = cv2.rectangle(frame, top_left, bottom_right, rect_color, rect_thickness)
+
+            # Calculate text positions
+            text_y_position = y_position + padding + text_height
+
+            # Draw text inside the rectangle
+            frame = cv2.putText(frame, display_text,
+                                (padding + 5, text_y_position),
+                                font,
+                                text_scale,
+                                text_color,
+                                1,
+                                cv2.LINE_AA)
+            frame = cv2.putText(frame, value_text,
+                                (padding + display_width + padding, text_y_position),
+                                font,
+                                text_scale,
+                                text_color,
+                                1,
+                                cv2.LINE_AA)
+
+            slot = history.slots.get((source, tag_name)) if sparkline_width else None
+            if slot is not None and y_position < frame.shape[0]:
+                sparklines.append((slot, padding + total_width + padding, y_position, total_height))
+
+            # Update y_position for next text box
+            y_position += total_height + line_spacing
+
+    if sparklines:
+        slots, lefts, tops, heights = zip(*sparklines)
+        cv2.polylines(frame, sparkline_polylines(history, slots, lefts, tops, heights, sparkline_width), False,
+                      aesthetics.get("sparkline_color"), 1, cv2.LINE_AA)
+
+    return frame
+
+
+class OverlayRenderer:
+    # Overlay layer compiled once from tag_configs. Labels are pre-rendered into a cached sprite,
+    # value fields are re-rendered only when their text changes, and the whole layer is blended
+    # onto each frame in one pass using a premultiplied colour layer and an alpha mask.
+    # With a TagHistory, sparklines are redrawn into the same layer when a sample comes in.
+    # Tags with limits in the tag file get their box coloured by alarm severity, re-evaluated for
+    # all tags at once whenever a value changes.
+    def __init__(self, tag_configs, aesthetics, history=None):
+        self.aesthetics = aesthetics
+        self.font = cv2.FONT_HERSHEY_DUPLEX
+        self.history = history if aesthetics.get("sparkline_width") else None
+        self.rows = self.compile_layout(tag_configs)
+        alarms = AlarmLimits(tag_configs)
+        self.alarms = alarms if alarms.count else None
+        self.numeric = np.full(len(self.rows), np.nan)  # rows are in slot order
+        self.frame_shape = None
+        self.values_version = None
+        self.history_generation = None
+
+    def compile_layout(self, tag_configs):
+        padding = self.aesthetics.get("padding")
+        text_scale = self.aesthetics.get("text_scale")
+        half_thickness = self.aesthetics.get("rect_thickness") // 2 + 1
+        y_position = self.aesthetics.get("start_y")
+        rows = []
+        for source, tags in tag_configs.items():
+            for tag_name, tag_info in tags.items():
+                if ";" not in tag_info:
+                    continue
+
+                tag_parts = tag_info.split(';')
+                comment = tag_parts[2] if len(tag_parts) > 2 else "No Comment"
+                unit = tag_parts[1] if len(tag_parts) > 1 else ""
+                display_text = f"{comment} [{unit}]" if unit else comment
+                (display_width, text_height), _ = cv2.getTextSize(display_text, self.font, text_scale, 1)
+                total_height = text_height + 2 * padding
+                rows.append({
+                    "source": source,
+                    "tag_name": tag_name,
+                    "display_text": display_text,
+                    "display_width": display_width,
+                    "y": y_position,
+                    "height": total_height,
+                    "text_y": y_position + padding + text_height,
+                    "band": (max(0, y_position - half_thickness), y_position + total_height + half_thickness + 1),
+                    "value_text": None,
+                    "quality": QUALITY_GOOD,
+                    "severity": ALARM_NORMAL,
+                    "right": 0,
+                    "slot": self.history.slots.get((source, tag_name)) if self.history is not None else None,
+                })
+                y_position += total_height + self.aesthetics.get("line_spacing")
+        return rows
+
+    def allocate(self, frame_shape):
+        # Static sprite: label text only, rendered once per frame size
+        self.frame_shape = frame_shape
+        height = min(frame_shape[0], self.rows[-1]["band"][1]) if self.rows else 0
+        width = frame_shape[1]
+        self.static_color = np.zeros((height, width, 3), np.uint8)
+        self.static_alpha = np.zeros((height, width), np.uint8)
+        padding = self.aesthetics.get("padding")
+        for row in self.rows:
+            self.put_text(self.static_color, self.static_alpha, row["display_text"], (padding + 5, row["text_y"]))
+        self.color = self.static_color.copy()
+        self.alpha = self.static_alpha.copy()
+        self.inverse_alpha = None
+        self.values_version = None
+        self.history_generation = None
+        for row in self.rows:
+            row["value_text"] = None
+
+    def put_text(self, color, alpha, text, origin):
+        text_scale = self.aesthetics.get("text_scale")
+        cv2.putText(color, text, origin, self.font, text_scale, self.aesthetics.get("text_color"), 1, cv2.LINE_AA)
+        cv2.putText(alpha, text, origin, self.font, text_scale, 255, 1, cv2.LINE_AA)
+
+    def render_value(self, row, value_text, quality=QUALITY_GOOD, severity=ALARM_NORMAL):
+        padding = self.aesthetics.get("padding")
+        rect_thickness = self.aesthetics.get("rect_thickness")
+        band_top, band_bottom = row["band"]
+        self.color[band_top:band_bottom] = self.static_color[band_top:band_bottom]
+        self.alpha[band_top:band_bottom] = self.static_alpha[band_top:band_bottom]
+
+        (value_width, _), _ = cv2.getTextSize(value_text, self.font, self.aesthetics.get("text_scale"), 1)
+        right = padding + row["display_width"] + value_width + 3 * padding
+        top_left, bottom_right = (padding, row["y"]), (right, row["y"] + row["height"])
+        rect_color = self.aesthetics.get("rect_color")
+        # A value that is not current says nothing about the alarm state, so quality wins
+        if quality == QUALITY_STALE:
+            rect_color = self.aesthetics.get("stale_rect_color", rect_color)
+        elif quality == QUALITY_BAD:
+            rect_color = self.aesthetics.get("bad_rect_color", rect_color)
+        elif severity == ALARM_WARNING:
+            rect_color = self.aesthetics.get("warning_rect_color", rect_color)
+        elif severity == ALARM_OUT_OF_RANGE:
+            rect_color = self.aesthetics.get("range_rect_color", rect_color)
+        elif severity == ALARM_CRITICAL:
+            rect_color = self.aesthetics.get("critical_rect_color", rect_color)
+            fill_alpha = self.aesthetics.get("critical_fill_alpha", 0)
+            if fill_alpha:
+                # Premultiplied fill under the label, outline and value
+                fill = tuple(int(channel * fill_alpha / 255) for channel in rect_color)
+                box = (slice(row["y"], row["y"] + row["height"]), slice(padding, right))
+                self.color[box] = np.maximum(self.color[box], np.array(fill, np.uint8))
+                self.alpha[box] = np.maximum(self.alpha[box], fill_alpha)
+        cv2.rectangle(self.color, top_left, bottom_right, rect_color, rect_thickness)
+        cv2.rectangle(self.alpha, top_left, bottom_right, 255, rect_thickness)
+        self.put_text(self.color, self.alpha, value_text, (padding + row["display_width"] + padding, row["text_y"]))
+        row["value_text"] = value_text
+        row["quality"] = quality
+        row["severity"] = severity
+        row["right"] = right + rect_thickness
+
+    def render_sparklines(self, rows, redrawn):
+        padding = self.aesthetics.get("padding")
+        width = self.aesthetics.get("sparkline_width")
+        redrawn = {id(row) for row in redrawn}
+        # Rows below the frame are not blended, so they get no sparkline
+        rows = [row for row in rows if row["slot"] is not None and row["value_text"] is not None
+                and row["y"] < self.color.shape[0] and self.history.counts[row["slot"]]]
+        for row in rows:
+            if id(row) not in redrawn:
+                # Clears the previous sparkline along with the band
+                self.render_value(row, row["value_text"], row["quality"], row["severity"])
+        if not rows:
+            return
+        polylines = sparkline_polylines(self.history, [row["slot"] for row in rows], [row["right"] + padding for row in rows],
+                                        [row["y"] for row in rows], [row["height"] for row in rows], width)
+        cv2.polylines(self.color, polylines, False, self.aesthetics.get("sparkline_color"), 1, cv2.LINE_AA)
+        cv2.polylines(self.alpha, polylines, False, 255, 1, cv2.LINE_AA)
+        for row in rows:
+            row["right"] += padding + width + 1
+
+    def render(self, frame, latest_values, version=None):
+        # version comes with published snapshots: unchanged means the cached layer is still current
+        if not self.rows:
+            return frame
+        if self.frame_shape != frame.shape:
+            self.allocate(frame.shape)
+
+        rows = self.rows if version is None or version != self.values_version else ()
+        self.values_version = version
+        updates = []
+        for index, row in enumerate(rows):
+            values = latest_values.get(row["source"], {})
+            value = values.get(row["tag_name"])
+            if value is None:
+                continue
+            value_text = f"= {value}"
+            # Plain dicts (no quality flags) render as current values
+            quality = values.quality.get(row["tag_name"], QUALITY_GOOD) if isinstance(values, TagValues) else QUALITY_GOOD
+            if value_text != row["value_text"] or quality != row["quality"]:
+                if value_text != row["value_text"]:
+                    self.numeric[index] = parse_numeric(value)
+                updates.append((index, value_text, quality))
+
+        # Severity of every tag in one pass over the numeric values, only when some value changed
+        severities = self.alarms.evaluate(self.numeric) if self.alarms is not None and updates else None
+        redrawn = []
+        for index, value_text, quality in updates:
+            row = self.rows[index]
+            self.render_value(row, value_text, quality, int(severities[index]) if severities is not None else ALARM_NORMAL)
+            redrawn.append(row)
+        changed = bool(redrawn)
+
+        if self.history is not None:
+            generation = self.history.generation()
+            if generation != self.history_generation:
+                # New samples move every trend; otherwise only the redrawn boxes need theirs back
+                self.history_generation = generation
+                self.render_sparklines(self.rows, redrawn)
+                changed = True
+            elif redrawn:
+                self.render_sparklines(redrawn, redrawn)
+
+        if changed or self.inverse_alpha is None:
+            self.width = min(frame.shape[1], max(row["right"] for row in self.rows))
+            self.inverse_alpha = cv2.merge([255 - self.alpha[:, :self.width]] * 3)
+
+        height, width = self.alpha.shape[0], self.width
+        if height and width:
+            roi = frame[:height, :width]
+            roi = cv2.multiply(roi, self.inverse_alpha, scale=1 / 255)
+            frame[:height, :width] = cv2.add(roi, self.color[:, :width])
+        return frame
+
+
+def is_live_source(source):
+    return str(source).isdigit() or "://" in str(source)
+
+
+class SyntheticCapture:
+    # cv2.VideoCapture stand-in that generates frames at a fixed rate (testing and benchmarks)
+    def __init__(self, width=1280, height=720, fps=30, frame_count=None):
+        self.width, self.height, self.fps = width, height, fps
+        self.frame_count = frame_count
+        self.frames_read = 0
+        self.next_frame_time = None
+        self.background = np.tile(np.linspace(0, 255, width, dtype=np.uint8)[None, :, None], (height, 1, 3))
+
+    def isOpened(self):
+        return True
+
+    def set(self, prop_id, value):
+        return False
+
+    def get(self, prop_id):
+        if prop_id == cv2.CAP_PROP_FPS:
+            return self.fps
+        return 0
+
+    def grab(self):
+        if self.frame_count is not None and self.frames_read >= self.frame_count:
+            return False
+        if self.fps:
+            now = time.perf_counter()
+            if self.next_frame_time is None:
+                self.next_frame_time = now
+            if self.next_frame_time > now:
+                time.sleep(self.next_frame_time - now)
+            self.next_frame_time += 1 / self.fps
+        self.frames_read += 1
+        return True
+
+    def retrieve(self, image=None):
+        # Like cv2.VideoCapture, writes into image when one of the frame's size is passed
+        frame = np.roll(self.background, self.frames_read * 4, axis=1)
+        cv2.putText(frame, str(self.frames_read - 1), (20, self.height - 20), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
+        if image is not None and image.shape == frame.shape:
+            np.copyto(image, frame)
+            return True, image
+        return True, frame
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def release(self):
+        pass
+
+
+class FlakyCamera:
+    # Camera stand-in that injects failures, for testing the capture supervisor (like FlakyDriver for
+    # the DB): open() wraps captures from make_capture(url), which fail for good (grab() returns False)
+    # with failure_rate per frame; outage(seconds) makes every capture stall until it is over, as a
+    # dropped network stream does, and every open() during it fails
+    def __init__(self, make_capture, failure_rate=0.0, seed=None):
+        self.make_capture = make_capture
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.down_until = 0.0
+        self.opens = 0
+
+    def outage(self, seconds):
+        self.down_until = time.monotonic() + seconds
+
+    def is_down(self):
+        return time.monotonic() < self.down_until
+
+    def fails(self):
+        with self.lock:
+            return self.random.random() < self.failure_rate
+
+    def open(self, url):
+        self.opens += 1
+        return FlakyCapture(self, None if self.is_down() else self.make_capture(url))
+
+
+class FlakyCapture:
+    def __init__(self, camera, capture):
+        self.camera = camera
+        self.capture = capture
+        self.broken = capture is None
+
+    def isOpened(self):
+        return not self.broken
+
+    def set(self, prop_id, value):
+        return self.capture.set(prop_id, value) if self.capture else False
+
+    def get(self, prop_id):
+        return self.capture.get(prop_id) if self.capture else 0
+
+    def grab(self):
+        while self.camera.is_down() and not self.broken:
+            time.sleep(0.01)
+        if self.broken or self.camera.fails():
+            self.broken = True
+            return False
+        return self.capture.grab()
+
+    def retrieve(self, image=None):
+        return self.capture.retrieve(image)
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def release(self):
+        self.broken = True
+        if self.capture:
+            self.capture.release()
+
+
+class FrameGrabber:
+    # Reads the capture on its own thread and keeps only the newest frame, so the render loop
+    # never works through a backlog of stale frames
+    def __init__(self, capture, name="", pace_fps=None):
+        self.capture = capture
+        self.name = name
+        self.pace_fps = pace_fps
+        self.condition = threading.Condition()
+        self.frame = None
+        self.frame_time = None
+        self.frame_seq = 0
+        self.consumed_seq = 0
+        self.captured_frames = 0
+        self.dropped_frames = 0
+        self.duplicated_frames = 0
+        self.skipped_frames = 0
+        self.decode_every = 1  # set by the frame governor: only every Nth grabbed frame is decoded
+        self.last_grab = None  # time of the last successful grab, decoded or not
+        self.failed = False
+        self.running = False
+        self.thread = None
+        self.thread_done = False
+        self.release_pending = False  # set by stop() when it gave up waiting for a stalled grab()
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run_thread, name=f"capture-{self.name}", daemon=True)
+        self.thread.start()
+        return self
+
+    def run_thread(self):
+        # cv2 must not release a capture while grab() runs on it; when stop() timed out on a stalled
+        # grab(), the capture is released here once grab() has returned
+        try:
+            self.run()
+        finally:
+            with self.condition:
+                self.thread_done = True
+                release = self.release_pending
+            if release:
+                self.capture.release()
+
+    def run(self):
+        # grab() waits for and reads the next frame, retrieve() decodes it; timed separately
+        grab_time = METRICS.histogram("arcam_stage_seconds", stage="grab", stream=self.name)
+        decode_time = METRICS.histogram("arcam_stage_seconds", stage="decode", stream=self.name)
+        next_frame_time = time.perf_counter()
+        grabs = 0
+        while self.running:
+            start = time.perf_counter()
+            ret = self.capture.grab()
+            grabbed = time.perf_counter()
+            grabs += 1
+            if ret:
+                self.last_grab = grabbed
+            if ret and grabs % self.decode_every:
+                self.skipped_frames += 1
+                grab_time.observe(grabbed - start)
+                continue
+            frame = None
+            if ret:
+                ret, frame = self.capture.retrieve()
+            now = time.perf_counter()
+            grab_time.observe(grabbed - start)
+            decode_time.observe(now - grabbed)
+            with self.condition:
+                if not ret:
+                    self.failed = True
+                    self.condition.notify_all()
+                    break
+                if self.frame_seq > self.consumed_seq:
+                    self.dropped_frames += 1
+                self.frame, self.frame_time = frame, now
+                self.frame_seq += 1
+                self.captured_frames += 1
+                self.condition.notify_all()
+            if self.pace_fps:
+                # File sources decode faster than real time; play them at their native rate
+                next_frame_time += 1 / self.pace_fps
+                if next_frame_time > now:
+                    time.sleep(next_frame_time - now)
+                else:
+                    next_frame_time = now
+
+    def read(self, timeout=1.0, repeat_last=True):
+        # Returns (ok, frame, capture_time). Waits up to timeout for a newer frame, otherwise
+        # hands out a copy of the last one so the overlay keeps updating during a stall.
+        # Every frame handed out is a copy: the overlay draws on it in place and self.frame has to
+        # stay clean for the repeats.
+        with self.condition:
+            self.condition.wait_for(lambda: self.frame_seq != self.consumed_seq or self.failed, timeout)
+            if self.frame_seq != self.consumed_seq:
+                self.consumed_seq = self.frame_seq
+                return True, self.frame.copy(), self.frame_time
+            if self.failed or self.frame is None or not repeat_last:
+                return False, None, None
+            self.duplicated_frames += 1
+            return True, self.frame.copy(), self.frame_time
+
+    def stop(self, timeout=2):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout)
+            with self.condition:
+                if not self.thread_done:
+                    # Still in grab(): run_thread releases the capture when it returns
+                    self.release_pending = True
+                    return
+        self.capture.release()
+
+
+class CaptureSupervisor:
+    # Keeps a stream's frames coming through camera failures. A source that stops giving frames
+    # (grab fails, or nothing grabbed for frame_timeout seconds) is released and reopened in the
+    # background with jittered exponential backoff. With a standby URL a second capture is kept
+    # open, decoding only every standby_decode_every-th frame, and the stream switches to it as
+    # soon as the active source fails. While no source gives frames, read() hands out the last
+    # good frame (a copy taken once a second, before the overlay) or a placeholder with a notice,
+    # so the overlay keeps updating.
+    # Same read(), counters and decode_every as a FrameGrabber.
+    standby_decode_every = 25
+    recovery_fps = 5
+
+    def __init__(self, name, urls, opener=None, frame_timeout=5.0, min_delay=0.5, max_delay=30.0, placeholder=False):
+        self.name = name
+        self.opener = opener or open_capture  # (url, cap=None) -> (capture, pace_fps) or None
+        self.frame_timeout = frame_timeout
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.placeholder = placeholder
+        self.feeds = [{"url": url, "role": "primary" if index == 0 else "standby", "grabber": None}
+                      for index, url in enumerate(urls)]
+        self.active = self.feeds[0]
+        self.active_decode_every = 1
+        self.condition = threading.Condition()
+        self.stop_event = threading.Event()
+        self.running = False
+        self.changes = 0  # moves on every failure and switch, to wake up read()
+        # Frame counters of grabbers no longer active, and of the active one when it took over
+        self.retired_counts = dict.fromkeys(("captured_frames", "dropped_frames", "duplicated_frames", "skipped_frames"), 0)
+        self.base_counts = dict(self.retired_counts)
+        self.last_frame = None
+        self.last_frame_copied = 0.0
+        self.outage_started = None  # time of the last good frame before the current outage
+        self.failed_at = None
+        self.next_recovery_frame = 0.0
+        self.recovery_frames = 0
+        self.last_recovery = None
+        self.recovery_time = METRICS.histogram("arcam_capture_recovery_seconds", stream=name)
+        self.monitor_thread = None
+
+    def start(self, cap=None):
+        # The primary is opened here, so a working stream starts as fast as with a plain FrameGrabber;
+        # the standby and any failed primary connect in the background
+        self.running = True
+        METRICS.add_collector(self.collect)
+        if not self.connect(self.feeds[0], self.opener(self.feeds[0]["url"], cap)):
+            self.outage_started = self.failed_at = time.perf_counter()
+            self.reconnect_later(self.feeds[0])
+        for feed in self.feeds[1:]:
+            self.reconnect_later(feed)
+        self.monitor_thread = threading.Thread(target=self.monitor, name=f"supervisor-{self.name}", daemon=True)
+        self.monitor_thread.start()
+        return self
+
+    def connect(self, feed, opened):
+        # Starts a grabber on an opened capture; the source counts as back with its first frame
+        if opened is None:
+            return False
+        grabber = FrameGrabber(opened[0], self.name, opened[1]).start()
+        with grabber.condition:
+            grabber.condition.wait_for(lambda: grabber.frame_seq or grabber.failed, self.frame_timeout)
+        if not grabber.frame_seq or grabber.failed or not self.running:
+            grabber.stop()
+            return False
+        with self.condition:
+            idle = self.active["grabber"] is None
+            feed["grabber"] = grabber
+            if idle:
+                self.activate(feed)
+            else:
+                # Warm standby: keeps grabbing, decodes now and then
+                grabber.decode_every = self.standby_decode_every
+        return True
+
+    def reconnect_later(self, feed):
+        threading.Thread(target=self.reconnect, args=(feed,), name=f"reconnect-{self.name}", daemon=True).start()
+
+    def reconnect(self, feed):
+        attempt = 0
+        while not self.stop_event.is_set():
+            # Exponential backoff with jitter, as for the DB connections
+            delay = min(self.max_delay, self.min_delay * 2 ** min(attempt, 30))
+            if self.stop_event.wait(random.uniform(delay / 2, delay)):
+                return
+            attempt += 1
+            METRICS.add("arcam_capture_reconnect_attempts_total", stream=self.name, source=feed["role"])
+            if self.connect(feed, self.opener(feed["url"])):
+                logging.info(f"{self.name}: {feed['role']} source reconnected after {attempt} attempt(s)")
+                return
+
+    def activate(self, feed):
+        # Called with the condition held
+        self.active = feed
+        self.changes += 1
+        grabber = feed["grabber"]
+        self.base_counts = {counter: getattr(grabber, counter) for counter in self.retired_counts}
+        grabber.decode_every = self.active_decode_every
+        self.condition.notify_all()
+
+    def healthy(self, grabber, now):
+        last_grab = grabber.last_grab or 0
+        return not grabber.failed and now - last_grab < self.frame_timeout
+
+    def monitor(self):
+        while not self.stop_event.wait(0.02):
+            now = time.perf_counter()
+            for feed in self.feeds:
+                grabber = feed["grabber"]
+                if grabber is not None and not self.healthy(grabber, now):
+                    self.fail(feed, now)
+
+    def fail(self, feed, now):
+        grabber = feed["grabber"]
+        logging.warning(f"{self.name}: {feed['role']} source {feed['url']} stopped giving frames, reconnecting")
+        METRICS.add("arcam_capture_failures_total", stream=self.name, source=feed["role"])
+        with self.condition:
+            feed["grabber"] = None
+            if feed is self.active:
+                for counter in self.retired_counts:
+                    self.retired_counts[counter] += getattr(grabber, counter) - self.base_counts[counter]
+                if self.outage_started is None:
+                    self.outage_started = grabber.frame_time or now
+                    self.failed_at = now
+                self.changes += 1
+                self.condition.notify_all()
+                standby = next((other for other in self.feeds if other["grabber"] is not None), None)
+                if standby is not None:
+                    logging.info(f"{self.name}: switching to the {standby['role']} source {standby['url']}")
+                    METRICS.add("arcam_capture_failovers_total", stream=self.name)
+                    self.activate(standby)
+        with grabber.condition:
+            # Wakes a read() waiting on this grabber, after the switch so it picks up the standby
+            grabber.failed = True
+            grabber.condition.notify_all()
+        # Stopping joins the capture thread, which may hang in a stalled grab()
+        threading.Thread(target=grabber.stop, name=f"release-{self.name}", daemon=True).start()
+        self.reconnect_later(feed)
+
+    def read(self, timeout=1.0, repeat_last=True):
+        # (ok, frame, capture_time) like FrameGrabber.read; during an outage ok comes with a recovery
+        # frame recovery_fps times a second (repeat_last=False polls without waiting)
+        deadline = time.perf_counter() + timeout
+        while self.running:
+            grabber = self.active["grabber"]
+            changes = self.changes
+            if grabber is not None and not grabber.failed:
+                ret, frame, captured_at = grabber.read(max(0.0, deadline - time.perf_counter()), repeat_last)
+                if ret:
+                    if self.outage_started is not None and captured_at > self.failed_at:
+                        self.recovered(captured_at)
+                    if captured_at - self.last_frame_copied >= 1.0:
+                        self.last_frame, self.last_frame_copied = frame.copy(), captured_at
+                    return ret, frame, captured_at
+                if not grabber.failed:
+                    return False, None, None
+            now = time.perf_counter()
+            if self.outage_started is not None:
+                if now >= self.next_recovery_frame:
+                    self.next_recovery_frame = max(self.next_recovery_frame + 1 / self.recovery_fps, now)
+                    self.recovery_frames += 1
+                    return True, self.recovery_frame(now), now
+                wake = min(deadline, self.next_recovery_frame)
+            else:
+                wake = deadline
+            if now >= wake:
+                return False, None, None
+            with self.condition:
+                self.condition.wait_for(lambda: self.changes != changes or not self.running, wake - now)
+        return False, None, None
+
+    def recovered(self, captured_at):
+        recovery = captured_at - self.outage_started
+        self.recovery_time.observe(recovery)
+        self.last_recovery = recovery
+        self.outage_started = self.failed_at = None
+        logging.info(f"{self.name}: frames back from the {self.active['role']} source after {recovery:.2f} s")
+
+    def recovery_frame(self, now):
+        if self.last_frame is None or self.placeholder:
+            shape = self.last_frame.shape if self.last_frame is not None else (720, 1280, 3)
+            frame = np.full(shape, 48, np.uint8)
+        else:
+            frame = self.last_frame.copy()
+        notice = f"No signal from {self.name}, reconnecting ({now - self.outage_started:.0f} s)"
+        cv2.putText(frame, notice, (20, frame.shape[0] - 20), cv2.FONT_HERSHEY_DUPLEX, 0.8, (0, 0, 255), 1, cv2.LINE_AA)
+        return frame
+
+    def counter(self, name):
+        grabber = self.active["grabber"]
+        current = getattr(grabber, name) - self.base_counts[name] if grabber is not None else 0
+        return self.retired_counts[name] + current
+
+    @property
+    def captured_frames(self):
+        return self.counter("captured_frames")
+
+    @property
+    def dropped_frames(self):
+        return self.counter("dropped_frames")
+
+    @property
+    def duplicated_frames(self):
+        return self.counter("duplicated_frames")
+
+    @property
+    def skipped_frames(self):
+        return self.counter("skipped_frames")
+
+    @property
+    def failed(self):
+        return not self.running
+
+    @property
+    def decode_every(self):
+        return self.active_decode_every
+
+    @decode_every.setter
+    def decode_every(self, value):
+        # Set by the frame governor; applies to whichever source is active
+        self.active_decode_every = value
+        grabber = self.active["grabber"]
+        if grabber is not None:
+            grabber.decode_every = value
+
+    def collect(self):
+        labels = {"stream": self.name}
+        gauges = [
+            ("arcam_capture_recovering", labels, int(self.outage_started is not None)),
+            ("arcam_capture_active_source", labels, self.feeds.index(self.active)),
+            ("arcam_frames_recovery_total", labels, self.recovery_frames),
+        ]
+        if self.last_recovery is not None:
+            gauges.append(("arcam_capture_last_recovery_seconds", labels, self.last_recovery))
+        return gauges
+
+    def stop(self):
+        self.running = False
+        self.stop_event.set()
+        with self.condition:
+            self.condition.notify_all()
+        METRICS.remove_collector(self.collect)
+        if self.monitor_thread:
+            self.monitor_thread.join(timeout=2)
+        for feed in self.feeds:
+            if feed["grabber"] is not None:
+                feed["grabber"].stop()
+                feed["grabber"] = None
+
+
+class FrameRing:
+    # Frame buffers of one size in a single shared memory block. Pipeline stages pass slot numbers
+    # and work on zero-copy NumPy views of the same memory in every process.
+    def __init__(self, shape, slot_count, name=None, create=False):
+        self.shape = tuple(shape)
+        self.slot_count = slot_count
+        size = slot_count * int(np.prod(self.shape))
+        self.shm = shared_memory.SharedMemory(name=name, create=create, size=size if create else 0)
+        self.name = self.shm.name
+        self.frames = np.ndarray((slot_count,) + self.shape, np.uint8, buffer=self.shm.buf)
+
+    def store(self, slot, frame):
+        # Frames of another size (the camera changed resolution) are scaled to the ring's size
+        if frame.shape == self.shape:
+            np.copyto(self.frames[slot], frame)
+        else:
+            self.frames[slot] = cv2.resize(frame, (self.shape[1], self.shape[0]), interpolation=cv2.INTER_AREA)
+
+    def close(self):
+        self.frames = None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+def pipeline_worker_process(ring_name, shape, slot_count, tag_file_name, store_name, tasks, results, aesthetics=DEFAULT_AESTHETICS):
+    # Overlay stage of a FramePipeline: draws onto ring slots in place, with tag values from the shared store.
+    # Tasks are (seq, slot), None to stop; results are (seq, slot, overlay seconds).
+    _, tag_configs, _ = read_config(tag_file=tag_file_name)
+    ring = FrameRing(shape, slot_count, name=ring_name)
+    store = SharedTagStore(tag_configs, name=store_name)
+    overlay = OverlayRenderer(tag_configs, aesthetics, store.history)
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            seq, slot = task
+            start = time.perf_counter()
+            version, values = store.read_snapshot()
+            overlay.render(ring.frames[slot], values, version)
+            results.put((seq, slot, time.perf_counter() - start))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        store.close()
+        ring.close()
+
+
+class FramePipeline:
+    # Decode, overlay and output as separate stages, for sources one process cannot keep up with.
+    # A decode thread reads the capture straight into free slots of a shared-memory FrameRing,
+    # worker processes draw the overlay onto the slots in place, and read() hands the slots out
+    # in capture order; only slot numbers cross process boundaries. Has the FrameGrabber counters.
+    live_slot_wait = 0.01  # a live frame is dropped undecoded when no slot frees up in this time
+
+    def __init__(self, capture, name, tag_file_name, store_name, workers, pace_fps=None, aesthetics=DEFAULT_AESTHETICS):
+        self.capture = capture
+        self.aesthetics = aesthetics
+        self.name = name
+        self.tag_file_name = tag_file_name
+        self.store_name = store_name
+        self.worker_count = workers
+        self.pace_fps = pace_fps
+        self.slot_count = 2 * workers + 2  # one drawing and one queued per worker, plus decode and output
+        self.on_decoded = None  # called with each decoded frame (view) before its overlay, e.g. to record it
+        self.ring = None
+        self.tasks = multiprocessing.Queue()
+        self.results = multiprocessing.Queue()
+        self.free_slots = queue.Queue()
+        self.captured_at = {}
+        self.pending = {}
+        self.next_seq = 0
+        self.captured_frames = 0
+        self.dropped_frames = 0
+        self.duplicated_frames = 0
+        self.skipped_frames = 0
+        self.failed = False
+        self.running = False
+        self.workers = []
+        self.thread = None
+        self.lock = threading.Lock()
+        self.thread_done = False
+        self.release_pending = False  # set by stop() when it gave up waiting for a stalled grab()
+
+    def start(self):
+        # The first frame sets the ring's frame size
+        ret, frame = self.capture.read()
+        if not ret:
+            return None
+        self.ring = FrameRing(frame.shape, self.slot_count, create=True)
+        for slot in range(self.slot_count):
+            self.free_slots.put(slot)
+        for index in range(self.worker_count):
+            process = multiprocessing.Process(
+                target=pipeline_worker_process, name=f"pipeline-{self.name}-{index}", daemon=True,
+                args=(self.ring.name, self.ring.shape, self.slot_count, self.tag_file_name, self.store_name, self.tasks, self.results,
+                      self.aesthetics))
+            process.start()
+            self.workers.append(process)
+        self.running = True
+        self.thread = threading.Thread(target=self.run_thread, args=(frame,), name=f"decode-{self.name}", daemon=True)
+        self.thread.start()
+        return self
+
+    def dispatch(self, slot, captured_at):
+        if self.on_decoded:
+            self.on_decoded(self.ring.frames[slot])
+        self.captured_at[self.captured_frames] = captured_at
+        self.tasks.put((self.captured_frames, slot))
+        self.captured_frames += 1
+
+    def free_slot(self):
+        # File sources wait for the pipeline; live ones only briefly, so latency does not build up
+        while self.running:
+            try:
+                return self.free_slots.get(timeout=0.5 if self.pace_fps else self.live_slot_wait)
+            except queue.Empty:
+                if not self.pace_fps:
+                    return None
+        return None
+
+    def run_thread(self, first_frame):
+        # As in FrameGrabber: after a stop() that timed out on a stalled grab(), the capture (and the
+        # ring it decodes into) are released here once grab() has returned
+        try:
+            self.run(first_frame)
+        finally:
+            with self.lock:
+                self.thread_done = True
+                release = self.release_pending
+            if release:
+                self.release_capture()
+
+    def run(self, first_frame):
+        grab_time = METRICS.histogram("arcam_stage_seconds", stage="grab", stream=self.name)
+        decode_time = METRICS.histogram("arcam_stage_seconds", stage="decode", stream=self.name)
+        slot = self.free_slots.get()
+        self.ring.store(slot, first_frame)
+        self.dispatch(slot, time.perf_counter())
+        next_frame_time = time.perf_counter()
+        while self.running:
+            start = time.perf_counter()
+            ret = self.capture.grab()
+            grabbed = time.perf_counter()
+            grab_time.observe(grabbed - start)
+            if not ret:
+                break
+            slot = self.free_slot()
+            if slot is None:
+                self.dropped_frames += 1
+                continue
+            # Decoded straight into the slot when the size matches
+            view = self.ring.frames[slot]
+            ret, frame = self.capture.retrieve(view)
+            if not ret:
+                self.free_slots.put(slot)
+                break
+            if frame is not view:
+                self.ring.store(slot, frame)
+            now = time.perf_counter()
+            decode_time.observe(now - grabbed)
+            self.dispatch(slot, now)
+            if self.pace_fps:
+                next_frame_time += 1 / self.pace_fps
+                if next_frame_time > now:
+                    time.sleep(next_frame_time - now)
+                else:
+                    next_frame_time = now
+        self.failed = True
+
+    def read(self, timeout=1.0):
+        # Next frame in capture order as (slot, frame view, capture time, overlay seconds), or None
+        # after timeout; give the slot back with release() once every sink has the frame
+        deadline = time.perf_counter() + timeout
+        while self.next_seq not in self.pending:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return None
+            try:
+                seq, slot, overlay_time = self.results.get(timeout=min(remaining, 0.1))
+                self.pending[seq] = (slot, overlay_time)
+            except queue.Empty:
+                if self.finished() or not self.workers_alive():
+                    return None
+        slot, overlay_time = self.pending.pop(self.next_seq)
+        captured_at = self.captured_at.pop(self.next_seq)
+        self.next_seq += 1
+        return slot, self.ring.frames[slot], captured_at, overlay_time
+
+    def release(self, slot):
+        self.free_slots.put(slot)
+
+    def finished(self):
+        # The capture ended and every frame it gave has been handed out
+        return self.failed and self.next_seq >= self.captured_frames
+
+    def workers_alive(self):
+        return all(process.is_alive() for process in self.workers)
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=2)
+        for _ in self.workers:
+            self.tasks.put(None)
+        for process in self.workers:
+            process.join(timeout=2)
+            if process.is_alive():
+                process.terminate()
+        if self.thread:
+            with self.lock:
+                if not self.thread_done:
+                    self.release_pending = True
+                    return
+        self.release_capture()
+
+    def release_capture(self):
+        self.capture.release()
+        if self.ring:
+            self.ring.close()
+            self.ring.unlink()
+
+
+class StreamStats:
+    # Per-stream stage timings in METRICS, plus fps and averages logged every interval seconds
+    def __init__(self, name, grabber=None, interval=10.0):
+        self.name = name
+        self.interval = interval
+        self.stages = {stage: METRICS.histogram("arcam_stage_seconds", stage=stage, stream=name)
+                       for stage in ("capture_wait", "overlay", "output", "latency")}
+        self.grabber = grabber
+        self.fps = 0.0
+        if grabber is not None:
+            METRICS.add_collector(self.collect)
+        self.reset(time.perf_counter())
+
+    def reset(self, now):
+        self.started = now
+        self.frames = 0
+        self.overlay_time = 0.0
+        self.latency = 0.0
+
+    def add(self, overlay_time, latency, capture_wait=None, output_time=None):
+        self.frames += 1
+        self.overlay_time += overlay_time
+        self.latency += latency
+        self.stages["overlay"].observe(overlay_time)
+        self.stages["latency"].observe(latency)
+        if capture_wait is not None:
+            self.stages["capture_wait"].observe(capture_wait)
+        if output_time is not None:
+            self.stages["output"].observe(output_time)
+
+    def collect(self):
+        labels = {"stream": self.name}
+        return [
+            ("arcam_stream_fps", labels, self.fps),
+            ("arcam_frames_captured_total", labels, self.grabber.captured_frames),
+            ("arcam_frames_dropped_total", labels, self.grabber.dropped_frames),
+            ("arcam_frames_duplicated_total", labels, self.grabber.duplicated_frames),
+            ("arcam_frames_skipped_total", labels, self.grabber.skipped_frames),
+        ]
+
+    def close(self):
+        METRICS.remove_collector(self.collect)
+
+    def report(self, grabber):
+        now = time.perf_counter()
+        elapsed = now - self.started
+        if elapsed < self.interval:
+            return
+        self.fps = self.frames / elapsed
+        if self.frames:
+            logging.debug(
+                f"{self.name}: {self.fps:.1f} fps, "
+                f"overlay: {1000 * self.overlay_time / self.frames:.2f} ms/frame, "
+                f"capture-to-display latency: {1000 * self.latency / self.frames:.1f} ms, "
+                f"dropped: {grabber.dropped_frames}, duplicated: {grabber.duplicated_frames}, skipped: {grabber.skipped_frames}"
+            )
+        self.reset(now)
+
+
+class FrameGovernor:
+    # Keeps a stream within its frame budget (1 / target_fps) and latency budget by stepping
+    # through GOVERNOR_LEVELS: one step down when the smoothed frame time or latency is over
+    # budget, one step back up after a few seconds with plenty of headroom.
+    def __init__(self, name, grabber, target_fps, latency_budget=0.5, min_scale=0.35, hold=1.0, recover=3.0):
+        self.name = name
+        self.grabber = grabber
+        self.frame_budget = 1 / target_fps
+        self.latency_budget = latency_budget
+        self.levels = [level for level in GOVERNOR_LEVELS if level["scale"] >= min_scale]
+        self.hold = hold
+        self.recover = recover
+        self.level = 0
+        self.frame_time = None
+        self.latency = None
+        self.changed_at = time.perf_counter()
+        self.headroom_since = None
+        self.apply()
+
+    @classmethod
+    def from_options(cls, stream_options, name, grabber):
+        # target_fps = 0 (default) leaves the stream ungoverned
+        target_fps = float(stream_options.get("target_fps", 0))
+        if target_fps <= 0:
+            return None
+        return cls(name, grabber, target_fps,
+                   latency_budget=float(stream_options.get("latency_budget_ms", 500)) / 1000,
+                   min_scale=float(stream_options.get("min_scale", 0.35)))
+
+    @property
+    def settings(self):
+        return self.levels[self.level]
+
+    def apply(self):
+        settings = self.settings
+        self.grabber.decode_every = settings["decode_every"]
+        METRICS.set("arcam_governor_level", self.level, stream=self.name)
+        METRICS.set("arcam_governor_scale", settings["scale"], stream=self.name)
+        METRICS.set("arcam_governor_decode_every", settings["decode_every"], stream=self.name)
+        METRICS.set("arcam_governor_compact_overlay", int(settings["detail"] == "compact"), stream=self.name)
+
+    def prepare(self, frame):
+        scale = self.settings["scale"]
+        if scale >= 1:
+            return frame
+        return cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_LINEAR)
+
+    def update(self, frame_time, latency=None):
+        # Exponentially smoothed so a single slow frame does not change the level. latency is None
+        # for a frame repeated during a camera stall: its age says nothing about the load.
+        self.frame_time = frame_time if self.frame_time is None else 0.9 * self.frame_time + 0.1 * frame_time
+        if latency is not None:
+            self.latency = latency if self.latency is None else 0.9 * self.latency + 0.1 * latency
+        METRICS.set("arcam_governor_frame_seconds", self.frame_time, stream=self.name)
+        now = time.perf_counter()
+        if now - self.changed_at < self.hold:
+            return
+        latency = self.latency or 0.0
+        over_budget = self.frame_time > 0.95 * self.frame_budget or latency > self.latency_budget
+        if over_budget:
+            self.headroom_since = None
+            if self.level < len(self.levels) - 1:
+                self.step(1, now)
+            return
+        if self.frame_time < 0.6 * self.frame_budget and latency < 0.5 * self.latency_budget:
+            self.headroom_since = self.headroom_since or now
+            if now - self.headroom_since >= self.recover and self.level > 0:
+                self.step(-1, now)
+        else:
+            self.headroom_since = None
+
+    def step(self, direction, now):
+        self.level += direction
+        self.changed_at = now
+        self.headroom_since = None
+        self.frame_time = self.latency = None
+        self.apply()
+        logging.info(f"Governor for {self.name}: level {self.level} {self.settings}")
+
+
+class DisplaySink:
+    def __init__(self, title):
+        self.title = title
+
+    def write(self, frame):
+        cv2.imshow(self.title, frame)
+
+    def close(self):
+        pass
+
+
+class ThreadedSink:
+    # Hands the newest frame to a worker thread at most fps times per second. The render loop
+    # only swaps a reference, so a slow encoder or client never blocks capture or overlay.
+    repeat_last = False
+
+    def __init__(self, name, fps):
+        self.name = name
+        self.interval = 1 / fps if fps else 0
+        self.condition = threading.Condition()
+        self.frame = None
+        self.frame_seq = 0
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name=f"sink-{name}", daemon=True)
+        self.thread.start()
+
+    def write(self, frame):
+        with self.condition:
+            self.frame = frame
+            self.frame_seq += 1
+            self.condition.notify()
+
+    def run(self):
+        last_seq = 0
+        next_time = time.perf_counter()
+        while True:
+            with self.condition:
+                timeout = self.interval if self.repeat_last and self.frame is not None else 1.0
+                self.condition.wait_for(lambda: self.frame_seq != last_seq or not self.running, timeout)
+                if not self.running:
+                    break
+                if self.frame_seq == last_seq and not (self.repeat_last and self.frame is not None):
+                    continue
+                frame, last_seq = self.frame, self.frame_seq
+            try:
+                self.process(frame)
+            except Exception as e:
+                logging.error(f"Sink {self.name}: {e}")
+            if self.interval:
+                now = time.perf_counter()
+                next_time += self.interval
+                if next_time > now:
+                    time.sleep(next_time - now)
+                else:
+                    next_time = now
+        self.finish()
+
+    def process(self, frame):
+        raise NotImplementedError("This method should be implemented by subclasses")
+
+    def finish(self):
+        pass
+
+    def close(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        self.thread.join(timeout=5)
+
+
+class MjpegHttpSink(ThreadedSink):
+    # Encodes each frame once and serves the same JPEG bytes to every client
+    # (GET / or /stream.mjpg for the stream, /snapshot.jpg for a single frame)
+    boundary = "frame"
+
+    def __init__(self, name, port, fps=10, jpeg_quality=80, host="127.0.0.1", send_timeout=2.0):
+        self.jpeg_quality = jpeg_quality
+        self.send_timeout = send_timeout
+        self.jpeg = None
+        self.jpeg_seq = 0
+        self.jpeg_condition = threading.Condition()
+        self.clients = 0
+        self.clients_lock = threading.Lock()  # clients is counted from the server's handler threads
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                sink.handle_client(self)
+
+            def log_message(self, format, *args):
+                logging.debug(f"MJPEG {sink.name}: {format % args}")
+
+        super().__init__(name, fps)
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self.server_thread = threading.Thread(target=self.server.serve_forever, name=f"mjpeg-{name}", daemon=True)
+        self.server_thread.start()
+        logging.info(f"MJPEG stream for {name} on http://{host}:{self.port}/")
+
+    def process(self, frame):
+        ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if ok:
+            with self.jpeg_condition:
+                self.jpeg = buffer.tobytes()
+                self.jpeg_seq += 1
+                self.jpeg_condition.notify_all()
+
+    def next_jpeg(self, last_seq):
+        with self.jpeg_condition:
+            self.jpeg_condition.wait_for(lambda: self.jpeg_seq != last_seq or not self.running, 1.0)
+            return self.jpeg, self.jpeg_seq
+
+    def handle_client(self, request):
+        if request.path not in ("/", "/stream.mjpg", "/snapshot.jpg"):
+            request.send_error(404)
+            return
+        # A client that cannot take a frame within send_timeout is dropped
+        request.connection.settimeout(self.send_timeout)
+        streaming = False
+        try:
+            last_seq = 0
+            while self.running and last_seq == 0:
+                jpeg, last_seq = self.next_jpeg(last_seq)
+            if not self.running:
+                return
+
+            if request.path == "/snapshot.jpg":
+                request.send_response(200)
+                request.send_header("Content-Type", "image/jpeg")
+                request.send_header("Content-Length", str(len(jpeg)))
+                request.end_headers()
+                request.wfile.write(jpeg)
+                return
+
+            request.send_response(200)
+            request.send_header("Cache-Control", "no-cache")
+            request.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={self.boundary}")
+            request.end_headers()
+            with self.clients_lock:
+                self.clients += 1
+                clients = self.clients
+            streaming = True
+            logging.info(f"MJPEG {self.name}: client {request.client_address[0]} connected ({clients} total)")
+            while self.running:
+                request.wfile.write(
+                    f"--{self.boundary}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(jpeg)}\r\n\r\n".encode()
+                    + jpeg + b"\r\n"
+                )
+                seq = last_seq
+                while self.running and seq == last_seq:
+                    jpeg, seq = self.next_jpeg(last_seq)
+                last_seq = seq
+        except OSError as e:
+            logging.info(f"MJPEG {self.name}: dropping client {request.client_address[0]}: {e}")
+        finally:
+            if streaming:
+                with self.clients_lock:
+                    self.clients -= 1
+
+    def finish(self):
+        with self.jpeg_condition:
+            self.jpeg_condition.notify_all()
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class SegmentedRecorderSink(ThreadedSink):
+    # Writes the annotated feed at a constant frame rate into files of segment_seconds each
+    repeat_last = True
+
+    def __init__(self, name, directory, fps=10, segment_seconds=300, fourcc="mp4v", extension=".mp4", jpeg_quality=None,
+                 max_bytes=0, max_age=0):
+        self.directory = directory
+        self.prefix = safe_file_name(name)
+        self.fps = fps
+        self.segment_seconds = segment_seconds
+        self.fourcc = fourcc
+        self.extension = extension
+        self.jpeg_quality = jpeg_quality
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.writer = None
+        self.base = None
+        self.segment_end = 0
+        self.frame_size = None
+        os.makedirs(directory, exist_ok=True)
+        super().__init__(name, fps)
+
+    def open_segment(self, frame, now):
+        self.close_segment()
+        self.frame_size = (frame.shape[1], frame.shape[0])
+        self.base = os.path.join(self.directory, f"{self.prefix}_{time.strftime('%Y%m%d_%H%M%S', time.localtime(now))}")
+        open_recording(self.base)
+        self.writer = cv2.VideoWriter(self.base + self.extension, cv2.VideoWriter_fourcc(*self.fourcc), self.fps, self.frame_size)
+        if self.jpeg_quality is not None:
+            self.writer.set(cv2.VIDEOWRITER_PROP_QUALITY, self.jpeg_quality)
+        self.segment_end = now + self.segment_seconds
+        logging.info(f"Recording {self.name} to {self.base + self.extension}")
+        apply_retention(self.directory, self.prefix, self.max_bytes, self.max_age)
+
+    def close_segment(self):
+        if self.writer is not None:
+            self.writer.release()
+            self.writer = None
+            close_recording(self.base)
+
+    def process(self, frame):
+        now = time.time()
+        if self.writer is None or now >= self.segment_end:
+            self.open_segment(frame, now)
+        if (frame.shape[1], frame.shape[0]) != self.frame_size:
+            # Frame governor changed the scale: keep the segment going at its size
+            frame = cv2.resize(frame, self.frame_size, interpolation=cv2.INTER_LINEAR)
+        self.writer.write(frame)
+
+    def finish(self):
+        self.close_segment()
+
+
+def safe_file_name(name):
+    return "".join(c if c.isalnum() or c in "-_" else "_" for c in name)
+
+
+def is_recording_of(file_name, prefix):
+    # Recording files are <prefix>_<YYYYmmdd>_<HHMMSS>..., so camera1 does not match camera10_...
+    return file_name.startswith(prefix + "_") and file_name[len(prefix) + 1:len(prefix) + 9].isdigit()
+
+
+# Base names (path without extension) of the segments the sinks of this process are writing.
+# The video recorder and the replay recorder of a stream share record_dir, prefix and disk budget,
+# so retention run by either one must skip the open segments of both.
+OPEN_RECORDINGS = set()
+OPEN_RECORDINGS_LOCK = threading.Lock()
+
+
+def open_recording(base):
+    with OPEN_RECORDINGS_LOCK:
+        OPEN_RECORDINGS.add(base)
+
+
+def close_recording(base):
+    with OPEN_RECORDINGS_LOCK:
+        OPEN_RECORDINGS.discard(base)
 
-    # Read stream configurations
-    streams = {}
-    for section in parser.sections():
-        if section.startswith("stream"):
-            streams[parser.get(section, "name")] = parser.get(section, "source")
 
-    # Read tags configuration only if tag_file is provided
-    tag_configs = {}
-    if tag_file:
+def apply_retention(directory, prefix, max_bytes=0, max_age=0):
+    # Deletes a stream's oldest recordings until they fit in max_bytes and none is older than
+    # max_age seconds (0 = no limit). Files sharing a base name (.replay + .index) go together.
+    # Segments still being written are never deleted.
+    if not max_bytes and not max_age:
+        return
+    with OPEN_RECORDINGS_LOCK:
+        keep = set(OPEN_RECORDINGS)
+    groups = {}
+    for file_name in os.listdir(directory):
+        if is_recording_of(file_name, prefix):
+            path = os.path.join(directory, file_name)
+            groups.setdefault(os.path.splitext(path)[0], []).append(path)
+    recordings = []
+    for base, paths in groups.items():
         try:
-            parser.read(tag_file)
-            tag_configs = {section: dict(parser.items(section)) for section in parser.sections() if section.startswith('Source')}
-        except Exception as e:
-            print(f"Error reading tags file: {e}")
+            stats = [os.stat(path) for path in paths]
+        except OSError:
+            continue
+        recordings.append((max(stat.st_mtime for stat in stats), sum(stat.st_size for stat in stats), base, paths))
+    recordings.sort()
 
-    return db_configs, tag_configs, streams
+    total = sum(size for _, size, _, _ in recordings)
+    now = time.time()
+    for modified, size, base, paths in recordings:
+        if not ((max_bytes and total > max_bytes) or (max_age and now - modified > max_age)):
+            break
+        if base in keep:
+            continue
+        try:
+            for path in paths:
+                os.remove(path)
+        except OSError as e:
+            # Still open somewhere (e.g. a replay viewer on Windows); retried at the next segment
+            logging.warning(f"Retention: unable to remove {base}: {e}")
+            continue
+        total -= size
+        logging.info(f"Retention: removed {base}")
 
 
-def build_connection_string(db_config):
-    return (
-        f"Driver={db_config['driver']};"
-        f"SERVER={db_config['server']};"
-        f"DATABASE={db_config['database']};"
-        f"UID={db_config['uid']};"
-        f"PWD={db_config['pwd']};"
-    )
+class ReplayRecorder(ThreadedSink):
+    # Raw frames (before the overlay) and tag values for replay with a re-rendered overlay.
+    # Values go in as a full keyframe at the start of each segment and every keyframe_seconds,
+    # and as changes in between, so a seek never reads more than keyframe_seconds of records.
+    def __init__(self, name, directory, fps=10, segment_seconds=300, jpeg_quality=80, keyframe_seconds=10, max_bytes=0, max_age=0):
+        self.directory = directory
+        self.prefix = safe_file_name(name)
+        self.segment_seconds = segment_seconds
+        self.jpeg_quality = jpeg_quality
+        self.keyframe_seconds = keyframe_seconds
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.data_file = self.index_file = None
+        self.base = None
+        self.segment_end = 0
+        self.next_keyframe = 0
+        self.next_record = 0
+        self.recorded_values = {}  # {source: {tag: [text, quality]}} as of the last values record
+        self.values_version = None
+        os.makedirs(directory, exist_ok=True)
+        super().__init__(name, fps)
 
+    def record(self, frame, version, values):
+        # Called from the render loop; frames over fps are dropped here so only kept ones are copied
+        now = time.time()
+        if now < self.next_record:
+            return
+        self.next_record = max(self.next_record + self.interval, now)
+        self.write((frame.copy(), now, version, values))
 
-def initialize_latest_values(tag_configs):
-    valid_values = {source: {tag: "Fetching..." for tag, value in tags.items() if ";" in value} for source, tags in tag_configs.items()}
-    return valid_values
+    def open_segment(self, now):
+        self.close_segment()
+        stamp = time.strftime('%Y%m%d_%H%M%S', time.localtime(now))
+        self.base = os.path.join(self.directory, f"{self.prefix}_{stamp}_{int(now * 1000) % 1000:03d}")
+        open_recording(self.base)
+        self.data_file = open(self.base + REPLAY_DATA_EXTENSION, "wb")
+        self.index_file = open(self.base + REPLAY_INDEX_EXTENSION, "wb")
+        self.segment_end = now + self.segment_seconds
+        self.next_keyframe = 0
+        logging.info(f"Recording {self.name} for replay to {self.base}{REPLAY_DATA_EXTENSION}")
+        apply_retention(self.directory, self.prefix, self.max_bytes, self.max_age)
 
+    def close_segment(self):
+        if self.data_file is not None:
+            self.data_file.close()
+            self.index_file.close()
+            self.data_file = self.index_file = None
+            close_recording(self.base)
 
-def get_latest_values(conn, tags, source, latest_values):
-    try:
-        cursor = conn.cursor()
-        for tag_name, tag_info in tags.items():
-            tag_db_name = tag_info.split(';')[0]
-            query = f"SELECT TOP (1) ValueString FROM [WWALMDB].[dbo].[Events] WHERE [TagName] LIKE '{tag_db_name}' ORDER BY EventID DESC"
-            cursor.execute(query)
-            row = cursor.fetchone()
-            if row:
-                latest_values[source][tag_name] = row[0]
-            else:
-                latest_values[source][tag_name] = "No data"
-    except pyodbc.Error as e:
-        logging.error(f"Database error for {source}: {e}")
-        for tag_name in tags.keys():
-            latest_values[source][tag_name] = "DB Error"
+    def append(self, now, kind, payload):
+        offset = self.data_file.tell()
+        self.data_file.write(payload)
+        self.index_file.write(np.array([(now, kind, offset, len(payload))], REPLAY_INDEX_DTYPE).tobytes())
 
+    def record_values(self, now, values):
+        current = {source: {tag: [text, source_values.quality.get(tag, QUALITY_GOOD) if isinstance(source_values, TagValues) else QUALITY_GOOD]
+                            for tag, text in source_values.items()}
+                   for source, source_values in values.items()}
+        if now >= self.next_keyframe:
+            kind, changes = REPLAY_KEYFRAME, current
+            self.next_keyframe = now + self.keyframe_seconds
+        else:
+            kind, changes = REPLAY_VALUES, {}
+            for source, tags in current.items():
+                previous = self.recorded_values.get(source, {})
+                changed = {tag: entry for tag, entry in tags.items() if previous.get(tag) != entry}
+                if changed:
+                    changes[source] = changed
+        self.recorded_values = current
+        if changes:
+            self.append(now, kind, json.dumps(changes).encode("utf-8"))
 
-def query_database_periodically(source, db_config, tags, latest_values):
-    try:
-        connection_string = build_connection_string(db_config)
-        conn = pyodbc.connect(connection_string)
-        while True:
-            get_latest_values(conn, tags, source, latest_values)
-            time.sleep(1)
-    except pyodbc.Error as e:
-        logging.error(f"Error connecting to the database for source {source}: {e}")
-    except Exception as e:
-        logging.error(f"Unexpected error in process for {source}: {e}")
+    def process(self, item):
+        frame, now, version, values = item
+        if self.data_file is None or now >= self.segment_end:
+            self.open_segment(now)
+        if version != self.values_version or now >= self.next_keyframe:
+            self.record_values(now, values)
+            self.values_version = version
+        ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if ok:
+            self.append(now, REPLAY_FRAME, buffer.tobytes())
+        # Data before index, so the index never points past what is on disk
+        self.data_file.flush()
+        self.index_file.flush()
 
+    def finish(self):
+        self.close_segment()
 
-def draw_visualizations(frame, latest_values, aesthetics, tag_configs):
-    font = cv2.FONT_HERSHEY_DUPLEX
-    y_position = aesthetics.get("start_y")
-    padding = aesthetics.get("padding")
-    text_scale = aesthetics.get("text_scale")
-    text_color = aesthetics.get("text_color")
-    rect_color = aesthetics.get("rect_color")
-    rect_thickness = aesthetics.get("rect_thickness")
-    line_spacing = aesthetics.get("line_spacing")
 
-    for source, tags in latest_values.items():
-        for tag_name, value in tags.items():
-            if tag_name not in tag_configs[source]:
+class ReplayReader:
+    # Reads ReplayRecorder segments. The index files are memory-mapped, so a seek is a binary search
+    # on frame times plus the value records since the keyframe before it. Follows a recording that
+    # is still being written (refresh() picks up new records and segments).
+    def __init__(self, directory, name):
+        self.directory = directory
+        self.prefix = safe_file_name(name)
+        self.segments = []
+        self.segment = None  # segment and record number of the next record to read
+        self.record = 0
+        self.values = {}
+        self.version = 0
+        self.data_file = None
+        self.refresh()
+
+    def refresh(self):
+        known = {segment["path"]: segment for segment in self.segments}
+        self.segments = []
+        file_names = sorted(os.listdir(self.directory)) if os.path.isdir(self.directory) else []
+        for file_name in file_names:
+            if not (is_recording_of(file_name, self.prefix) and file_name.endswith(REPLAY_INDEX_EXTENSION)):
                 continue
+            path = os.path.join(self.directory, file_name)
+            try:
+                count = os.path.getsize(path) // REPLAY_INDEX_DTYPE.itemsize
+            except OSError:
+                continue
+            if not count:
+                continue
+            segment = known.get(path)
+            if segment is None or segment["count"] != count:
+                index = np.memmap(path, dtype=REPLAY_INDEX_DTYPE, mode="r", shape=(count,))
+                frames = np.flatnonzero(index["kind"] == REPLAY_FRAME)
+                segment = {
+                    "path": path,
+                    "data_path": path[:-len(REPLAY_INDEX_EXTENSION)] + REPLAY_DATA_EXTENSION,
+                    "count": count,
+                    "index": index,
+                    "frames": frames,
+                    "frame_times": index["time"][frames],
+                    "keyframes": np.flatnonzero(index["kind"] == REPLAY_KEYFRAME),
+                }
+            self.segments.append(segment)
+        if self.segment is not None:
+            self.segment = self.find_segment(self.segment["path"])
 
-            tag_info = tag_configs[source][tag_name]
-            if ";" not in tag_info:
+    def find_segment(self, path):
+        return next((segment for segment in self.segments if segment["path"] == path), None)
+
+    def time_range(self):
+        if not self.segments:
+            return None, None
+        return float(self.segments[0]["index"]["time"][0]), float(self.segments[-1]["index"]["time"][-1])
+
+    def seek(self, when):
+        # Positions on the last frame at or before when (the first frame if when is earlier)
+        if not self.segments:
+            return
+        starts = [float(segment["index"]["time"][0]) for segment in self.segments]
+        segment = self.segments[max(0, bisect.bisect_right(starts, when) - 1)]
+        frames, keyframes = segment["frames"], segment["keyframes"]
+        frame = max(0, int(np.searchsorted(segment["frame_times"], when, side="right")) - 1)
+        target = int(frames[frame]) if len(frames) else segment["count"]
+        keyframe = int(keyframes[max(0, int(np.searchsorted(keyframes, target, side="right")) - 1)]) if len(keyframes) else 0
+
+        self.segment = segment
+        self.values = {}
+        for record in range(keyframe, target):
+            entry = segment["index"][record]
+            if entry["kind"] != REPLAY_FRAME:
+                self.apply_values(int(entry["kind"]), self.read_data(entry))
+        self.record = target
+        self.version += 1
+
+    def read(self):
+        # Next frame as (ok, frame, recorded time); the tag values at that time from read_snapshot()
+        while self.segment is not None:
+            if self.record >= self.segment["count"]:
+                path = self.segment["path"]
+                self.refresh()
+                if self.segment is None or self.record < self.segment["count"]:
+                    continue
+                number = next(number for number, segment in enumerate(self.segments) if segment is self.segment) + 1
+                if number >= len(self.segments):
+                    # End of the recording (for now, if it is still being written)
+                    self.segment = self.find_segment(path)
+                    return False, None, None
+                self.segment, self.record = self.segments[number], 0
                 continue
+            entry = self.segment["index"][self.record]
+            self.record += 1
+            if entry["kind"] == REPLAY_FRAME:
+                frame = cv2.imdecode(np.frombuffer(self.read_data(entry), np.uint8), cv2.IMREAD_COLOR)
+                if frame is not None:
+                    return True, frame, float(entry["time"])
+            else:
+                self.apply_values(int(entry["kind"]), self.read_data(entry))
+        return False, None, None
 
-            tag_parts = tag_info.split(';')
-            comment = tag_parts[2] if len(tag_parts) > 2 else "No Comment"
-            unit = tag_parts[1] if len(tag_parts) > 1 else ""
-            display_text = f"{comment} [{unit}]" if unit else comment
-            value_text = f"= {value}"
+    def read_data(self, entry):
+        if self.data_file is None or self.data_file.name != self.segment["data_path"]:
+            if self.data_file is not None:
+                self.data_file.close()
+            self.data_file = open(self.segment["data_path"], "rb")
+        self.data_file.seek(int(entry["offset"]))
+        return self.data_file.read(int(entry["length"]))
 
-            # Calculate text sizes
-            (display_width, text_height), _ = cv2.getTextSize(display_text, font, text_scale, 1)
-            (value_width, _), _ = cv2.getTextSize(value_text, font, text_scale, 1)
-            total_width = display_width + value_width + 3 * padding
-            total_height = text_height + 2 * padding
+    def apply_values(self, kind, payload):
+        if kind == REPLAY_KEYFRAME:
+            self.values = {}
+        for source, tags in json.loads(payload).items():
+            source_values = self.values.setdefault(source, TagValues())
+            for tag_name, (text, quality) in tags.items():
+                dict.__setitem__(source_values, tag_name, text)
+                source_values.quality[tag_name] = quality
+        self.version += 1
 
-            # Ensure rectangle and text fit
-            top_left = (padding, y_position)
-            bottom_right = (padding + total_width, y_position + total_height)
+    def read_snapshot(self):
+        # Same (version, {source: TagValues}) shape as the live stores, for OverlayRenderer.render
+        return self.version, self.values
 
-            # Draw rectangle frame (transparent background)
-            frame = cv2.rectangle(frame, top_left, bottom_right, rect_color, rect_thickness)
+    def close(self):
+        if self.data_file is not None:
+            self.data_file.close()
+            self.data_file = None
+        self.segments = []
+        self.segment = None
 
-            # Calculate text positions
-            text_y_position = y_position + padding + text_height
 
-            # Draw text inside the rectangle
-            frame = cv2.putText(frame, display_text,
-                                (padding + 5, text_y_position),
-                                font,
-                                text_scale,
-                                text_color,
-                                1,
-                                cv2.LINE_AA)
-            frame = cv2.putText(frame, value_text,
-                                (padding + display_width + padding, text_y_position),
-                                font,
-                                text_scale,
-                                text_color,
-                                1,
-                                cv2.LINE_AA)
+def build_sinks(stream_options, title, display=True):
+    # sinks = display, mjpeg, record, replay (comma separated) in the stream section of config.ini
+    name = stream_options.get("name", title)
+    jpeg_quality = int(stream_options.get("jpeg_quality", 80))
+    sinks = []
+    for kind in stream_options.get("sinks", "display").split(","):
+        kind = kind.strip().lower()
+        if kind == "display":
+            if display:
+                sinks.append(DisplaySink(title))
+        elif kind == "mjpeg":
+            sinks.append(MjpegHttpSink(
+                name,
+                int(stream_options.get("mjpeg_port", 8081)),
+                fps=float(stream_options.get("mjpeg_fps", 10)),
+                jpeg_quality=int(stream_options.get("mjpeg_quality", jpeg_quality)),
+                host=stream_options.get("mjpeg_host", "127.0.0.1"),
+            ))
+        elif kind == "record":
+            sinks.append(SegmentedRecorderSink(
+                name,
+                stream_options.get("record_dir", "recordings"),
+                fps=float(stream_options.get("record_fps", 10)),
+                segment_seconds=float(stream_options.get("segment_seconds", 300)),
+                fourcc=stream_options.get("record_fourcc", "mp4v"),
+                extension=stream_options.get("record_extension", ".mp4"),
+                jpeg_quality=int(stream_options.get("record_quality", jpeg_quality)),
+                **retention_options(stream_options),
+            ))
+        elif kind == "replay":
+            # Recorded from the frame before the overlay, see build_replay_recorder
+            pass
+        elif kind:
+            logging.warning(f"Unknown sink '{kind}' for {name}")
+    return sinks
 
-            # Update y_position for next text box
-            y_position += total_height + line_spacing
 
-    return frame
+def stream_aesthetics(stream_options):
+    # sparkline_width in a stream section turns on the trend right of each value box (0 = off)
+    return {**DEFAULT_AESTHETICS, "sparkline_width": int(stream_options.get("sparkline_width", 0) or 0)}
 
 
-def video_stream_process(selected_stream, tag_file_name, db_configs):
-    db_configs, tag_configs, _ = read_config(tag_file=tag_file_name)
-    latest_values = initialize_latest_values(tag_configs)
+def retention_options(stream_options):
+    # Disk budget for one stream's recordings in record_dir (mp4 and replay together); 0 = no limit
+    return {
+        "max_bytes": float(stream_options.get("record_max_mb", 0)) * 1024 * 1024,
+        "max_age": float(stream_options.get("record_max_hours", 0)) * 3600,
+    }
+
 
-    # Start threads for database querying
+def build_replay_recorder(stream_options, name):
+    if "replay" not in [kind.strip().lower() for kind in stream_options.get("sinks", "").split(",")]:
+        return None
+    return ReplayRecorder(
+        name,
+        stream_options.get("record_dir", "recordings"),
+        fps=float(stream_options.get("replay_fps", stream_options.get("record_fps", 10))),
+        segment_seconds=float(stream_options.get("segment_seconds", 300)),
+        jpeg_quality=int(stream_options.get("replay_quality", stream_options.get("jpeg_quality", 80))),
+        keyframe_seconds=float(stream_options.get("keyframe_seconds", 10)),
+        **retention_options(stream_options),
+    )
+
+
+def start_tag_pollers(db_configs, tag_configs, latest_values, stop_event=None, connect=None):
     threads = []
     for source, db_config in db_configs.items():
         if source in tag_configs:
             tags = tag_configs[source]
-            thread = threading.Thread(target=query_database_periodically, args=(source, db_config, tags, latest_values))
+            thread = threading.Thread(target=query_database_periodically, args=(source, db_config, tags, latest_values, stop_event, connect))
             thread.daemon = True
             thread.start()
             threads.append(thread)
+    return threads
 
-    cap = cv2.VideoCapture(selected_stream)
 
+def open_capture(stream_url, cap=None):
+    # (capture, pace_fps), or None when the source cannot be opened
+    if cap is None:
+        cap = cv2.VideoCapture(stream_url)
     if not cap.isOpened():
-        logging.error("Unable to open video stream.")
+        logging.error(f"Unable to open video stream: {stream_url}")
+        return None
+
+    # Keep OpenCV's own queue short; the grabber thread holds the newest frame
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    pace_fps = None if is_live_source(stream_url) else (cap.get(cv2.CAP_PROP_FPS) or 25)
+    return cap, pace_fps
+
+
+def open_stream(stream_url, cap=None, name=None):
+    opened = open_capture(stream_url, cap)
+    if opened is None:
+        return None
+    cap, pace_fps = opened
+    return FrameGrabber(cap, name or stream_url, pace_fps).start()
+
+
+def open_supervised_stream(stream_url, stream_options, cap=None, name=None, opener=None):
+    # A CaptureSupervisor when the stream reconnects (reconnect = auto: live sources, or with a
+    # standby_source), otherwise a plain FrameGrabber that ends with the source
+    reconnect = str(stream_options.get("reconnect", "auto")).strip().lower()
+    standby_url = stream_options.get("standby_source", "").strip()
+    if reconnect == "off" or (reconnect == "auto" and not is_live_source(stream_url) and not standby_url):
+        return open_stream(stream_url, cap, name)
+    supervisor = CaptureSupervisor(
+        name or stream_url, [stream_url] + ([standby_url] if standby_url else []), opener,
+        frame_timeout=float(stream_options.get("frame_timeout", 5)),
+        min_delay=float(stream_options.get("reconnect_min_delay", 0.5)),
+        max_delay=float(stream_options.get("reconnect_max_delay", 30)),
+        placeholder=stream_options.get("recovery_frame", "last").strip().lower() == "placeholder")
+    return supervisor.start(cap)
+
+
+def pipeline_worker_count(stream_options):
+    # pipeline_workers in a stream section: 0 = serial loop, auto = one per core besides decode/output
+    value = str(stream_options.get("pipeline_workers", "0")).strip().lower()
+    if value == "auto":
+        return max(1, (os.cpu_count() or 2) - 1)
+    return max(0, int(value or 0))
+
+
+def attach_tag_values(db_configs, tag_configs, store_name, stop_event=None, connect=None):
+    # Attach to a shared store published by tag_poller_process, or poll the DB in this process
+    # Returns a callable giving (version, values); the version only moves when a poll cycle changed something
+    # plus a close() for the caller to run once the pollers have stopped, and the TagHistory for sparklines
+    if store_name:
+        store = SharedTagStore(tag_configs, name=store_name)
+        return store.read_snapshot, [], store.close, store.history
+    snapshots = ValueSnapshots(tag_configs)
+    threads = start_tag_pollers(db_configs, tag_configs, snapshots.writers, stop_event, connect)
+    return snapshots.read_snapshot, threads, lambda: None, snapshots.history
+
+
+def video_stream_process(selected_stream, tag_file_name, db_configs, store_name=None,
+                         capture=None, connect=None, sinks=None, max_frames=None, stop_event=None, on_started=None,
+                         pipeline_workers=None):
+    # capture, connect, sinks and max_frames let benchmarks drive the loop with stand-ins;
+    # stop_event ends the loop from outside and on_started() runs after the first frame is out.
+    # pipeline_workers (default: the stream's pipeline_workers option) > 0 runs the pipelined loop.
+    stream_options = read_stream_options().get(selected_stream, {})
+    if pipeline_workers is None:
+        pipeline_workers = pipeline_worker_count(stream_options)
+    if pipeline_workers > 0:
+        if multiprocessing.current_process().daemon:
+            logging.warning("Pipelined mode needs a non-daemonic process; running the stream serially")
+        else:
+            return pipelined_stream_process(selected_stream, tag_file_name, pipeline_workers, store_name,
+                                            capture, connect, sinks, max_frames, stop_event, on_started)
+    db_configs, tag_configs, _ = read_config(tag_file=tag_file_name)
+    stream_name = stream_options.get("name", selected_stream)
+    start_metrics_reporting(stream_name)
+
+    # Start threads for database querying (unless values come from a shared store)
+    stop_event = stop_event or threading.Event()
+    read_snapshot, threads, close_values, history = attach_tag_values(db_configs, tag_configs, store_name, stop_event, connect)
+
+    grabber = open_supervised_stream(selected_stream, stream_options, capture, stream_name)
+    if grabber is None:
+        stop_event.set()
+        for thread in threads:
+            thread.join()
+        close_values()
+        return
+
+    overlays = {"full": OverlayRenderer(tag_configs, stream_aesthetics(stream_options), history)}
+    stats = StreamStats(stream_name, grabber)
+    governor = FrameGovernor.from_options(stream_options, stream_name, grabber)
+    if sinks is None:
+        sinks = build_sinks(stream_options, f'Video Stream - {selected_stream}')
+    display = any(isinstance(sink, DisplaySink) for sink in sinks)
+    recorder = build_replay_recorder(stream_options, stream_name)
+
+    frame_count = 0
+    last_captured_at = None
+    try:
+        while (max_frames is None or frame_count < max_frames) and not stop_event.is_set():
+            frame_count += 1
+            start = time.perf_counter()
+            ret, frame, captured_at = grabber.read()
+            capture_wait = time.perf_counter() - start
+            if not ret:
+                logging.error("Failed to grab frame")
+                break
+
+            start = time.perf_counter()
+            version, values = read_snapshot()
+            if recorder:
+                recorder.record(frame, version, values)
+            detail = "full"
+            if governor:
+                frame = governor.prepare(frame)
+                detail = governor.settings["detail"]
+            if detail not in overlays:
+                overlays[detail] = OverlayRenderer(tag_configs, COMPACT_AESTHETICS)
+            frame = overlays[detail].render(frame, values, version)
+            rendered = time.perf_counter()
+            for sink in sinks:
+                sink.write(frame)
+            key = cv2.waitKey(1) if display else -1
+            done = time.perf_counter()
+
+            stats.add(rendered - start, done - captured_at, capture_wait, done - rendered)
+            stats.report(grabber)
+            if governor:
+                # A repeated frame keeps its capture time; leave it out of the latency
+                governor.update(done - start, done - captured_at if captured_at != last_captured_at else None)
+            last_captured_at = captured_at
+            if frame_count == 1 and on_started:
+                on_started()
+
+            if key == ord('q'):
+                break
+    except KeyboardInterrupt:
+        pass
+
+    stats.close()
+    grabber.stop()
+    for sink in sinks:
+        sink.close()
+    if recorder:
+        recorder.close()
+    if display:
+        cv2.destroyAllWindows()
+
+    # Stop the pollers and wait for them to finish their current cycle
+    stop_event.set()
+    for thread in threads:
+        thread.join()
+    close_values()
+
+
+def pipelined_stream_process(selected_stream, tag_file_name, workers, store_name=None,
+                             capture=None, connect=None, sinks=None, max_frames=None, stop_event=None, on_started=None):
+    # video_stream_process with decode, overlay (on workers processes) and output as pipeline stages
+    db_configs, tag_configs, _ = read_config(tag_file=tag_file_name)
+    stream_options = read_stream_options().get(selected_stream, {})
+    stream_name = stream_options.get("name", selected_stream)
+    start_metrics_reporting(stream_name)
+    if float(stream_options.get("target_fps", 0) or 0) > 0:
+        logging.info(f"{stream_name}: the frame governor is not used in pipelined mode")
+
+    # Workers read tag values from a shared store; without one from the GUI this process polls into its own
+    stop_event = stop_event or threading.Event()
+    owned_store = not store_name
+    store = SharedTagStore(tag_configs, name=store_name, create=owned_store)
+    threads = []
+    if owned_store:
+        writers = {source: SharedSourceValues(store, source) for source in tag_configs}
+        threads = start_tag_pollers(db_configs, tag_configs, writers, stop_event, connect)
+
+    opened = open_capture(selected_stream, capture)
+    pipeline = FramePipeline(opened[0], stream_name, tag_file_name, store.name, workers, opened[1],
+                             stream_aesthetics(stream_options)) if opened else None
+    recorder = build_replay_recorder(stream_options, stream_name) if pipeline else None
+    if recorder:
+        pipeline.on_decoded = lambda frame: recorder.record(frame, *store.read_snapshot())
+    if pipeline is None or pipeline.start() is None:
+        if pipeline:
+            logging.error("Failed to grab frame")
+            pipeline.stop()
+        if recorder:
+            recorder.close()
+    else:
+        METRICS.set("arcam_pipeline_workers", workers, stream=stream_name)
+        stats = StreamStats(stream_name, pipeline)
+        if sinks is None:
+            sinks = build_sinks(stream_options, f'Video Stream - {selected_stream}')
+        display = any(isinstance(sink, DisplaySink) for sink in sinks)
+        # Threaded sinks keep the frame after write(); they get a copy, as the slot is reused
+        copy_for_sinks = any(isinstance(sink, ThreadedSink) for sink in sinks)
+
+        frame_count = 0
+        try:
+            while (max_frames is None or frame_count < max_frames) and not stop_event.is_set():
+                start = time.perf_counter()
+                item = pipeline.read()
+                capture_wait = time.perf_counter() - start
+                if item is None:
+                    if pipeline.finished():
+                        logging.error("Failed to grab frame")
+                        break
+                    if not pipeline.workers_alive():
+                        logging.error(f"{stream_name}: a pipeline worker stopped")
+                        break
+                    continue
+                frame_count += 1
+                slot, frame, captured_at, overlay_time = item
+                rendered = time.perf_counter()
+                output = frame.copy() if copy_for_sinks else frame
+                for sink in sinks:
+                    sink.write(output)
+                # No view of the slot may outlive its release (or the ring)
+                item = frame = output = None
+                pipeline.release(slot)
+                key = cv2.waitKey(1) if display else -1
+                done = time.perf_counter()
+
+                stats.add(overlay_time, done - captured_at, capture_wait, done - rendered)
+                stats.report(pipeline)
+                if frame_count == 1 and on_started:
+                    on_started()
+                if key == ord('q'):
+                    break
+        except KeyboardInterrupt:
+            pass
+
+        stats.close()
+        pipeline.stop()
+        for sink in sinks:
+            sink.close()
+        if recorder:
+            recorder.close()
+        if display:
+            cv2.destroyAllWindows()
+
+    stop_event.set()
+    for thread in threads:
+        thread.join()
+    store.close()
+    if owned_store:
+        store.unlink()
+
+
+def parse_local_time(text):
+    # "YYYY-mm-dd HH:MM[:SS]" local time -> epoch seconds
+    for time_format in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M"):
+        try:
+            return time.mktime(time.strptime(text.strip(), time_format))
+        except ValueError:
+            pass
+    raise ValueError(f"Invalid time '{text}', expected YYYY-mm-dd HH:MM:SS")
+
+
+def replay_process(selected_stream, tag_file_name, start_at=None):
+    # Plays the stream's replay recording from start_at (epoch seconds, default the oldest frame kept)
+    # with the overlay re-rendered from the recorded tag values. The slider jumps anywhere in the
+    # recording; keys: space pause, a/d 10 s back/forward, j/l 60 s back/forward, q quit.
+    _, tag_configs, _ = read_config(tag_file=tag_file_name)
+    stream_options = read_stream_options().get(selected_stream, {})
+    stream_name = stream_options.get("name", selected_stream)
+    reader = ReplayReader(stream_options.get("record_dir", "recordings"), stream_name)
+    first, last = reader.time_range()
+    if first is None:
+        logging.error(f"No replay recording for {stream_name}")
         return
 
-    aesthetics = {
-        "start_y": 20,
-        "padding": 10,
-        "text_scale": 1,
-        "text_color": (255, 255, 255),
-        "rect_color": (128, 128, 128),
-        "rect_thickness": 2,
-        "line_spacing": 5
+    title = f"Replay - {stream_name}"
+    overlay = OverlayRenderer(tag_configs, DEFAULT_AESTHETICS)
+    slider = {"position": 0, "seek": None}
+
+    def on_slider(position):
+        # Ignores the moves made below to follow playback
+        if position != slider["position"]:
+            slider["seek"] = first + position
+
+    cv2.namedWindow(title)
+    cv2.createTrackbar("seconds", title, 0, max(1, int(last - first)), on_slider)
+    seek_to = first if start_at is None else start_at
+    paused, when, clock, key = False, seek_to, None, -1
+    while key not in (ord('q'), 27):
+        if slider["seek"] is not None:
+            seek_to, slider["seek"] = slider["seek"], None
+        if seek_to is not None:
+            reader.seek(seek_to)
+            seek_to, clock, shown = None, None, False
+        elif paused:
+            key = cv2.waitKey(50) & 0xFF
+        if not paused or not shown:
+            ok, frame, frame_time = reader.read()
+            if not ok:
+                # End of what has been recorded so far: wait for more
+                key = cv2.waitKey(200) & 0xFF
+                clock = None
+            else:
+                when, shown = frame_time, True
+                if clock is None:
+                    clock = (time.perf_counter(), when)
+                version, values = reader.read_snapshot()
+                frame = overlay.render(frame, values, version)
+                stamp = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(when)) + (" (paused)" if paused else "")
+                cv2.putText(frame, stamp, (10, frame.shape[0] - 15), cv2.FONT_HERSHEY_DUPLEX, 0.8, (0, 255, 255), 1, cv2.LINE_AA)
+                cv2.imshow(title, frame)
+
+                first, last = reader.time_range()
+                cv2.setTrackbarMax("seconds", title, max(1, int(last - first)))
+                slider["position"] = int(when - first)
+                cv2.setTrackbarPos("seconds", title, slider["position"])
+                # Play at the recorded pace
+                delay = clock[0] + (when - clock[1]) - time.perf_counter()
+                key = cv2.waitKey(max(1, int(delay * 1000))) & 0xFF
+
+        if key == ord(' '):
+            paused, clock = not paused, None
+        elif key in (ord('a'), ord('d'), ord('j'), ord('l')):
+            seek_to = when + {ord('a'): -10, ord('d'): 10, ord('j'): -60, ord('l'): 60}[key]
+
+    reader.close()
+    cv2.destroyAllWindows()
+
+
+def build_history_start_query(events_table, time_column, tag_count):
+    # Value of each tag as of a point in time: the last event at or before it, one index seek per tag
+    latest_ids = " UNION ALL ".join([f"SELECT MAX(EventID) FROM {events_table} WHERE [TagName] = ? AND {time_column} <= ?"] * tag_count)
+    return f"SELECT TagName, ValueString FROM {events_table} WHERE EventID IN ({latest_ids})"
+
+
+def build_history_events_query(events_table, time_column):
+    return (
+        f"SELECT {time_column}, TagName, ValueString FROM {events_table} "
+        f"WHERE {time_column} > ? AND {time_column} <= ? ORDER BY {time_column}, EventID"
+    )
+
+
+def event_time(stamp):
+    # EventStamp comes back as datetime (SQL Server) or as text / a number (SQLite stand-ins)
+    if isinstance(stamp, datetime.datetime):
+        return stamp.timestamp()
+    if isinstance(stamp, str):
+        return datetime.datetime.fromisoformat(stamp).timestamp()
+    return float(stamp)
+
+
+def fetch_tag_history(db_configs, tag_configs, start, end, connect=None, fetch_rows=10000):
+    # Everything annotation needs for [start, end] in two statements per source (plus batches):
+    # each tag's value at start and every event after it. Returns ({source: {tag: value}}, events)
+    # with events as (time, source, tag, value) in time order.
+    initial, events = {}, []
+    for source, db_config in db_configs.items():
+        tags = {tag_name: tag_info for tag_name, tag_info in tag_configs.get(source, {}).items() if ";" in tag_info}
+        if not tags:
+            continue
+        fetch_options = get_fetch_options(db_config)
+        events_table, time_column = fetch_options["events_table"], fetch_options["time_column"]
+        tags_by_db_name = {}
+        for tag_name, tag_db_name in get_tag_db_names(tags).items():
+            tags_by_db_name.setdefault(tag_db_name, []).append(tag_name)
+        start_stamp, end_stamp = datetime.datetime.fromtimestamp(start), datetime.datetime.fromtimestamp(end)
+
+        conn = (connect or pyodbc.connect)(build_connection_string(db_config))
+        try:
+            values = {tag_name: "No data" for tag_name in tags}
+            # Two parameters per tag, so half a batch keeps within the statement parameter limit
+            for chunk in chunk_list(list(tags_by_db_name), max(1, fetch_options["batch_size"] // 2)):
+                params = [param for tag_db_name in chunk for param in (tag_db_name, start_stamp)]
+                for tag_db_name, value in conn.execute(build_history_start_query(events_table, time_column, len(chunk)), params).fetchall():
+                    for tag_name in tags_by_db_name[tag_db_name]:
+                        values[tag_name] = value
+            initial[source] = values
+
+            cursor = conn.execute(build_history_events_query(events_table, time_column), (start_stamp, end_stamp))
+            while True:
+                batch = cursor.fetchmany(fetch_rows)
+                if not batch:
+                    break
+                for stamp, tag_db_name, value in batch:
+                    for tag_name in tags_by_db_name.get(tag_db_name, ()):
+                        events.append((event_time(stamp), source, tag_name, value))
+        finally:
+            conn.close()
+    events.sort(key=lambda event: event[0])
+    return initial, events
+
+
+class AviMjpegWriter:
+    # Muxes already encoded JPEG frames into an MJPEG AVI without decoding or re-encoding them, so
+    # segments annotated in parallel are stitched at disk speed. Plain AVI 1.0: up to 4 GB.
+    def __init__(self, path, width, height, fps):
+        self.path = path
+        self.width, self.height, self.fps = width, height, fps
+        self.index = []
+        self.max_frame_bytes = 0
+        self.file = open(path, "wb")
+        self.file.write(self.headers())
+        self.movi_start = self.file.tell() - 4  # idx1 offsets count from the 'movi' fourcc
+
+    def headers(self, riff_size=0, movi_size=4):
+        frames = len(self.index)
+        rate = int(round(self.fps * 1000))
+        avih = struct.pack("<14I", int(1e6 / self.fps), 0, 0, 0x10, frames, 0, 1, self.max_frame_bytes,
+                           self.width, self.height, 0, 0, 0, 0)
+        strh = b"vidsMJPG" + struct.pack("<IHHIIIIIIiI4h", 0, 0, 0, 0, 1000, rate, 0, frames, self.max_frame_bytes, -1, 0,
+                                         0, 0, self.width, self.height)
+        strf = struct.pack("<IiiHH4sIiiII", 40, self.width, self.height, 1, 24, b"MJPG", self.width * self.height * 3, 0, 0, 0, 0)
+        strl = b"strl" + self.chunk(b"strh", strh) + self.chunk(b"strf", strf)
+        hdrl = b"hdrl" + self.chunk(b"avih", avih) + self.chunk(b"LIST", strl)
+        return b"RIFF" + struct.pack("<I", riff_size) + b"AVI " + self.chunk(b"LIST", hdrl) + b"LIST" + struct.pack("<I", movi_size) + b"movi"
+
+    def chunk(self, fourcc, data):
+        return fourcc + struct.pack("<I", len(data)) + data + (b"\0" if len(data) % 2 else b"")
+
+    def write(self, jpeg):
+        offset = self.file.tell()
+        if offset + len(jpeg) + 16 * (len(self.index) + 2) >= 1 << 32:
+            raise ValueError(f"{self.path}: AVI output is limited to 4 GB, annotate a shorter range or lower the quality")
+        self.file.write(self.chunk(b"00dc", jpeg))
+        self.index.append((offset - self.movi_start, len(jpeg)))
+        self.max_frame_bytes = max(self.max_frame_bytes, len(jpeg))
+
+    def close(self):
+        movi_end = self.file.tell()
+        # Every MJPEG frame is a key frame (AVIIF_KEYFRAME)
+        self.file.write(self.chunk(b"idx1", b"".join(struct.pack("<4sIII", b"00dc", 0x10, offset, size) for offset, size in self.index)))
+        riff_size = self.file.tell() - 8
+        self.file.seek(0)
+        self.file.write(self.headers(riff_size, movi_end - self.movi_start))
+        self.file.close()
+
+
+def seek_to_frame(video_file, frame_number):
+    # CAP_PROP_POS_FRAMES is not frame-accurate with every container and codec: the capture may land
+    # on a nearby key frame instead. Take the seek only when the reported position matches, otherwise
+    # reopen the file and grab() forward from the first frame, counting.
+    cap = cv2.VideoCapture(video_file)
+    if frame_number <= 0:
+        return cap
+    if cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number) and int(cap.get(cv2.CAP_PROP_POS_FRAMES)) == frame_number:
+        return cap
+    logging.warning(f"{video_file}: seek to frame {frame_number} is not exact, reading forward from the start")
+    cap.release()
+    cap = cv2.VideoCapture(video_file)
+    for _ in range(frame_number):
+        if not cap.grab():
+            break
+    return cap
+
+
+def annotate_segment(video_file, tag_configs, first_frame, frame_count, video_start, fps, initial, events, part_file, jpeg_quality):
+    # Worker side of annotate_video: decode frame_count frames from first_frame, draw the overlay
+    # with the values at each frame's time and append the JPEGs to part_file.
+    # Returns the JPEG sizes and the seconds spent decoding, rendering and encoding.
+    cap = seek_to_frame(video_file, first_frame)
+    overlay = OverlayRenderer(tag_configs, DEFAULT_AESTHETICS)
+    values = {source: TagValues() for source in initial}
+    for source, tags in initial.items():
+        for tag_name, value in tags.items():
+            values[source][tag_name] = value
+    version, position = 0, 0
+    sizes, timings = [], {"decode": 0.0, "render": 0.0, "encode": 0.0}
+    with open(part_file, "wb") as outfile:
+        for frame_number in range(first_frame, first_frame + frame_count):
+            start = time.perf_counter()
+            ok, frame = cap.read()
+            decoded = time.perf_counter()
+            if not ok:
+                break
+            frame_time = video_start + frame_number / fps
+            if position < len(events) and events[position][0] <= frame_time:
+                while position < len(events) and events[position][0] <= frame_time:
+                    _, source, tag_name, value = events[position]
+                    values[source][tag_name] = value
+                    position += 1
+                version += 1
+            frame = overlay.render(frame, values, version)
+            rendered = time.perf_counter()
+            ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+            if not ok:
+                logging.warning(f"{video_file}: unable to encode frame {frame_number}, left out of the annotated video")
+                continue
+            outfile.write(buffer.tobytes())
+            sizes.append(len(buffer))
+            done = time.perf_counter()
+            timings["decode"] += decoded - start
+            timings["render"] += rendered - decoded
+            timings["encode"] += done - rendered
+    cap.release()
+    return sizes, timings
+
+
+def annotate_video(video_file, output_file, tag_file_name, db_configs, video_start=None, workers=None, connect=None,
+                   jpeg_quality=90, segments_per_worker=2):
+    # Headless batch annotation of a recorded video with the tag values of its own time range
+    # (video_start = epoch seconds of the first frame, default file time minus duration). Values
+    # are fetched once for the whole range, the frames are split into contiguous segments annotated
+    # in worker processes, and the JPEG segments are muxed in order into an MJPEG AVI.
+    _, tag_configs, _ = read_config(tag_file=tag_file_name)
+    workers = workers or os.cpu_count() or 1
+    cap = cv2.VideoCapture(video_file)
+    if not cap.isOpened():
+        raise ValueError(f"Unable to open video: {video_file}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    width, height = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    cap.release()
+    if frame_count <= 0:
+        raise ValueError(f"Unable to read the frame count of {video_file}")
+    duration = frame_count / fps
+    if video_start is None:
+        video_start = os.path.getmtime(video_file) - duration
+        logging.warning(f"No start time given for {video_file}, assuming {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(video_start))} (file time minus duration)")
+
+    started = time.perf_counter()
+    initial, events = fetch_tag_history(db_configs, tag_configs, video_start, video_start + duration, connect)
+    fetched = time.perf_counter()
+
+    segment_frames = -(-frame_count // (workers * segments_per_worker))
+    segments = [(first, min(segment_frames, frame_count - first)) for first in range(0, frame_count, segment_frames)]
+    part_dir = tempfile.mkdtemp(prefix="annotate-", dir=os.path.dirname(os.path.abspath(output_file)))
+    # Each segment gets the values as of its first frame and only the events up to its last frame
+    event_times = [event[0] for event in events]
+    values = {source: dict(tags) for source, tags in initial.items()}
+    position, jobs = 0, []
+    for number, (first, count) in enumerate(segments):
+        start_position = bisect.bisect_right(event_times, video_start + first / fps)
+        for _, source, tag_name, value in events[position:start_position]:
+            values[source][tag_name] = value
+        position = start_position
+        end_position = bisect.bisect_right(event_times, video_start + (first + count - 1) / fps)
+        jobs.append((video_file, tag_configs, first, count, video_start, fps, {source: dict(tags) for source, tags in values.items()},
+                     events[position:end_position], os.path.join(part_dir, f"part{number:05d}.jpg"), jpeg_quality))
+
+    writer = AviMjpegWriter(output_file, width, height, fps)
+    timings, frames, stitch_seconds = {"decode": 0.0, "render": 0.0, "encode": 0.0}, 0, 0.0
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        if executor is None:
+            results = (annotate_segment(*job) for job in jobs)
+        else:
+            results = executor.map(annotate_segment, *zip(*jobs))
+        # Segments come back in order; each is muxed as soon as it and those before it are done
+        for job, (sizes, segment_timings) in zip(jobs, results):
+            stitch_start = time.perf_counter()
+            with open(job[8], "rb") as infile:
+                for size in sizes:
+                    writer.write(infile.read(size))
+            os.remove(job[8])
+            stitch_seconds += time.perf_counter() - stitch_start
+            frames += len(sizes)
+            for stage, seconds in segment_timings.items():
+                timings[stage] += seconds
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        writer.close()
+        for job in jobs:
+            if os.path.exists(job[8]):
+                os.remove(job[8])
+        os.rmdir(part_dir)
+
+    elapsed = time.perf_counter() - started
+    busy = sum(timings.values())
+    return {
+        "video": video_file,
+        "output": output_file,
+        "frames": frames,
+        "segments": len(segments),
+        "workers": workers,
+        "events": len(events),
+        "history_fetch_seconds": round(fetched - started, 3),
+        "stitch_seconds": round(stitch_seconds, 3),
+        "seconds": round(elapsed, 3),
+        "fps": round(frames / elapsed, 1) if elapsed else None,
+        "realtime_factor": round(frames / fps / elapsed, 2) if elapsed else None,
+        # Wall-clock throughput over the cores actually available to the workers
+        "fps_per_core": round(frames / elapsed / min(workers, os.cpu_count() or 1), 1) if elapsed else None,
+        # Frames per second of worker time (decode + overlay + JPEG); drops when workers share cores
+        "worker_fps": round(frames / busy, 1) if busy else None,
+        **{f"{stage}_ms_per_frame": round(seconds / frames * 1000, 3) for stage, seconds in timings.items() if frames},
     }
 
+
+def stream_worker_process(conn):
+    # Pre-warmed stream process for the GUI: numpy, cv2 and pyodbc are imported and config.ini is
+    # parsed once, then it runs streams on request so starting or switching only opens the stream.
+    # Commands on the pipe: ("start" | "switch", stream_url, tag_file_name, store_name, requested_at),
+    # ("stop",), ("exit",). Replies: ("ready", pid), ("started", stream_url, seconds), ("stopped", stream_url).
+    commands = queue.Queue()
+    stop_event = threading.Event()
+    # Queuing a command and setting the stop event happen together, as do clearing the event and
+    # checking for newer commands, so a stream is never started with a pending stop lost or left set
+    command_lock = threading.Lock()
+
+    def listen():
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                message = ("exit",)
+            with command_lock:
+                # Any command ends the running stream; "switch" then starts the next one
+                stop_event.set()
+                commands.put(message)
+            if message[0] == "exit":
+                return
+
+    threading.Thread(target=listen, name="worker-commands", daemon=True).start()
+    db_configs, _, _ = read_config()
+    conn.send(("ready", os.getpid()))
+
     while True:
-        ret, frame = cap.read()
-        if not ret:
-            logging.error("Failed to grab frame")
+        message = commands.get()
+        if message[0] == "exit":
             break
+        if message[0] not in ("start", "switch"):
+            continue
+        with command_lock:
+            stop_event.clear()
+            if not commands.empty():
+                # Superseded by a newer command before it got going
+                continue
+        _, stream_url, tag_file_name, store_name, requested_at = message
+
+        def started():
+            startup = time.time() - requested_at
+            METRICS.set("arcam_stream_startup_seconds", startup, stream=stream_url)
+            logging.info(f"Stream {stream_url} started in {startup:.2f} s")
+            conn.send(("started", stream_url, startup))
+
+        try:
+            video_stream_process(stream_url, tag_file_name, db_configs, store_name, stop_event=stop_event, on_started=started)
+        except Exception as e:
+            logging.error(f"Stream {stream_url} failed: {e}")
+        conn.send(("stopped", stream_url))
+
+
+class StreamWorkerPool:
+    # GUI side of the pre-warmed workers: keeps `spare` idle workers started ahead of time
+    def __init__(self, spare=1):
+        self.spare = max(1, spare)
+        self.workers = []
+        self.fill()
+
+    def fill(self):
+        idle = [worker for worker in self.workers if worker["stream"] is None and worker["process"].is_alive()]
+        for _ in range(self.spare - len(idle)):
+            conn, child_conn = multiprocessing.Pipe()
+            # Not daemonic, so a stream can start its pipeline workers; close() and the pipe's EOF end it
+            process = multiprocessing.Process(target=stream_worker_process, args=(child_conn,))
+            process.start()
+            self.workers.append({"process": process, "conn": conn, "stream": None, "ready": False, "spawned_at": time.time()})
+
+    def idle_worker(self):
+        # Prefer a worker that has finished warming up
+        idle = [worker for worker in self.workers if worker["stream"] is None and worker["process"].is_alive()]
+        idle.sort(key=lambda worker: not worker["ready"])
+        if not idle:
+            self.fill()
+            return self.idle_worker()
+        return idle[0]
+
+    def start(self, stream_url, tag_file_name, store_name):
+        worker = self.idle_worker()
+        worker["conn"].send(("start", stream_url, tag_file_name, store_name, time.time()))
+        worker["stream"] = stream_url
+        self.fill()
+        return worker
+
+    def switch(self, worker, stream_url, tag_file_name, store_name):
+        worker["conn"].send(("switch", stream_url, tag_file_name, store_name, time.time()))
+        worker["stream"] = stream_url
+
+    def stop(self, worker):
+        worker["conn"].send(("stop",))
+
+    def poll(self):
+        # Messages from the workers as (worker, message); dead workers are dropped
+        messages = []
+        for worker in list(self.workers):
+            try:
+                while worker["conn"].poll():
+                    message = worker["conn"].recv()
+                    if message[0] == "ready":
+                        worker["ready"] = True
+                        message = message + (time.time() - worker["spawned_at"],)
+                    elif message[0] == "stopped" and worker["stream"] == message[1]:
+                        worker["stream"] = None
+                    messages.append((worker, message))
+            except (EOFError, OSError):
+                pass
+            if not worker["process"].is_alive():
+                self.workers.remove(worker)
+        self.fill()
+        return messages
 
-        frame = draw_visualizations(frame, latest_values, aesthetics, tag_configs)
-        cv2.imshow(f'Video Stream - {selected_stream}', frame)
+    def close(self):
+        for worker in self.workers:
+            try:
+                worker["conn"].send(("exit",))
+            except (EOFError, OSError):
+                pass
+        for worker in self.workers:
+            worker["process"].join(timeout=2)
+            if worker["process"].is_alive():
+                worker["process"].terminate()
+
+
+def compose_video_wall(frames, tile_size=WALL_TILE_SIZE):
+    columns = int(np.ceil(np.sqrt(len(frames))))
+    rows = int(np.ceil(len(frames) / columns))
+    tile_width, tile_height = tile_size
+    wall = np.zeros((rows * tile_height, columns * tile_width, 3), np.uint8)
+    for index, frame in enumerate(frames):
+        if frame is None:
+            continue
+        row, column = divmod(index, columns)
+        wall[row * tile_height:(row + 1) * tile_height, column * tile_width:(column + 1) * tile_width] = \
+            cv2.resize(frame, tile_size, interpolation=cv2.INTER_AREA)
+    return wall
+
+
+def multi_stream_process(selected_streams, tag_file_name, db_configs, video_wall=False, store_name=None):
+    # One process drives all selected cameras; one poller per data source feeds every overlay
+    db_configs, tag_configs, _ = read_config(tag_file=tag_file_name)
+    start_metrics_reporting("multi-stream")
+    stop_event = threading.Event()
+    read_snapshot, threads, close_values, history = attach_tag_values(db_configs, tag_configs, store_name, stop_event)
+
+    stream_options = read_stream_options()
+    feeds = []
+    for name, stream_url in selected_streams.items():
+        grabber = open_supervised_stream(stream_url, stream_options.get(stream_url, {}), name=name)
+        if grabber is None:
+            continue
+        feeds.append({
+            "name": name,
+            "grabber": grabber,
+            "overlay": OverlayRenderer(tag_configs, stream_aesthetics(stream_options.get(stream_url, {})), history),
+            "stats": StreamStats(name, grabber),
+            "sinks": build_sinks(stream_options.get(stream_url, {}), name, display=False),
+            "frame": None,
+        })
+
+    while any(not feed["grabber"].failed for feed in feeds):
+        updated = False
+        for feed in feeds:
+            grabber = feed["grabber"]
+            if grabber.failed:
+                continue
+            ret, frame, captured_at = grabber.read(timeout=0, repeat_last=False)
+            if not ret:
+                if grabber.failed:
+                    logging.error(f"Failed to grab frame from {feed['name']}")
+                continue
+
+            start = time.perf_counter()
+            version, values = read_snapshot()
+            feed["frame"] = feed["overlay"].render(frame, values, version)
+            rendered = time.perf_counter()
+            if not video_wall:
+                cv2.imshow(f'Video Stream - {feed["name"]}', feed["frame"])
+            for sink in feed["sinks"]:
+                sink.write(feed["frame"])
+            done = time.perf_counter()
+            feed["stats"].add(rendered - start, done - captured_at, output_time=done - rendered)
+            feed["stats"].report(grabber)
+            updated = True
+
+        if video_wall and updated:
+            cv2.imshow('Video Wall', compose_video_wall([feed["frame"] for feed in feeds]))
+        if not updated:
+            time.sleep(0.002)
 
         if cv2.waitKey(1) == ord('q'):
             break
 
-    cap.release()
+    for feed in feeds:
+        feed["stats"].close()
+        feed["grabber"].stop()
+        for sink in feed["sinks"]:
+            sink.close()
     cv2.destroyAllWindows()
-
-    # Wait for threads to complete (optional cleanup)
+    stop_event.set()
     for thread in threads:
         thread.join()
+    close_values()
 
 
 def create_gui(streams, db_configs):
+    tag_stores = {}  # tags file -> (store, poller, mtime)
+    retired_stores = []  # (store, poller) of edited tags files, still read by running streams
+    worker_pool = StreamWorkerPool()
+    running = {}  # stream url -> pooled worker showing it
+
+    def get_tag_store(tag_file_name):
+        # One shared store and one poller process per tags file, shared by every stream process.
+        # An edited tags file gets a new store and poller; streams already running keep the old pair.
+        store, poller, mtime = tag_stores.get(tag_file_name, (None, None, None))
+        current_mtime = os.path.getmtime(tag_file_name)
+        if store is not None and current_mtime != mtime:
+            _, tag_configs, _ = read_config(tag_file=tag_file_name)
+            if tag_layout_hash(tag_configs) != store.layout_hash:
+                logging.info(f"{tag_file_name} changed, starting a new tag value store for it")
+                retired_stores.append((store, poller))
+                store = poller = None
+        if store is None:
+            _, tag_configs, _ = read_config(tag_file=tag_file_name)
+            store = SharedTagStore(tag_configs, create=True)
+        if poller is None or not poller.is_alive():
+            poller = multiprocessing.Process(target=tag_poller_process, args=(tag_file_name, store.name), daemon=True)
+            poller.start()
+        tag_stores[tag_file_name] = (store, poller, current_mtime)
+        return store.name
+
+    def on_close():
+        worker_pool.close()
+        for store, poller in [entry[:2] for entry in tag_stores.values()] + retired_stores:
+            poller.terminate()
+            store.close()
+            store.unlink()
+        root.destroy()
+
     def select_file():
         file_path = filedialog.askopenfilename(
             title="Select Tags File",
@@ -215,17 +3722,88 @@ def create_gui(streams, db_configs):
         except Exception as e:
             messagebox.showerror("Error", f"Unable to read file: {e}")
 
-    def on_start():
+    def get_stream_request():
         selected_camera = streams_listbox.get(tk.ACTIVE)
         if not selected_camera:
             messagebox.showwarning("Warning", "Please select a camera stream!")
+            return None
+        tag_file_name = tags_file_label.get(1.0, tk.END).strip()
+        if not tag_file_name:
+            messagebox.showwarning("Warning", "Please select a tags file!")
+            return None
+        return streams[selected_camera], tag_file_name, get_tag_store(tag_file_name)
+
+    def on_start():
+        # Runs in a pre-warmed worker; startup time is shown once the first frame is out
+        request = get_stream_request()
+        if request is None:
+            return
+        if request[0] in running:
+            messagebox.showinfo("Info", "This stream is already running.")
+            return
+        running[request[0]] = worker_pool.start(*request)
+        status_var.set(f"Starting {request[0]} ...")
+
+    def on_switch():
+        # Last started stream's worker switches to the selected camera (no new process)
+        request = get_stream_request()
+        if request is None:
+            return
+        if not running:
+            on_start()
+            return
+        if request[0] in running:
+            return
+        stream_url, worker = list(running.items())[-1]
+        del running[stream_url]
+        worker_pool.switch(worker, *request)
+        running[request[0]] = worker
+        status_var.set(f"Switching to {request[0]} ...")
+
+    def on_stop():
+        if running:
+            stream_url, worker = list(running.items())[-1]
+            worker_pool.stop(worker)
+            status_var.set(f"Stopping {stream_url} ...")
+
+    def poll_workers():
+        for worker, message in worker_pool.poll():
+            if message[0] == "ready":
+                logging.info(f"Stream worker {message[1]} ready in {message[2]:.2f} s")
+            elif message[0] == "started":
+                status_var.set(f"{message[1]} started in {message[2]:.2f} s")
+            elif message[0] == "stopped" and running.get(message[1]) is worker:
+                del running[message[1]]
+                status_var.set(f"{message[1]} stopped")
+        root.after(200, poll_workers)
+
+    def on_start_multi():
+        selected_cameras = [streams_listbox.get(index) for index in streams_listbox.curselection()]
+        if not selected_cameras:
+            messagebox.showwarning("Warning", "Please select one or more camera streams!")
             return
         tag_file_name = tags_file_label.get(1.0, tk.END).strip()
         if not tag_file_name:
             messagebox.showwarning("Warning", "Please select a tags file!")
             return
-        stream_url = streams[selected_camera]
-        proc = multiprocessing.Process(target=video_stream_process, args=(stream_url, tag_file_name, db_configs))
+        selected_streams = {camera: streams[camera] for camera in selected_cameras}
+        store_name = get_tag_store(tag_file_name)
+        proc = multiprocessing.Process(target=multi_stream_process, args=(selected_streams, tag_file_name, db_configs, video_wall_var.get(), store_name))
+        proc.start()
+
+    def on_replay():
+        # Separate process per replay window; the tags file gives the overlay layout
+        selected_camera = streams_listbox.get(tk.ACTIVE)
+        if not selected_camera:
+            messagebox.showwarning("Warning", "Please select a camera stream!")
+            return
+        try:
+            start_at = parse_local_time(replay_time_var.get()) if replay_time_var.get().strip() else None
+        except ValueError as e:
+            messagebox.showwarning("Warning", str(e))
+            return
+        tag_file_name = tags_file_label.get(1.0, tk.END).strip() or None
+        proc = multiprocessing.Process(target=replay_process, args=(streams[selected_camera], tag_file_name, start_at))
         proc.start()
 
     root = tk.Tk()
@@ -241,7 +3819,7 @@ def create_gui(streams, db_configs):
     listbox_frame = ttk.Frame(streams_frame)
     listbox_frame.pack(fill=tk.BOTH)
 
-    streams_listbox = tk.Listbox(listbox_frame, height=5)
+    streams_listbox = tk.Listbox(listbox_frame, height=5, selectmode=tk.EXTENDED)
     streams_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5, pady=5)
     for stream in streams.keys():
         streams_listbox.insert(tk.END, stream)
@@ -269,13 +3847,78 @@ def create_gui(streams, db_configs):
     file_content_text = tk.Text(content_frame, height=10, wrap=tk.WORD, bg="#f9f9f9", state=tk.NORMAL)
     file_content_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
 
-    start_button = ttk.Button(root, text="Start Stream", command=on_start)
-    start_button.pack(pady=10)
+    buttons_frame = ttk.Frame(root)
+    buttons_frame.pack(pady=10)
+
+    start_button = ttk.Button(buttons_frame, text="Start Stream", command=on_start)
+    start_button.pack(side=tk.LEFT, padx=5)
 
+    switch_button = ttk.Button(buttons_frame, text="Switch Stream", command=on_switch)
+    switch_button.pack(side=tk.LEFT, padx=5)
+
+    stop_button = ttk.Button(buttons_frame, text="Stop Stream", command=on_stop)
+    stop_button.pack(side=tk.LEFT, padx=5)
+
+    start_multi_button = ttk.Button(buttons_frame, text="Start Selected Streams", command=on_start_multi)
+    start_multi_button.pack(side=tk.LEFT, padx=5)
+
+    video_wall_var = tk.BooleanVar(value=False)
+    video_wall_check = ttk.Checkbutton(buttons_frame, text="Video wall", variable=video_wall_var)
+    video_wall_check.pack(side=tk.LEFT, padx=5)
+
+    replay_frame = ttk.Frame(root)
+    replay_frame.pack(pady=(0, 10))
+    tk.Label(replay_frame, text="Replay from (YYYY-mm-dd HH:MM:SS, empty = oldest)").pack(side=tk.LEFT, padx=5)
+    replay_time_var = tk.StringVar(value="")
+    ttk.Entry(replay_frame, textvariable=replay_time_var, width=20).pack(side=tk.LEFT, padx=5)
+    replay_button = ttk.Button(replay_frame, text="Replay", command=on_replay)
+    replay_button.pack(side=tk.LEFT, padx=5)
+
+    status_var = tk.StringVar(value="")
+    tk.Label(root, textvariable=status_var, anchor="w").pack(fill=tk.X, padx=10, pady=(0, 5))
+
+    root.protocol("WM_DELETE_WINDOW", on_close)
+    root.after(200, poll_workers)
     root.mainloop()
 
 
 if __name__ == "__main__":
     multiprocessing.set_start_method('spawn')
+    arg_parser = argparse.ArgumentParser(description="AR camera feeds with SCADA tag overlays")
+    arg_parser.add_argument("--stream", help="run this stream (name from config.ini) without the GUI")
+    arg_parser.add_argument("--tags", help="tags file for --stream")
+    arg_parser.add_argument("--replay", action="store_true", help="replay the recording of --stream (sinks = ..., replay) instead")
+    arg_parser.add_argument("--at", help="replay from this local time (YYYY-mm-dd HH:MM:SS), default the oldest recording")
+    arg_parser.add_argument("--annotate", metavar="VIDEO", help="burn the overlay with historical tag values into a recorded video (headless)")
+    arg_parser.add_argument("--output", help="annotated MJPEG AVI for --annotate (default <video>-annotated.avi)")
+    arg_parser.add_argument("--video-start", help="local time of the first frame for --annotate (YYYY-mm-dd HH:MM:SS)")
+    arg_parser.add_argument("--workers", type=int, default=None,
+                            help="worker processes for --annotate (default: CPU count), or overlay workers for --stream "
+                                 "(default: pipeline_workers of the stream, 0 = serial)")
+    args = arg_parser.parse_args()
+
     db_configs, _, streams = read_config()
-    create_gui(streams, db_configs)
+    if args.annotate:
+        if not args.tags:
+            arg_parser.error("--annotate needs --tags")
+        try:
+            video_start = parse_local_time(args.video_start) if args.video_start else None
+        except ValueError as e:
+            arg_parser.error(str(e))
+        output_file = args.output or os.path.splitext(args.annotate)[0] + "-annotated.avi"
+        report = annotate_video(args.annotate, output_file, args.tags, db_configs, video_start, args.workers)
+        print(json.dumps(report, indent=2))
+    elif args.stream:
+        # Headless / service mode: outputs come from the sinks configured for the stream
+        if args.stream not in streams:
+            arg_parser.error(f"Unknown stream: {args.stream}")
+        if args.replay:
+            try:
+                start_at = parse_local_time(args.at) if args.at else None
+            except ValueError as e:
+                arg_parser.error(str(e))
+            replay_process(streams[args.stream], args.tags, start_at)
+        else:
+            video_stream_process(streams[args.stream], args.tags, db_configs, pipeline_workers=args.workers)
+    else:
+        create_gui(streams, db_configs)
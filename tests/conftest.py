@@ -0,0 +1,29 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# The scripts have dashes in their names, so they are loaded by path
+def load_script(file_name, module_name):
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(REPO_DIR, file_name))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="session")
+def camera():
+    return load_script("get-data-to-camera.py", "get_data_to_camera")
+
+
+@pytest.fixture(scope="session")
+def tag_list():
+    return load_script("generate-tag-list.py", "generate_tag_list")
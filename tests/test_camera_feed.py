@@ -0,0 +1,634 @@
+import os
+import random
+import sqlite3
+import threading
+import time
+
+import numpy as np
+import pytest
+
+
+SOURCE = "Source1-test"
+
+
+def create_events(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE Events (EventID INTEGER PRIMARY KEY, TagName TEXT NOT NULL, ValueString TEXT)")
+    conn.executemany("INSERT INTO Events (TagName, ValueString) VALUES (?, ?)", rows)
+    conn.commit()
+    return conn
+
+
+def tag_configs(names):
+    return {SOURCE: {name.lower(): f"{name};%;Test tag {name}" for name in names}}
+
+
+def wait_for(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class FailFirstStatement:
+    # Connection whose first statement fails like a dropped connection or deadlock would
+    def __init__(self, conn):
+        self.conn = conn
+        self.failed = False
+
+    def execute(self, sql, params=()):
+        if not self.failed:
+            self.failed = True
+            raise sqlite3.OperationalError("injected failure")
+        return self.conn.execute(sql, params)
+
+
+# Config
+
+def test_tags_file_does_not_pick_up_db_settings(camera, tmp_path):
+    db_file = tmp_path / "config.ini"
+    db_file.write_text(f"[{SOURCE}]\ndriver = sqlite\nserver = local\n")
+    tag_file = tmp_path / "TagList.ini"
+    tag_file.write_text(f"[{SOURCE}]\na = A;%;Test tag A\n")
+    db_configs, configs, streams = camera.read_config(db_file=str(db_file), tag_file=str(tag_file))
+    assert db_configs[SOURCE]["driver"] == "sqlite"
+    assert configs == tag_configs(["A"])
+
+
+# Batched and per-tag queries
+
+def test_batched_query_matches_per_tag_queries(camera, tmp_path):
+    rng = random.Random(1)
+    names = [f"TAG_{index}" for index in range(30)]
+    conn = create_events(str(tmp_path / "events.db"), [(rng.choice(names), f"{rng.uniform(0, 100):.2f}") for _ in range(3000)])
+    # Tags without events and duplicated names are part of real tag lists
+    db_names = names + ["NO_EVENTS_1", "NO_EVENTS_2", "TAG_3"]
+    batched = camera.fetch_latest_values_batched(conn.cursor(), db_names, "Events", batch_size=7)
+    per_tag = camera.fetch_latest_values_per_tag(conn.cursor(), db_names, "Events")
+    assert batched == per_tag
+    assert len(batched) == len(names)
+
+
+def test_transient_error_keeps_the_batched_query(camera, tmp_path):
+    conn = create_events(str(tmp_path / "events.db"), [("A", "1"), ("B", "2")])
+    fetch_options = camera.get_fetch_options({"events_table": "Events"})
+    with pytest.raises(sqlite3.OperationalError):
+        camera.fetch_latest_values(FailFirstStatement(conn), ["A", "B"], SOURCE, fetch_options)
+    assert fetch_options["batched"]
+    assert camera.fetch_latest_values(conn, ["A", "B"], SOURCE, fetch_options) == {"A": "1", "B": "2"}
+    # Once the batched statement has run, later errors are never taken for a rejected statement
+    with pytest.raises(sqlite3.OperationalError):
+        camera.fetch_latest_values(FailFirstStatement(conn), ["A", "B"], SOURCE, fetch_options)
+    assert fetch_options["batched"]
+
+
+def test_rejected_batched_query_falls_back_to_per_tag_queries(camera, tmp_path):
+    names = [f"TAG_{index}" for index in range(600)]
+    conn = create_events(str(tmp_path / "events.db"), [(name, name.lower()) for name in names])
+    # SQLite refuses more than 500 terms in a compound SELECT
+    fetch_options = camera.get_fetch_options({"events_table": "Events", "batch_size": "600"})
+    results = camera.fetch_latest_values(conn, names, SOURCE, fetch_options)
+    assert not fetch_options["batched"]
+    assert results == {name: name.lower() for name in names}
+
+
+def test_only_syntax_errors_count_as_a_rejected_statement(camera):
+    assert camera.is_statement_rejected(camera.pyodbc.Error("42000", "[42000] Incorrect syntax near 'OVER'"))
+    # General driver errors and dropped connections go to the reconnect path
+    assert not camera.is_statement_rejected(camera.pyodbc.Error("HY000", "[HY000] Communication link failure"))
+    assert not camera.is_statement_rejected(camera.pyodbc.Error("08S01", "[08S01] Communication link failure"))
+
+
+# EventID watermark polling
+
+def test_watermark_poller_applies_new_events(camera, tmp_path):
+    conn = create_events(str(tmp_path / "events.db"), [("A", "1"), ("B", "2")])
+    configs = tag_configs(["A", "B"])
+    latest_values = camera.initialize_latest_values(configs)
+    poller = camera.EventWatermarkPoller(SOURCE, configs[SOURCE], latest_values, camera.get_fetch_options({"events_table": "Events"}))
+    poller.poll(conn)
+    assert dict(latest_values[SOURCE]) == {"a": "1", "b": "2"}
+    assert poller.last_event_id == 2
+
+    conn.executemany("INSERT INTO Events (TagName, ValueString) VALUES (?, ?)", [("A", "3"), ("A", "4")])
+    poller.poll(conn)
+    assert dict(latest_values[SOURCE]) == {"a": "4", "b": "2"}
+    assert poller.last_event_id == 4
+
+
+def test_watermark_poller_reads_only_new_events_of_its_tags(camera, tmp_path):
+    conn = create_events(str(tmp_path / "events.db"), [("A", "1"), ("B", "2"), ("OTHER", "x")])
+    configs = tag_configs(["A", "B", "C"])
+    latest_values = camera.initialize_latest_values(configs)
+    poller = camera.EventWatermarkPoller(SOURCE, configs[SOURCE], latest_values,
+                                         camera.get_fetch_options({"events_table": "Events", "batch_size": "2", "event_id_overlap": "0"}))
+    poller.poll(conn)
+    assert dict(latest_values[SOURCE]) == {"a": "1", "b": "2", "c": "No data"}
+    assert poller.last_event_id == 3
+
+    conn.executemany("INSERT INTO Events (TagName, ValueString) VALUES (?, ?)",
+                     [("A", "10"), ("OTHER", "y"), ("C", "12"), ("OTHER", "z"), ("A", "11")])
+    assert poller.poll(conn) == 3
+    assert dict(latest_values[SOURCE]) == {"a": "11", "b": "2", "c": "12"}
+    assert poller.last_event_id == 8
+
+
+def test_watermark_poller_picks_up_late_committed_events(camera, tmp_path):
+    conn = create_events(str(tmp_path / "events.db"), [])
+    conn.executemany("INSERT INTO Events VALUES (?, ?, ?)", [(1, "A", "1"), (2, "B", "2"), (10, "A", "10")])
+    configs = tag_configs(["A", "B"])
+    latest_values = camera.initialize_latest_values(configs)
+    poller = camera.EventWatermarkPoller(SOURCE, configs[SOURCE], latest_values, camera.get_fetch_options({"events_table": "Events"}))
+    poller.poll(conn)
+    # EventID 5 was taken before 10 but its transaction committed after the last poll
+    conn.execute("INSERT INTO Events VALUES (5, 'B', '5')")
+    poller.poll(conn)
+    assert dict(latest_values[SOURCE]) == {"a": "10", "b": "5"}
+    assert poller.last_event_id == 10
+
+
+def test_quiet_polls_leave_the_shared_store_generation_alone(camera, tmp_path):
+    conn = create_events(str(tmp_path / "events.db"), [("A", "1"), ("B", "2"), ("A", "3")])
+    configs = tag_configs(["A", "B"])
+    store = camera.SharedTagStore(configs, create=True)
+    try:
+        writer = camera.SharedSourceValues(store, SOURCE)
+        poller = camera.EventWatermarkPoller(SOURCE, configs[SOURCE], {SOURCE: writer}, camera.get_fetch_options({"events_table": "Events"}))
+        poller.poll(conn)
+        writer.publish()
+        generation, values = store.read_snapshot()
+        assert dict(values[SOURCE]) == {"a": "3", "b": "2"}
+        # Both polls re-read the same events through the EventID overlap
+        for _ in range(2):
+            poller.poll(conn)
+            writer.publish()
+            assert store.read_snapshot()[0] == generation
+
+        conn.execute("INSERT INTO Events (TagName, ValueString) VALUES ('B', '4')")
+        poller.poll(conn)
+        writer.publish()
+        new_generation, values = store.read_snapshot()
+        assert new_generation == generation + 1
+        assert dict(values[SOURCE]) == {"a": "3", "b": "4"}
+    finally:
+        store.close()
+        store.unlink()
+
+
+def test_poller_resyncs_after_a_db_outage(camera, tmp_path):
+    path = str(tmp_path / "events.db")
+    create_events(path, [("A", "1"), ("B", "2")]).close()
+    configs = tag_configs(["A", "B"])
+    latest_values = camera.initialize_latest_values(configs)
+    db_config = {"driver": "sqlite", "server": "local", "database": path, "uid": "test", "pwd": "test",
+                 "fetch_mode": "incremental", "events_table": "Events", "poll_interval": "0.05",
+                 "reconnect_min_delay": "0.05", "reconnect_max_delay": "0.2", "bad_after": "0.2"}
+    driver = camera.FlakyDriver(lambda connection_string: sqlite3.connect(path, check_same_thread=False))
+    stop_event = threading.Event()
+    thread = threading.Thread(target=camera.query_database_periodically,
+                              args=(SOURCE, db_config, configs[SOURCE], latest_values, stop_event, driver.connect))
+    thread.start()
+    try:
+        assert wait_for(lambda: dict(latest_values[SOURCE]) == {"a": "1", "b": "2"})
+        # Longer than a poll cycle, so at least one cycle runs into it
+        driver.outage(1.5)
+        assert wait_for(lambda: set(latest_values[SOURCE].quality.values()) == {camera.QUALITY_BAD})
+        # Written while the DB was unreachable to the poller
+        writer = sqlite3.connect(path)
+        writer.executemany("INSERT INTO Events (TagName, ValueString) VALUES (?, ?)", [("A", "3"), ("B", "4")])
+        writer.commit()
+        writer.close()
+        assert wait_for(lambda: dict(latest_values[SOURCE]) == {"a": "3", "b": "4"})
+        assert set(latest_values[SOURCE].quality.values()) == {camera.QUALITY_GOOD}
+        assert driver.injected_failures > 0
+    finally:
+        stop_event.set()
+        thread.join()
+    assert not thread.is_alive()
+
+
+# Adaptive polling
+
+def test_scheduler_polls_moving_tags_more_often_than_quiet_ones(camera, tmp_path):
+    conn = create_events(str(tmp_path / "events.db"), [("QUIET", "10"), ("MOVING", "10")])
+    # Deadband 0.5 for both tags
+    configs = {SOURCE: {"quiet": "QUIET;%;Quiet tag;0.5", "moving": "MOVING;%;Moving tag;0.5"}}
+    latest_values = camera.initialize_latest_values(configs)
+    scheduler = camera.TagPollScheduler(SOURCE, configs[SOURCE], latest_values, camera.get_fetch_options(
+        {"events_table": "Events", "fetch_mode": "scheduled", "poll_interval": "1", "min_interval": "0.25", "max_interval": "10"}))
+    assert scheduler.poll(conn) == 2
+    assert scheduler.state["QUIET"]["interval"] == scheduler.state["MOVING"]["interval"] == 0.5
+
+    conn.executemany("INSERT INTO Events (TagName, ValueString) VALUES (?, ?)", [("QUIET", "10.2"), ("MOVING", "20")])
+    scheduler.reset()
+    scheduler.poll(conn)
+    assert dict(latest_values[SOURCE]) == {"quiet": "10.2", "moving": "20"}
+    assert scheduler.state["QUIET"]["interval"] == 0.75
+    assert scheduler.state["MOVING"]["interval"] == 0.25
+
+
+# Overlay
+
+def test_overlay_renderer_matches_draw_visualizations(camera):
+    configs = tag_configs(["A", "B", "C"])
+    values = camera.initialize_latest_values(configs)
+    overlay = camera.OverlayRenderer(configs, camera.DEFAULT_AESTHETICS)
+    for cycle in range(3):
+        # The cached boxes and labels are reused, only changed values are redrawn
+        values[SOURCE]["a"] = f"{cycle * 12.5}"
+        values[SOURCE]["b"] = "7"
+        values[SOURCE]["c"] = f"-{cycle}"
+        expected = camera.draw_visualizations(np.full((360, 640, 3), 80, np.uint8), values, camera.DEFAULT_AESTHETICS, configs)
+        rendered = overlay.render(np.full((360, 640, 3), 80, np.uint8), values)
+        assert np.array_equal(rendered, expected)
+
+
+# Shared-memory tag store
+
+def test_shared_store_snapshots_are_consistent(camera):
+    configs = tag_configs([f"TAG_{index}" for index in range(64)])
+    store = camera.SharedTagStore(configs, create=True)
+    reader = camera.SharedTagStore(configs, name=store.name)
+    stop = threading.Event()
+
+    def write():
+        cycle = 0
+        while not stop.is_set():
+            cycle += 1
+            for slot in range(len(store.slots)):
+                store.write(slot, f"{cycle}.{slot}")
+            store.publish()
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        for _ in range(500):
+            table = reader.snapshot()
+            # Every slot's text and numeric value come from the same write
+            for text, value in zip(table["text"], table["value"]):
+                if text != b"Fetching...":
+                    assert float(text) == value
+        generation, values = reader.read_snapshot()
+        assert generation > 0
+        assert set(values[SOURCE]) == set(configs[SOURCE])
+    finally:
+        stop.set()
+        writer.join()
+        reader.close()
+        store.close()
+        store.unlink()
+
+
+def test_shared_store_rejects_another_tag_layout(camera):
+    configs = tag_configs(["A", "B"])
+    store = camera.SharedTagStore(configs, create=True)
+    try:
+        # Same tag count in another order, and another tag count
+        for other in ({SOURCE: dict(reversed(list(configs[SOURCE].items())))}, tag_configs(["A", "B", "C"])):
+            with pytest.raises(ValueError):
+                camera.SharedTagStore(other, name=store.name)
+    finally:
+        store.close()
+        store.unlink()
+
+
+def test_snapshots_keep_their_version_when_nothing_changed(camera):
+    snapshots = camera.ValueSnapshots(tag_configs(["A", "B"]))
+    writer = snapshots.writers[SOURCE]
+    writer["a"] = "1"
+    writer["b"] = "2"
+    writer.publish()
+    version, values = snapshots.read_snapshot()
+    writer["a"] = "1"
+    writer.publish()
+    assert snapshots.read_snapshot()[0] == version
+
+    writer["a"] = "3"
+    # Readers see nothing of a cycle until it is published
+    assert snapshots.read_snapshot()[1][SOURCE]["a"] == "1"
+    writer.publish()
+    new_version, new_values = snapshots.read_snapshot()
+    assert new_version == version + 1
+    assert dict(new_values[SOURCE]) == {"a": "3", "b": "2"}
+    # The snapshot taken before stays as it was
+    assert values[SOURCE]["a"] == "1"
+
+
+def test_tag_history_keeps_the_last_samples_of_each_tag(camera):
+    history = camera.TagHistory(tag_configs(["A", "B", "C"]), capacity=4)
+    a, b, c = (history.slots[(SOURCE, tag_name)] for tag_name in ("a", "b", "c"))
+    for index in range(6):
+        history.append(a, float(index), 100.0 + index)
+    history.append(b, 7.0, 100.0)
+    # Non-numeric values are not recorded
+    history.append(c, float("nan"), 100.0)
+    values, valid_counts = history.window(np.array([a, b, c]), 3)
+    assert list(valid_counts) == [3, 1, 0]
+    assert list(values[0]) == [3.0, 4.0, 5.0]
+    assert np.isnan(values[1, :2]).all() and values[1, 2] == 7.0
+    assert np.isnan(values[2]).all()
+    assert history.generation() == 7
+
+
+def test_history_records_a_sample_per_value_change_in_either_store(camera):
+    configs = tag_configs(["A"])
+    snapshots = camera.ValueSnapshots(configs)
+    store = camera.SharedTagStore(configs, create=True)
+    try:
+        for writer, history in ((snapshots.writers[SOURCE], snapshots.history), (camera.SharedSourceValues(store, SOURCE), store.history)):
+            # Batch and per-tag polling write every value on every cycle
+            for value in ("1", "1", "1", "2", "2", "No data", "2"):
+                writer["a"] = value
+                writer.publish()
+            values, valid_counts = history.window(np.array([history.slots[(SOURCE, "a")]]), 4)
+            assert valid_counts[0] == 3
+            assert list(values[0, 1:]) == [1.0, 2.0, 2.0]
+    finally:
+        store.close()
+        store.unlink()
+
+
+# Replay
+
+def test_replay_seek_restores_the_values_recorded_with_the_frame(camera, tmp_path):
+    configs = tag_configs(["A", "B"])
+    values = camera.initialize_latest_values(configs)
+    recorder = camera.ReplayRecorder("test", str(tmp_path), fps=0, segment_seconds=2, keyframe_seconds=0.5)
+    capture = camera.SyntheticCapture(160, 90, fps=0)
+    start = time.time()
+    for index in range(100):
+        if index % 7 == 0:
+            values[SOURCE]["a"] = f"{index}"
+        if index % 11 == 0:
+            values[SOURCE]["b"] = f"{index * 2}"
+        # Synthetic times 40 ms apart, called directly instead of through the sink thread
+        recorder.process((capture.read()[1], start + index * 0.04, index, values))
+    recorder.close()
+
+    reader = camera.ReplayReader(str(tmp_path), "test")
+    assert len(reader.segments) > 1
+    for index in (0, 6, 7, 33, 50, 77, 99):
+        reader.seek(start + index * 0.04 + 0.01)
+        ok, frame, recorded_at = reader.read()
+        assert ok and frame.shape == (90, 160, 3)
+        assert recorded_at == pytest.approx(start + index * 0.04)
+        recorded = reader.read_snapshot()[1][SOURCE]
+        assert recorded["a"] == f"{index // 7 * 7}"
+        assert recorded["b"] == f"{index // 11 * 11 * 2}"
+    reader.close()
+
+
+def test_retention_keeps_the_open_segments_of_both_recorders(camera, tmp_path):
+    directory = str(tmp_path)
+    frame = np.full((90, 160, 3), 100, np.uint8)
+    # Same record_dir, name and budget, as build_sinks and build_replay_recorder set them up
+    video = camera.SegmentedRecorderSink("test", directory, fps=10, segment_seconds=60, max_bytes=1)
+    replay = camera.ReplayRecorder("test", directory, fps=0, segment_seconds=0.5, max_bytes=1)
+    try:
+        video.process(frame)
+        start = time.time()
+        for index in range(4):
+            # Every record starts a replay segment, which applies the retention
+            replay.process((frame, start + index, index, {}))
+        open_files = {os.path.basename(video.base) + ".mp4", os.path.basename(replay.base) + ".replay", os.path.basename(replay.base) + ".index"}
+        assert set(os.listdir(directory)) == open_files
+    finally:
+        video.close()
+        replay.close()
+
+
+# Capture
+
+class CountingCapture:
+    # count frames, each filled with its number, then ends like a video file
+    def __init__(self, count):
+        self.count = count
+        self.index = 0
+
+    def grab(self):
+        self.index += 1
+        return self.index <= self.count
+
+    def retrieve(self):
+        return True, np.full((90, 160, 3), self.index, np.uint8)
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def release(self):
+        pass
+
+
+def test_grabber_hands_out_only_the_newest_frame(camera):
+    grabber = camera.FrameGrabber(CountingCapture(20)).start()
+    try:
+        assert wait_for(lambda: grabber.failed)
+        ok, frame, captured_at = grabber.read()
+        assert ok and frame[0, 0, 0] == 20
+        assert grabber.captured_frames == 20 and grabber.dropped_frames == 19
+        assert not grabber.read(timeout=0.05)[0]
+    finally:
+        grabber.stop()
+
+
+class StallingCapture:
+    # One frame, then grab() blocks until resumed, like a camera that stopped sending
+    def __init__(self):
+        self.grabs = 0
+        self.grabbing = False
+        self.releases = 0
+        self.released_in_grab = False
+        self.resume = threading.Event()
+
+    def grab(self):
+        self.grabs += 1
+        if self.grabs > 1:
+            self.grabbing = True
+            self.resume.wait(10)
+            self.grabbing = False
+            return False
+        return True
+
+    def retrieve(self):
+        return True, np.full((90, 160, 3), 100, np.uint8)
+
+    def release(self):
+        # Not allowed by cv2 while another thread is in grab()
+        self.released_in_grab = self.released_in_grab or self.grabbing
+        self.releases += 1
+
+
+def test_repeated_frames_do_not_carry_the_previous_overlay(camera):
+    configs = tag_configs(["A"])
+    values = camera.initialize_latest_values(configs)
+    overlay = camera.OverlayRenderer(configs, camera.DEFAULT_AESTHETICS)
+    grabber = camera.FrameGrabber(StallingCapture()).start()
+    try:
+        values[SOURCE]["a"] = "11.11"
+        ok, frame, captured_at = grabber.read()
+        overlay.render(frame, values)
+        values[SOURCE]["a"] = "99.99"
+        ok, repeated, repeated_at = grabber.read(timeout=0.1)
+        assert ok and repeated_at == captured_at and grabber.duplicated_frames == 1
+        repeated = overlay.render(repeated, values)
+    finally:
+        grabber.capture.resume.set()
+        grabber.stop()
+    clean = camera.OverlayRenderer(configs, camera.DEFAULT_AESTHETICS).render(np.full((90, 160, 3), 100, np.uint8), values)
+    assert np.array_equal(repeated, clean)
+
+
+def test_stop_leaves_the_release_of_a_stalled_capture_to_its_grab_thread(camera):
+    capture = StallingCapture()
+    grabber = camera.FrameGrabber(capture).start()
+    assert grabber.read()[0]
+    assert wait_for(lambda: capture.grabbing)
+    grabber.stop(timeout=0.1)
+    assert capture.releases == 0
+    capture.resume.set()
+    assert wait_for(lambda: capture.releases == 1)
+    assert not capture.released_in_grab
+    grabber.thread.join(timeout=1)
+    assert not grabber.thread.is_alive()
+
+
+def test_governor_steps_down_over_budget_and_back_up_with_headroom(camera):
+    class Grabber:
+        decode_every = 1
+
+    grabber = Grabber()
+    governor = camera.FrameGovernor("test", grabber, target_fps=25, latency_budget=0.5, hold=0.01, recover=0.05)
+    for _ in range(40):
+        time.sleep(0.005)
+        governor.update(0.08, 0.01)
+    assert governor.level == len(governor.levels) - 1
+    assert grabber.decode_every == governor.settings["decode_every"]
+    for _ in range(400):
+        time.sleep(0.005)
+        governor.update(0.005, 0.01)
+    assert governor.level == 0
+    assert grabber.decode_every == 1
+
+
+def test_governor_ignores_the_age_of_repeated_frames(camera):
+    class Grabber:
+        decode_every = 1
+
+    governor = camera.FrameGovernor("test", Grabber(), target_fps=25, latency_budget=0.1, hold=0.01)
+    for _ in range(30):
+        time.sleep(0.005)
+        governor.update(0.002, None)
+    assert governor.level == 0
+    for _ in range(30):
+        time.sleep(0.005)
+        governor.update(0.002, 1.0)
+    assert governor.level > 0
+
+
+def open_flaky_supervisor(camera, name, standby):
+    cameras = {url: camera.FlakyCamera(lambda url: camera.SyntheticCapture(160, 90, fps=50), seed=index)
+               for index, url in enumerate(("synthetic://primary", "synthetic://standby"))}
+    options = {"frame_timeout": "0.3", "reconnect_min_delay": "0.05", "reconnect_max_delay": "0.2"}
+    if standby:
+        options["standby_source"] = "synthetic://standby"
+    supervisor = camera.open_supervised_stream("synthetic://primary", options, name=name,
+                                               opener=lambda url, cap=None: camera.open_capture(url, cameras[url].open(url)))
+    return supervisor, cameras["synthetic://primary"]
+
+
+def read_for(supervisor, seconds):
+    frames = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        ok, frame, captured_at = supervisor.read(timeout=0.1)
+        if ok:
+            frames.append(captured_at)
+    return frames
+
+
+def test_supervisor_fails_over_to_the_standby(camera):
+    supervisor, primary = open_flaky_supervisor(camera, "test-failover", standby=True)
+    try:
+        assert wait_for(lambda: all(feed["grabber"] is not None for feed in supervisor.feeds))
+        read_for(supervisor, 0.2)
+        primary.failure_rate = 1.0
+        frames = read_for(supervisor, 0.5)
+        assert supervisor.active["role"] == "standby"
+        assert supervisor.last_recovery is not None and supervisor.last_recovery < 0.25
+        assert supervisor.recovery_frames == 0
+        assert len(frames) > 10
+    finally:
+        supervisor.stop()
+
+
+def test_supervisor_reconnects_and_serves_recovery_frames_meanwhile(camera):
+    supervisor, primary = open_flaky_supervisor(camera, "test-reconnect", standby=False)
+    try:
+        read_for(supervisor, 0.2)
+        primary.outage(1.0)
+        read_for(supervisor, 1.0)
+        assert supervisor.recovery_frames > 0
+        # The recovery is noticed by read() with the first frame from the reconnected camera
+        assert wait_for(lambda: supervisor.read(timeout=0.05)[0] and supervisor.last_recovery is not None, timeout=5)
+        assert supervisor.active["role"] == "primary"
+        assert primary.opens > 1
+        assert len(read_for(supervisor, 0.3)) > 5
+    finally:
+        supervisor.stop()
+
+
+# Annotation
+
+class KeyFrameCapture:
+    # 100 frames, each filled with its own number; seeks land on the key frame (multiple of 10) before
+    def __init__(self, video_file):
+        self.position = 0
+
+    def set(self, prop, value):
+        self.position = int(value) // 10 * 10
+        return True
+
+    def get(self, prop):
+        return self.position
+
+    def grab(self):
+        self.position += 1
+        return self.position <= 100
+
+    def read(self):
+        self.position += 1
+        return self.position <= 100, np.full((16, 16, 3), self.position - 1, np.uint8)
+
+    def release(self):
+        pass
+
+
+def test_annotate_segment_starts_on_its_first_frame_and_skips_frames_it_cannot_encode(camera, tmp_path, monkeypatch):
+    class PlainOverlay:
+        def __init__(self, *args):
+            pass
+
+        def render(self, frame, values, version=None):
+            return frame
+
+    imencode = camera.cv2.imencode
+
+    def encode(ext, frame, params):
+        return (False, None) if frame[0, 0, 0] == 40 else imencode(ext, frame, params)
+
+    monkeypatch.setattr(camera.cv2, "VideoCapture", KeyFrameCapture)
+    monkeypatch.setattr(camera.cv2, "imencode", encode)
+    monkeypatch.setattr(camera, "OverlayRenderer", PlainOverlay)
+    part_file = str(tmp_path / "part.jpg")
+    sizes, _ = camera.annotate_segment("video.avi", {}, 37, 5, 0.0, 25, {}, [], part_file, 100)
+    assert len(sizes) == 4
+    frames = []
+    with open(part_file, "rb") as infile:
+        for size in sizes:
+            frame = camera.cv2.imdecode(np.frombuffer(infile.read(size), np.uint8), camera.cv2.IMREAD_COLOR)
+            frames.append(int(round(frame.mean())))
+    assert frames == [37, 38, 39, 41]
@@ -0,0 +1,147 @@
+import csv
+import math
+
+import pytest
+
+
+SOURCE = "Source1-wonderware"
+COLUMNS = ("Group;Comment;Logged;EventLogged;EventLoggingPriority;EngUnits;{min};{max};Deadband;LogDeadband;"
+           "LoLoAlarmState;LoLoAlarmValue;LoAlarmState;LoAlarmValue;HiAlarmState;HiAlarmValue;HiHiAlarmState;HiHiAlarmValue")
+
+
+@pytest.fixture
+def quiet_messagebox(tag_list, monkeypatch):
+    errors = []
+    monkeypatch.setattr(tag_list.messagebox, "showinfo", lambda *args: None)
+    monkeypatch.setattr(tag_list.messagebox, "showerror", lambda *args: errors.append(args))
+    return errors
+
+
+def write_export(path, sections):
+    with open(path, mode='w', newline='') as outfile:
+        outfile.write(":mode=ask;;;;\n")
+        for section, rows in sections.items():
+            memory = section.startswith(":Memory")
+            outfile.write(f"{section};" + COLUMNS.format(min="MinValue" if memory else "MinEU", max="MaxValue" if memory else "MaxEU") + "\n")
+            for row in rows:
+                outfile.write(";".join(row) + "\n")
+
+
+def logged_rows(prefix, count, comment="Tag {index}"):
+    return [[f"{prefix}_{index}", "$System", comment.format(index=index), "Yes", "Yes" if index % 4 else "No",
+             "1", "%", "0", "100", "0", "0"] + ["Off", ""] * 4 for index in range(count)]
+
+
+def test_parallel_parse_matches_a_single_worker(tag_list, tmp_path):
+    path = str(tmp_path / "DB.CSV")
+    write_export(path, {":IOReal": logged_rows("REAL", 300), ":MemoryDisc": logged_rows("DISC", 300)})
+    chunks, total_bytes = tag_list.find_section_chunks(path, tag_list.WONDERWARE_SECTIONS, ";", "utf-8", chunk_bytes=1024)
+    assert len(chunks) > 4
+
+    def parse(workers):
+        parsed = tag_list.iterate_parsed_chunks(path, "utf-8", ";", chunks, SOURCE, workers)
+        return [row for result in parsed for row in result[0]]
+
+    single = parse(1)
+    assert parse(2) == single
+    # Tags with EventLogged = No are left out
+    assert [row[1] for row in single] == [f"{prefix}_{index}" for prefix in ("REAL", "DISC") for index in range(300) if index % 4]
+
+
+def test_chunks_never_split_quoted_fields(tag_list, tmp_path):
+    path = str(tmp_path / "DB.CSV")
+    rows = []
+    for index in range(200):
+        # A multi-line comment, one of its lines looking like a section header
+        comment = f'"Pump {index}\n:IOInt;not a section\nsays ""hello"""' if index % 3 == 0 else f"Tag {index}"
+        rows.append([f"TAG_{index}", "$System", comment, "Yes", "Yes", "1", "%", "0", "100", "0", "0"] + ["Off", ""] * 4)
+    write_export(path, {":IOReal": rows})
+    chunks, total_bytes = tag_list.find_section_chunks(path, tag_list.WONDERWARE_SECTIONS, ";", "utf-8", chunk_bytes=64)
+    assert len(chunks) > 10
+
+    parsed = []
+    for header_line, start, end in chunks:
+        parsed += tag_list.parse_section_chunk(path, "utf-8", ";", header_line, start, end, SOURCE)[0]
+    assert [row[1] for row in parsed] == [f"TAG_{index}" for index in range(200)]
+    assert parsed[0][3] == 'Pump 0\n:IOInt;not a section\nsays "hello"'
+
+
+def test_tag_catalog_search(tag_list):
+    catalog = tag_list.TagCatalog([
+        [SOURCE, "PUMP_SPEED", "rpm", "Pump speed"],
+        [SOURCE, "PUMP_FLOW", "m3/h", "Flow after the pump"],
+        [SOURCE, "TANK_LEVEL", "%", "Tank level"],
+    ])
+    assert catalog.search("") == [0, 1, 2]
+    assert catalog.search("Pump_", mode="prefix") == [0, 1]
+    assert catalog.search("level") == [2]
+    # Every word has to start a word of TagName, EngUnits or Comment
+    assert catalog.search("pump", mode="token") == [0, 1]
+    assert catalog.search("flow pu", mode="token") == [1]
+    assert catalog.search("ump", mode="token") == []
+
+
+def test_incremental_update_reparses_only_changed_chunks(tag_list, tmp_path):
+    export_file = str(tmp_path / "DB.CSV")
+    output_file = str(tmp_path / "Output1.csv")
+    sections = {":IOReal": logged_rows("REAL", 50), ":MemoryReal": logged_rows("MEMORY", 50)}
+    write_export(export_file, sections)
+    processor = tag_list.get_scada_processor("wonderware")
+    processor.extract_tags(export_file, output_file, ";", ";", SOURCE, workers=1)
+
+    sections[":MemoryReal"][5][2] = "Edited comment"
+    write_export(export_file, sections)
+    report = processor.update_tags(export_file, output_file, ";", ";", SOURCE, workers=1)
+    assert not report["full_run"]
+    assert report["chunks"] == 2 and report["reparsed_chunks"] == 1
+    assert report["modified"] == ["MEMORY_5"]
+    assert not report["added"] and not report["removed"]
+
+    # Byte for byte the output of a full run
+    full_file = str(tmp_path / "Full.csv")
+    processor.extract_tags(export_file, full_file, ";", ";", SOURCE, workers=1)
+    with open(output_file, 'rb') as updated, open(full_file, 'rb') as full:
+        assert updated.read() == full.read()
+
+
+def test_tag_list_round_trip(tag_list, camera, tmp_path, quiet_messagebox):
+    export_file = str(tmp_path / "DB.CSV")
+    output_file = str(tmp_path / "Output1.csv")
+    ini_file = str(tmp_path / "TagList.ini")
+    write_export(export_file, {
+        ":IOReal": [
+            ["PUMP_SPEED", "$System", "Pump speed", "Yes", "Yes", "10", "rpm", "0", "1500", "5", "2",
+             "On", "50", "On", "100", "Off", "1400", "On", "1450"],
+            ["NOT_LOGGED", "$System", "Not in the Events table", "Yes", "No", "1", "", "0", "1", "0", "0"] + ["Off", ""] * 4,
+        ],
+        ":MemoryReal": [
+            ["TANK_LEVEL", "$System", "Tank level", "Yes", "Yes", "", "%", "0", "100", "", "",
+             "Off", "", "Off", "", "On", "90", "Off", ""],
+        ],
+    })
+
+    processor = tag_list.get_scada_processor("wonderware")
+    assert processor.extract_tags(export_file, output_file, ";", ";", SOURCE, workers=1) == 2
+    with open(output_file, newline='') as infile:
+        header = next(csv.reader(infile, delimiter=";"))
+    assert header == tag_list.OUTPUT_COLUMNS
+
+    catalog = tag_list.load_output_file(output_file)
+    assert catalog is not None
+    tag_list.append_to_ini_file(catalog.rows, ini_file)
+    assert not quiet_messagebox
+
+    # The stream side reads the same fields back from the tag list
+    _, tag_configs, _ = camera.read_config(db_file=str(tmp_path / "missing.ini"), tag_file=ini_file)
+    tags = tag_configs[SOURCE]
+    assert set(tags) == {"pump_speed", "tank_level"}
+    assert tags["pump_speed"].split(";")[:3] == ["PUMP_SPEED", "rpm", "Pump speed"]
+    assert camera.parse_tag_polling(tags["pump_speed"]) == {"deadband": 5.0, "priority": 10.0}
+    assert camera.parse_tag_limits(tags["pump_speed"])[:4] == [0.0, 1500.0, 50.0, 100.0]
+    # The Hi limit is off
+    assert math.isnan(camera.parse_tag_limits(tags["pump_speed"])[4])
+    assert camera.parse_tag_limits(tags["pump_speed"])[5] == 1450.0
+    # Memory tags name their range MinValue/MaxValue
+    tank_limits = camera.parse_tag_limits(tags["tank_level"])
+    assert tank_limits[:2] == [0.0, 100.0] and tank_limits[4] == 90.0
+    assert all(math.isnan(limit) for limit in tank_limits[2:4] + tank_limits[5:])